@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del pipeline: por etapa y de punta a punta, con el proveedor fake.
+
+Uso:
+    python benchmark.py
+    python benchmark.py --baseline output/benchmarks/benchmark_20250101_120000.json
+
+Mide tiempo de import, extracción (páginas/s), chunking (MB/s), merge y
+validación, documentos por hora de punta a punta y RSS máximo, sobre
+pdfs/jeannette_jara.txt y corpus sintéticos escalados. Los resultados se guardan como JSON; con
+--baseline se comparan con una ejecución anterior y se marcan las
+regresiones (código de salida 1).
+"""
+import os
+
+# Sin red, sin cache ni checkpoints: cada ejecución mide el trabajo completo
+os.environ.setdefault("LLM_PROVIDER", "fake")
+os.environ.setdefault("ENABLE_LLM_CACHE", "false")
+os.environ.setdefault("ENABLE_CHECKPOINTS", "false")
+os.environ.setdefault("TQDM_DISABLE", "1")
+
+import argparse
+import asyncio
+import json
+import logging
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import fitz
+
+from src.boilerplate_filter import BoilerplateFilter
+from src.config import PDFS_DIR, OUTPUT_DIR, PROJECT_ROOT, CHUNK_SIZING, MAX_CONCURRENT_REQUESTS
+from src.fake_llm import FakeLLMBackend, fake_response
+from src.llm_scheduler import LLMScheduler
+from src.payload_compactor import compact_analyses
+from src.pdf_extractor import PDFExtractor
+from src.prompts import CHUNK_ANALYSIS_PROMPT
+from src.result_sink import ResultSink
+from src.providers import FakeProvider
+from src.text_chunker import TextChunker
+from src.validator import AnalysisValidator
+
+BASE_DOCUMENT = PDFS_DIR / "jeannette_jara.txt"
+RESULTS_DIR = OUTPUT_DIR / "benchmarks"
+
+# Caracteres por página al generar PDFs sintéticos
+CHARS_PER_PDF_PAGE = 3000
+
+# Puntos de entrada cuyo tiempo de import se mide (los locales no deben
+# cargar PyMuPDF ni los SDK de los proveedores)
+IMPORT_TARGETS = ("src.text_chunker", "src.validator", "main")
+HEAVY_MODULES = ("anthropic", "google.generativeai", "fitz")
+
+logger = logging.getLogger("benchmark")
+
+
+def peak_rss_mb() -> float:
+    """RSS máximo del proceso y sus hijos, en MB (ru_maxrss está en KB en Linux)."""
+    divisor = 1024 * 1024 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return round(max(own, children) / divisor, 1)
+
+
+def git_version() -> str:
+    """Commit actual del repositorio, si está disponible."""
+    try:
+        return subprocess.run(
+            ["git", "describe", "--always", "--dirty"],
+            cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def metric(value: float, unit: str, higher_is_better: bool) -> Dict:
+    """Resultado de una medición."""
+    return {"value": round(value, 3), "unit": unit, "higher_is_better": higher_is_better}
+
+
+def best_time(function: Callable, repeat: int):
+    """
+    Ejecuta function repeat veces y retorna el menor tiempo (menos ruido).
+
+    Returns:
+        Tupla (segundos de la mejor ejecución, resultado de la última)
+    """
+    best = float("inf")
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+
+def scaled_text(base_text: str, scale: int) -> str:
+    """Texto base repetido scale veces, con un encabezado distinto por copia."""
+    return "\n\n".join(
+        f"Sección sintética {i + 1}\n\n{base_text}" for i in range(scale)
+    )
+
+
+def write_pdf(text: str, path: Path) -> int:
+    """
+    Genera un PDF de texto plano a partir de un texto.
+
+    Returns:
+        Número de páginas
+    """
+    document = fitz.open()
+    for start in range(0, len(text), CHARS_PER_PDF_PAGE):
+        page = document.new_page()
+        page.insert_textbox(page.rect + (36, 36, -36, -36), text[start:start + CHARS_PER_PDF_PAGE], fontsize=6)
+    pages = document.page_count
+    document.save(path)
+    document.close()
+    return pages
+
+
+def bench_extraction(base_text: str, scales: List[int], workdir: Path, repeat: int) -> Dict[str, Dict]:
+    """Páginas por segundo de PDFExtractor sobre PDFs sintéticos."""
+    results = {}
+    extractor = PDFExtractor()
+
+    def extract(path: Path) -> None:
+        with extractor.load(path) as document:
+            extractor.read_full_text(document)
+
+    for scale in scales:
+        path = workdir / f"extraction_{scale}x.pdf"
+        pages = write_pdf(scaled_text(base_text, scale), path)
+        elapsed, _ = best_time(lambda: extract(path), repeat)
+
+        results[f"extraction.pages_per_s.{scale}x"] = metric(pages / elapsed, "pages/s", True)
+        logger.info(f"Extracción {scale}x: {pages} páginas en {elapsed:.2f}s")
+
+    return results
+
+
+def bench_chunking(base_text: str, scales: List[int], repeat: int) -> Dict[str, Dict]:
+    """MB por segundo de TextChunker.chunk_text en ambos modos de dimensionamiento."""
+    results = {}
+
+    for scale in scales:
+        text = scaled_text(base_text, scale)
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+
+        for sizing in ("chars", "tokens"):
+            # Chunker nuevo en cada repetición: el cache de TokenCounter no debe ayudar
+            elapsed, chunks = best_time(lambda: TextChunker(sizing=sizing).chunk_text(text), repeat)
+
+            results[f"chunking.{sizing}.mb_per_s.{scale}x"] = metric(megabytes / elapsed, "MB/s", True)
+            logger.info(f"Chunking {sizing} {scale}x: {len(chunks)} chunks en {elapsed:.2f}s")
+
+    return results
+
+
+def bench_boilerplate_filter(base_text: str, scales: List[int], repeat: int) -> Dict[str, Dict]:
+    """MB por segundo de BoilerplateFilter sobre páginas del tamaño de las de los PDFs sintéticos."""
+    results = {}
+
+    for scale in scales:
+        text = scaled_text(base_text, scale)
+        pages = [text[start:start + CHARS_PER_PDF_PAGE] for start in range(0, len(text), CHARS_PER_PDF_PAGE)]
+        megabytes = len(text.encode("utf-8")) / (1024 * 1024)
+
+        elapsed, filtered = best_time(lambda: BoilerplateFilter().filter_text(pages), repeat)
+        results[f"filter.mb_per_s.{scale}x"] = metric(megabytes / elapsed, "MB/s", True)
+        logger.info(
+            f"Filtro de boilerplate {scale}x: {len(text) - len(filtered):,} caracteres "
+            f"descartados en {elapsed:.2f}s"
+        )
+
+    return results
+
+
+def bench_merge_validation(base_text: str, scales: List[int], repeat: int) -> Dict[str, Dict]:
+    """Tiempo de compactación, merge de respaldo y validación de análisis parciales."""
+    results = {}
+    synthesizer = FakeProvider(FakeLLMBackend(latency_ms=0)).create_synthesizer()
+    validator = AnalysisValidator()
+
+    for scale in scales:
+        chunks = TextChunker().chunk_text(scaled_text(base_text, scale))
+        partials = [
+            json.loads(fake_response(CHUNK_ANALYSIS_PROMPT + f"\n\nFragmento {i + 1}\n\n{chunk}"))
+            for i, chunk in enumerate(chunks)
+        ]
+
+        compact_elapsed, _ = best_time(lambda: compact_analyses(partials), repeat)
+        merge_elapsed, _ = best_time(
+            lambda: validator.validate_completeness(synthesizer._fallback_synthesis(partials, {})),
+            repeat
+        )
+
+        results[f"merge.compact_ms.{scale}x"] = metric(compact_elapsed * 1000, "ms", False)
+        results[f"merge.fallback_validate_ms.{scale}x"] = metric(merge_elapsed * 1000, "ms", False)
+        logger.info(
+            f"Merge {scale}x ({len(partials)} análisis): compactación {compact_elapsed * 1000:.1f}ms, "
+            f"merge + validación {merge_elapsed * 1000:.1f}ms"
+        )
+
+    return results
+
+
+def bench_import_time(repeat: int) -> Dict[str, Dict]:
+    """Tiempo de import de cada punto de entrada en un intérprete nuevo."""
+    results = {}
+    probe = (
+        "import sys, time; started = time.perf_counter(); import {module}; "
+        "elapsed = time.perf_counter() - started; "
+        "print(elapsed, ','.join(m for m in {heavy!r} if m in sys.modules))"
+    )
+
+    for module in IMPORT_TARGETS:
+        best = float("inf")
+        heavy = ""
+        for _ in range(max(1, repeat)):
+            output = subprocess.run(
+                [sys.executable, "-c", probe.format(module=module, heavy=HEAVY_MODULES)],
+                cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+            ).stdout.split()
+            best = min(best, float(output[0]))
+            heavy = output[1] if len(output) > 1 else ""
+
+        results[f"import.{module}_ms"] = metric(best * 1000, "ms", False)
+        logger.info(
+            f"Import {module}: {best * 1000:.1f}ms"
+            + (f" (carga {heavy})" if heavy else "")
+        )
+
+    return results
+
+
+def bench_end_to_end(
+    base_text: str,
+    corpus_sizes: List[int],
+    workdir: Path,
+    latency_ms: float,
+    parallel_documents: int
+) -> Dict[str, Dict]:
+    """Documentos por hora del pipeline completo con latencia LLM simulada."""
+    from main import process_documents
+
+    results = {}
+
+    for size in corpus_sizes:
+        corpus_dir = workdir / f"corpus_{size}"
+        corpus_dir.mkdir()
+        documents = []
+        for i in range(size):
+            path = corpus_dir / f"documento_{i + 1:03d}.txt"
+            path.write_text(f"Documento sintético {i + 1}\n\n{base_text}", encoding="utf-8")
+            documents.append(path)
+
+        provider = FakeProvider(FakeLLMBackend(latency_ms=latency_ms))
+        scheduler = LLMScheduler()
+        analyzer = provider.create_analyzer(scheduler=scheduler)
+        synthesizer = provider.create_synthesizer(scheduler=scheduler)
+
+        started = time.perf_counter()
+        processed = asyncio.run(process_documents(
+            documents, analyzer, synthesizer, AnalysisValidator(),
+            logging.getLogger("main"), ResultSink(workdir / f"resultados_{size}.jsonl"),
+            max_parallel=parallel_documents
+        ))
+        elapsed = time.perf_counter() - started
+
+        results[f"e2e.documents_per_hour.{size}docs"] = metric(processed / elapsed * 3600, "docs/h", True)
+        results[f"e2e.llm_calls.{size}docs"] = metric(provider.backend.get_stats()["calls"], "calls", False)
+        logger.info(f"Punta a punta {size} documentos: {elapsed:.1f}s")
+
+    return results
+
+
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Compara métricas con una ejecución anterior.
+
+    Args:
+        current: Resultado actual
+        baseline: Resultado de referencia
+        tolerance: Empeoramiento relativo permitido (0.1 = 10%)
+
+    Returns:
+        Descripción de cada métrica que empeoró más que la tolerancia
+    """
+    regressions = []
+
+    for name, now in sorted(current["metrics"].items()):
+        before = baseline.get("metrics", {}).get(name)
+        if not before or not before["value"]:
+            continue
+
+        change = (now["value"] - before["value"]) / before["value"]
+        worse = -change if now["higher_is_better"] else change
+        status = "REGRESIÓN" if worse > tolerance else "ok"
+        logger.info(
+            f"{name:45s} {before['value']:>12,.2f} → {now['value']:>12,.2f} {now['unit']:8s} "
+            f"({change:+.1%}) {status}"
+        )
+        if worse > tolerance:
+            regressions.append(f"{name}: {before['value']} → {now['value']} {now['unit']}")
+
+    return regressions
+
+
+def parse_scales(value: str) -> List[int]:
+    """Convierte "1,10,100" en [1, 10, 100]."""
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main() -> int:
+    """Ejecuta los benchmarks y guarda el resultado."""
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de análisis")
+    parser.add_argument("--text-scales", type=parse_scales, default=[1, 10, 100],
+                        help="Escalas del texto base para chunking y merge (por defecto 1,10,100)")
+    parser.add_argument("--pdf-scales", type=parse_scales, default=[1, 10],
+                        help="Escalas del PDF sintético para extracción (por defecto 1,10)")
+    parser.add_argument("--corpus-sizes", type=parse_scales, default=[1, 10, 100],
+                        help="Documentos por corpus punta a punta (por defecto 1,10,100)")
+    parser.add_argument("--latency-ms", type=float, default=50,
+                        help="Latencia simulada por llamada LLM en ms (por defecto 50)")
+    parser.add_argument("--parallel-documents", type=int, default=4,
+                        help="Documentos simultáneos en la prueba punta a punta (por defecto 4)")
+    parser.add_argument("--repeat", type=int, default=3,
+                        help="Repeticiones por medición de etapa; se usa la más rápida (por defecto 3)")
+    parser.add_argument("--output", type=Path, help="Archivo JSON de salida")
+    parser.add_argument("--baseline", type=Path, help="Resultado anterior para detectar regresiones")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="Empeoramiento relativo tolerado (por defecto 0.10)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.ERROR, format="%(message)s")
+    logger.setLevel(logging.INFO)
+
+    base_text = BASE_DOCUMENT.read_text(encoding="utf-8")
+    metrics: Dict[str, Dict] = {}
+    stage_rss: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        workdir = Path(tmp)
+
+        metrics.update(bench_import_time(args.repeat))
+        metrics.update(bench_extraction(base_text, args.pdf_scales, workdir, args.repeat))
+        stage_rss["extraction"] = peak_rss_mb()
+        metrics.update(bench_boilerplate_filter(base_text, args.text_scales, args.repeat))
+        metrics.update(bench_chunking(base_text, args.text_scales, args.repeat))
+        stage_rss["chunking"] = peak_rss_mb()
+        metrics.update(bench_merge_validation(base_text, args.text_scales, args.repeat))
+        stage_rss["merge"] = peak_rss_mb()
+        metrics.update(bench_end_to_end(
+            base_text, args.corpus_sizes, workdir, args.latency_ms, args.parallel_documents
+        ))
+        stage_rss["end_to_end"] = peak_rss_mb()
+
+    metrics["memory.peak_rss_mb"] = metric(peak_rss_mb(), "MB", False)
+
+    result = {
+        "version": git_version(),
+        "timestamp": datetime.now().isoformat(),
+        "duration_s": round(time.perf_counter() - started, 1),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count()
+        },
+        "parameters": {
+            "base_document": BASE_DOCUMENT.name,
+            "text_scales": args.text_scales,
+            "pdf_scales": args.pdf_scales,
+            "corpus_sizes": args.corpus_sizes,
+            "latency_ms": args.latency_ms,
+            "parallel_documents": args.parallel_documents,
+            "repeat": args.repeat,
+            "max_concurrent_requests": MAX_CONCURRENT_REQUESTS,
+            "chunk_sizing": CHUNK_SIZING
+        },
+        "peak_rss_mb_after_stage": stage_rss,
+        "metrics": metrics
+    }
+
+    output = args.output or RESULTS_DIR / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    logger.info(f"Resultados guardados en: {output}")
+
+    if args.baseline:
+        regressions = compare(result, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        if regressions:
+            logger.warning(f"{len(regressions)} regresiones sobre {args.baseline.name}:")
+            for line in regressions:
+                logger.warning(f"  - {line}")
+            return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
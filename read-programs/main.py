@@ -3,26 +3,52 @@
 Script principal para analizar programas presidenciales.
 
 Uso:
-    python main.py
+    python main.py                      # pipeline completo
+    python main.py plan                 # estimación sin llamadas al LLM
+    python main.py extract|chunk|analyze|synthesize [documentos...]
+    python main.py compact              # JSON consolidado desde el JSONL de resultados
 """
+import argparse
+import asyncio
 import logging
-import json
+import os
+import time
+from functools import partial
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from tqdm import tqdm
-
-from src.config import PDFS_DIR, OUTPUT_FILE, LOGS_DIR, LOG_FORMAT, LOG_DATE_FORMAT, LLM_PROVIDER
-from src.pdf_extractor import PDFExtractor
+from typing import Dict, List, Optional, Set, Tuple
+
+from src.config import (
+    PDFS_DIR, OUTPUT_FILE, LOGS_DIR, LOG_FORMAT, LOG_DATE_FORMAT, LLM_PROVIDER,
+    MAX_PARALLEL_DOCUMENTS, EXTRACTION_WORKERS, ENABLE_LLM_CACHE, ENABLE_CHECKPOINTS,
+    INCREMENTAL_RUN, STREAMING_PIPELINE, HIERARCHICAL_SYNTHESIS, BATCH_MODE, BOILERPLATE_FILTER,
+    METRICS_REPORT_FILE, PROMETHEUS_TEXTFILE, STAGES_DIR, REANALYSIS_TOP_K, RESULTS_JSONL,
+    CATEGORIAS, ensure_directories
+)
+from src.pdf_extractor import PDFExtractor, limit_extraction_workers
 from src.text_chunker import TextChunker
+from src.boilerplate_filter import BoilerplateFilter
 from src.validator import AnalysisValidator
-
-# Importar el analizador correcto según el proveedor
-if LLM_PROVIDER == "gemini":
-    from src.gemini_analyzer import GeminiAnalyzer as Analyzer
-    from src.gemini_synthesizer import GeminiSynthesizer as Synthesizer
-else:
-    from src.llm_analyzer import LLMAnalyzer as Analyzer
-    from src.synthesizer import AnalysisSynthesizer as Synthesizer
+from src.concurrent_analyzer import ChunkCallback, ConcurrentChunkAnalyzer
+from src.batch_analyzer import BatchChunkAnalyzer
+from src.llm_scheduler import LLMScheduler, estimate_tokens
+from src.llm_cache import LLMCache
+from src.checkpoint import DocumentJournal
+from src.hierarchical_synthesizer import HierarchicalSynthesizer
+from src.providers import ChunkAnalyzer, Synthesizer, get_provider
+from src.metrics import recorder
+from src.planner import (
+    DEFAULT_CALL_SECONDS, load_observed, plan_document, plan_totals,
+    provider_pricing, format_duration
+)
+from src.stage_artifacts import StageArtifacts
+from src.retrieval import retrieve_passages
+from src.incremental import (
+    document_fingerprint, drop_missing_results, load_previous_results, split_unchanged,
+    write_json_atomic
+)
+from src.result_sink import ResultSink, compact_results
 
 
 def setup_logging() -> logging.Logger:
@@ -52,17 +78,27 @@ def setup_logging() -> logging.Logger:
     return logger
 
 
-def find_documents() -> list[Path]:
+def list_documents() -> list[Path]:
     """
-    Encuentra todos los archivos PDF y TXT en la carpeta pdfs/.
+    Lista los archivos PDF y TXT en la carpeta pdfs/ (puede estar vacía).
 
     Returns:
-        Lista de rutas a archivos de documentos
+        Lista ordenada de rutas a archivos de documentos
     """
     pdf_files = list(PDFS_DIR.glob("*.pdf"))
     txt_files = list(PDFS_DIR.glob("*.txt"))
 
-    all_files = pdf_files + txt_files
+    return sorted(pdf_files + txt_files)
+
+
+def find_documents() -> list[Path]:
+    """
+    Encuentra todos los archivos PDF y TXT en la carpeta pdfs/.
+
+    Returns:
+        Lista de rutas a archivos de documentos
+    """
+    all_files = list_documents()
 
     if not all_files:
         raise FileNotFoundError(
@@ -70,150 +106,895 @@ def find_documents() -> list[Path]:
             f"Por favor, coloca los programas presidenciales en la carpeta 'pdfs/'"
         )
 
-    return sorted(all_files)
+    return all_files
+
+
+def extract_and_chunk(pdf_path: Path) -> Optional[Tuple[str, List[str], Dict[str, float]]]:
+    """
+    Extrae y divide un documento (etapa CPU, apta para un proceso worker).
+
+    Los tiempos se retornan en vez de registrarse en las métricas porque
+    esta función puede correr en otro proceso.
+
+    Args:
+        pdf_path: Ruta al archivo PDF o TXT
+
+    Returns:
+        Tupla (texto de las primeras páginas, chunks, segundos por etapa)
+        o None si no hay texto
+    """
+    extractor = PDFExtractor()
+    chunker = TextChunker()
+    started = time.perf_counter()
+
+    # Abrir el documento una sola vez; las páginas se extraen una vez
+    document = extractor.load(pdf_path)
+    if document is None:
+        return None
+
+    with document:
+        text = extractor.read_full_text(document)
+        if not text:
+            return None
+        first_pages = document.first_pages(num_pages=3)
+        # Por página, antes de cerrar el documento, para filtrar el boilerplate
+        page_texts = list(document.iter_pages()) if BOILERPLATE_FILTER else None
+
+    extracted_at = time.perf_counter()
+    timings = {"extract": extracted_at - started}
+
+    # Descartar portadas, índices, menús y pies repetidos antes del chunking
+    if page_texts is not None:
+        text = BoilerplateFilter().filter_text(page_texts, pdf_path.name)
+        timings["filter"] = time.perf_counter() - extracted_at
+        extracted_at = time.perf_counter()
+
+    chunks = chunker.chunk_text(text)
+    timings["chunk"] = time.perf_counter() - extracted_at
+
+    return first_pages, chunks, timings
+
+
+async def run_extraction(
+    pdf_path: Path,
+    executor: Optional[Executor] = None
+) -> Optional[Tuple[str, List[str], Dict[str, float]]]:
+    """Ejecuta extract_and_chunk en el pool (si hay) sin bloquear el event loop."""
+    if executor is None:
+        return extract_and_chunk(pdf_path)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, extract_and_chunk, pdf_path)
+
+
+async def analyze_document(
+    pdf_path: Path,
+    analyzer: ChunkAnalyzer,
+    logger: logging.Logger,
+    chunk_engine: ConcurrentChunkAnalyzer,
+    journal: Optional[DocumentJournal] = None,
+    executor: Optional[Executor] = None,
+    extracted: Optional[Tuple[str, List[str], Dict[str, float]]] = None,
+    on_chunk: Optional[ChunkCallback] = None
+) -> Optional[Tuple[str, Optional[List[str]], List[Optional[Dict]], dict]]:
+    """
+    Extrae, divide y analiza un documento, y extrae su metadata.
+
+    Args:
+        pdf_path: Ruta al archivo PDF o TXT
+        analyzer: Analizador LLM
+        logger: Logger
+        chunk_engine: Motor concurrente de análisis de chunks
+        journal: Journal de checkpoints del documento (opcional)
+        executor: Pool para extracción y chunking (None = en el proceso actual)
+        extracted: Resultado de extract_and_chunk ya calculado (modo batch o
+            subcomando analyze); sus tiempos pueden venir vacíos
+        on_chunk: Se llama con cada análisis de chunk apenas está disponible
+
+    Returns:
+        Tupla (primeras páginas, chunks, análisis por chunk, metadata) o None
+        si no hay texto. En streaming los chunks no se retienen (None)
+    """
+    document = None
+    chunks = None
+
+    # 1-3. Extraer texto, primeras páginas y dividir en chunks
+    if STREAMING_PIPELINE and extracted is None:
+        # Los chunks se generan página a página mientras se analizan
+        document = PDFExtractor().load(pdf_path)
+        if document is None:
+            logger.error(f"No se pudo extraer texto de {pdf_path.name}")
+            return None
+
+        first_pages = document.first_pages(num_pages=3)
+        pages = document.iter_text()
+        if BOILERPLATE_FILTER:
+            pages = BoilerplateFilter().filter_pages(pages, pdf_path.name)
+        chunk_task = chunk_engine.analyze_chunk_stream(
+            TextChunker().iter_chunks(pages),
+            desc=f"Analizando {pdf_path.name}",
+            journal=journal,
+            on_result=on_chunk
+        )
+    else:
+        if extracted is None:
+            extracted = await run_extraction(pdf_path, executor)
+
+        if extracted is None:
+            logger.error(f"No se pudo extraer texto de {pdf_path.name}")
+            return None
+
+        first_pages, chunks, timings = extracted
+        for stage, seconds in timings.items():
+            recorder.record_span(stage, seconds)
+        logger.info(f"Documento dividido en {len(chunks)} chunks")
+        chunk_task = chunk_engine.analyze_chunks(
+            chunks, desc=f"Analizando {pdf_path.name}", journal=journal, on_result=on_chunk
+        )
+
+    async def extract_metadata() -> dict:
+        with recorder.span("metadata"):
+            metadata = journal.get_metadata(first_pages) if journal else None
+            if metadata is None:
+                metadata, complete = await analyzer.extract_metadata_async(first_pages)
+                # La metadata por defecto tras un error se vuelve a pedir al reanudar
+                if journal and complete:
+                    journal.record_metadata(first_pages, metadata)
+        return metadata
+
+    # 4-5. Analizar chunks (resultados en orden) y extraer metadata en paralelo
+    try:
+        chunk_results, metadata = await asyncio.gather(
+            recorder.traced("analyze", chunk_task), extract_metadata()
+        )
+    finally:
+        if document is not None:
+            document.close()
+
+    return first_pages, chunks, chunk_results, metadata
+
 
+async def reanalyze_missing_categories(
+    missing_categories: Set[str],
+    chunks: List[str],
+    analyzer: ChunkAnalyzer,
+    logger: logging.Logger
+) -> Optional[Dict]:
+    """
+    Re-analiza las categorías faltantes con los REANALYSIS_TOP_K pasajes de
+    mayor puntaje BM25 por categoría, en vez del texto completo.
+
+    Args:
+        missing_categories: Categorías que la síntesis no encontró
+        chunks: Chunks del documento
+        analyzer: Analizador LLM
+        logger: Logger
 
-def process_single_pdf(
+    Returns:
+        Análisis con las categorías encontradas o None si no hubo re-análisis
+    """
+    missing = [cat for cat in CATEGORIAS if cat in missing_categories]
+
+    with recorder.span("reanalyze", categories=len(missing)):
+        passages, matched = retrieve_passages(chunks, missing, REANALYSIS_TOP_K)
+        searchable = [cat for cat in missing if matched[cat]]
+        if not passages:
+            logger.info("Ningún pasaje menciona las categorías faltantes; no se re-analiza")
+            return None
+
+        sent = sum(len(passage) for passage in passages)
+        total = sum(len(chunk) for chunk in chunks)
+        logger.info(
+            f"Re-análisis de {len(searchable)} categorías con {len(passages)} pasajes "
+            f"({sent:,} de {total:,} caracteres, {sent / total:.0%} del documento)"
+        )
+        return await analyzer.reanalyze_categories_async(searchable, passages)
+
+
+async def synthesize_document(
     pdf_path: Path,
-    extractor: PDFExtractor,
-    chunker: TextChunker,
-    analyzer: Analyzer,
+    partial_analyses: List[Dict],
+    first_pages: str,
+    metadata: dict,
     synthesizer: Synthesizer,
     validator: AnalysisValidator,
-    logger: logging.Logger
+    logger: logging.Logger,
+    journal: Optional[DocumentJournal] = None,
+    analyzer: Optional[ChunkAnalyzer] = None,
+    chunks: Optional[List[str]] = None
+) -> dict:
+    """
+    Sintetiza y valida los análisis parciales de un documento, y re-analiza
+    las categorías faltantes con los pasajes más relevantes.
+
+    Args:
+        pdf_path: Ruta al archivo PDF o TXT
+        partial_analyses: Análisis parciales válidos
+        first_pages: Texto de las primeras páginas
+        metadata: Metadata del candidato
+        synthesizer: Sintetizador
+        validator: Validador de completitud
+        logger: Logger
+        journal: Journal de checkpoints del documento (opcional)
+        analyzer: Analizador LLM para el re-análisis (None = sin re-análisis)
+        chunks: Chunks del documento (None = se vuelven a extraer si hace falta)
+
+    Returns:
+        Análisis consolidado con la información del archivo
+    """
+    # 6. Sintetizar resultados
+    with recorder.span("synthesize", partial_analyses=len(partial_analyses)):
+        final_analysis = journal.get_synthesis(partial_analyses, metadata) if journal else None
+        if final_analysis is None:
+            final_analysis, complete = await synthesizer.synthesize_async(
+                partial_analyses=partial_analyses,
+                original_text_sample=first_pages,
+                metadata=metadata
+            )
+            # Una síntesis de respaldo se vuelve a pedir al reanudar
+            if journal and complete:
+                journal.record_synthesis(partial_analyses, metadata, final_analysis)
+        else:
+            logger.info("Síntesis recuperada del checkpoint")
+
+    # 7. Validar completitud
+    with recorder.span("validate"):
+        validation_result = validator.validate_completeness(final_analysis)
+
+    # 8. Re-analizar categorías faltantes solo con los pasajes que las mencionan
+    if analyzer is not None and validator.should_reanalyze(validation_result):
+        if chunks is None:
+            extracted = await asyncio.to_thread(extract_and_chunk, pdf_path)
+            chunks = extracted[1] if extracted else []
+
+        reanalysis = await reanalyze_missing_categories(
+            validation_result["missing_categories"], chunks, analyzer, logger
+        )
+        if reanalysis is not None:
+            final_analysis = validator.merge_reanalysis(final_analysis, [reanalysis])
+            with recorder.span("validate"):
+                validator.validate_completeness(final_analysis)
+
+    validator.log_final_summary(final_analysis, pdf_path.name)
+
+    # Agregar información del archivo
+    final_analysis["pdf_filename"] = pdf_path.name
+    final_analysis["document_fingerprint"] = document_fingerprint(pdf_path)
+    final_analysis["processing_date"] = datetime.now().isoformat()
+
+    return final_analysis
+
+
+async def process_single_pdf(
+    pdf_path: Path,
+    analyzer: ChunkAnalyzer,
+    synthesizer: Synthesizer,
+    validator: AnalysisValidator,
+    logger: logging.Logger,
+    chunk_engine: ConcurrentChunkAnalyzer,
+    executor: Optional[Executor] = None,
+    extracted: Optional[Tuple[str, List[str], Dict[str, float]]] = None,
+    sink: Optional[ResultSink] = None
 ) -> dict:
     """
     Procesa un solo PDF y retorna el análisis consolidado.
 
     Args:
         pdf_path: Ruta al archivo PDF
-        extractor: Extractor de PDF
-        chunker: Chunker de texto
         analyzer: Analizador LLM
         synthesizer: Sintetizador
+        validator: Validador de completitud
         logger: Logger
+        chunk_engine: Motor concurrente de análisis de chunks
+        executor: Pool para extracción y chunking (None = en el proceso actual)
+        extracted: Resultado de extract_and_chunk ya calculado (modo batch)
+        sink: Salida JSONL para los análisis de chunk, a medida que terminan (opcional)
 
     Returns:
         Análisis consolidado del PDF
     """
+    log_document_header(logger, pdf_path)
+
+    journal = DocumentJournal(pdf_path.name) if ENABLE_CHECKPOINTS else None
+
+    on_chunk = partial(sink.write_chunk, pdf_path.name) if sink and sink.include_chunks else None
+    analyzed = await analyze_document(
+        pdf_path, analyzer, logger, chunk_engine, journal, executor, extracted, on_chunk
+    )
+    if analyzed is None:
+        return None
+
+    first_pages, chunks, chunk_results, metadata = analyzed
+    partial_analyses = [analysis for analysis in chunk_results if analysis]
+
+    logger.info(f"Análisis parciales completados: {len(partial_analyses)}/{len(chunk_results)}")
+
+    return await synthesize_document(
+        pdf_path, partial_analyses, first_pages, metadata, synthesizer, validator, logger,
+        journal, analyzer, chunks
+    )
+
+
+def log_document_header(logger: logging.Logger, pdf_path: Path) -> None:
+    """Separador en el log al empezar un documento."""
     logger.info("")
     logger.info("-" * 80)
     logger.info(f"Procesando: {pdf_path.name}")
     logger.info("-" * 80)
 
-    # 1. Extraer texto del PDF
-    text = extractor.extract_text(pdf_path)
-    if not text:
-        logger.error(f"No se pudo extraer texto de {pdf_path.name}")
-        return None
 
-    # 2. Extraer primeras páginas para metadata
-    first_pages = extractor.extract_first_pages(pdf_path, num_pages=3)
+async def process_documents(
+    document_files: List[Path],
+    analyzer: ChunkAnalyzer,
+    synthesizer: Synthesizer,
+    validator: AnalysisValidator,
+    logger: logging.Logger,
+    sink: ResultSink,
+    max_parallel: int = MAX_PARALLEL_DOCUMENTS
+) -> int:
+    """
+    Procesa todos los documentos, varios a la vez si max_parallel > 1.
 
-    # 3. Dividir en chunks
-    chunks = chunker.chunk_text(text)
-    logger.info(f"Documento dividido en {len(chunks)} chunks")
+    Cada resultado se escribe en el JSONL de resultados apenas termina su
+    documento, en vez de acumularlo en memoria hasta el final.
+
+    La extracción y el chunking corren en un pool de procesos; todas las
+    llamadas al LLM pasan por el scheduler compartido del analizador y
+    del sintetizador.
+
+    En modo batch, todos los documentos se extraen primero y sus chunks se
+    analizan en un único batch del proveedor antes de la síntesis.
+
+    Args:
+        document_files: Documentos a procesar
+        analyzer: Analizador LLM
+        synthesizer: Sintetizador
+        validator: Validador de completitud
+        logger: Logger
+        sink: Salida JSONL de los resultados
+        max_parallel: Máximo de documentos en proceso simultáneamente
+
+    Returns:
+        Número de documentos procesados (sin los fallidos)
+    """
+    use_batch = BATCH_MODE and getattr(analyzer, "supports_batch", False)
+    if BATCH_MODE and not use_batch:
+        logger.warning(f"{LLM_PROVIDER.upper()} no soporta modo batch; se usan llamadas interactivas")
+
+    chunk_engine = BatchChunkAnalyzer(analyzer) if use_batch else ConcurrentChunkAnalyzer(analyzer)
+    document_slots = asyncio.Semaphore(max(1, max_parallel))
+
+    executor = None
+    if max_parallel > 1:
+        workers = max(1, min(EXTRACTION_WORKERS, max_parallel, len(document_files)))
+        # Cada worker extrae las páginas de un PDF grande con su parte de los núcleos
+        page_workers = max(1, (os.cpu_count() or 1) // workers)
+        executor = ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=limit_extraction_workers,
+            initargs=(page_workers,)
+        )
+        logger.info(
+            f"Modo paralelo: {max_parallel} documentos simultáneos, "
+            f"{workers} procesos de extracción (hasta {page_workers} por PDF grande)"
+        )
 
-    # 4. Analizar cada chunk
-    partial_analyses = []
+    prepared = {}
+
+    async def process_with_slot(document_path: Path) -> bool:
+        async with document_slots:
+            try:
+                with recorder.span("document", document=document_path.name):
+                    result = await process_single_pdf(
+                        pdf_path=document_path,
+                        analyzer=analyzer,
+                        synthesizer=synthesizer,
+                        validator=validator,
+                        logger=logger,
+                        chunk_engine=chunk_engine,
+                        executor=executor,
+                        extracted=prepared.get(document_path),
+                        sink=sink
+                    )
+            except Exception as e:
+                if max_parallel <= 1:
+                    raise
+                logger.error(f"Error procesando {document_path.name}: {e}", exc_info=True)
+                return False
+
+            if result is None:
+                return False
+            sink.write_document(result)
+            return True
 
-    with tqdm(total=len(chunks), desc=f"Analizando {pdf_path.name}", unit="chunk") as pbar:
-        for i, chunk in enumerate(chunks, 1):
-            analysis = analyzer.analyze_chunk(chunk, i, len(chunks))
+    try:
+        if use_batch:
+            # Extraer todo primero y analizar los chunks de la ejecución en un batch
+            extractions = await asyncio.gather(
+                *(run_extraction(path, executor) for path in document_files)
+            )
+            prepared = {
+                path: extraction
+                for path, extraction in zip(document_files, extractions)
+                if extraction is not None
+            }
+            await chunk_engine.submit([
+                (chunks, DocumentJournal(path.name) if ENABLE_CHECKPOINTS else None)
+                for path, (_, chunks, _) in prepared.items()
+            ])
+
+        results = await asyncio.gather(
+            *(process_with_slot(path) for path in document_files)
+        )
+    finally:
+        if executor is not None:
+            executor.shutdown()
 
-            if analysis:
-                partial_analyses.append(analysis)
+    return sum(results)
 
-            pbar.update(1)
 
-    logger.info(f"Análisis parciales completados: {len(partial_analyses)}/{len(chunks)}")
+def select_documents(names: List[str]) -> List[Path]:
+    """
+    Documentos a procesar: los indicados (rutas o nombres en pdfs/) o todos.
 
-    # 5. Extraer metadata
-    metadata = analyzer.extract_metadata(first_pages)
+    Args:
+        names: Argumentos posicionales del subcomando
 
-    # 6. Sintetizar resultados
-    final_analysis = synthesizer.synthesize(
-        partial_analyses=partial_analyses,
-        original_text_sample=first_pages,
-        metadata=metadata
+    Returns:
+        Lista de rutas
+    """
+    if not names:
+        return find_documents()
+
+    documents = []
+    for name in names:
+        path = Path(name)
+        if not path.exists():
+            path = PDFS_DIR / name
+        if not path.exists():
+            raise FileNotFoundError(f"No se encontró el documento {name}")
+        documents.append(path)
+    return documents
+
+
+def create_components(logger: logging.Logger) -> dict:
+    """Crea scheduler, cache, proveedor, analizador y sintetizador de la ejecución."""
+    logger.info(f"Inicializando componentes con {LLM_PROVIDER.upper()}...")
+    scheduler = LLMScheduler()
+    cache = LLMCache() if ENABLE_LLM_CACHE else None
+    provider = get_provider()
+    analyzer = provider.create_analyzer(scheduler=scheduler, cache=cache)
+    # Las llamadas de síntesis y fusión se suman al uso de tokens y costo del analizador
+    synthesizer = provider.create_synthesizer(
+        scheduler=scheduler, cache=cache, on_response=analyzer.record_usage
     )
+    if HIERARCHICAL_SYNTHESIS:
+        synthesizer = HierarchicalSynthesizer(synthesizer)
 
-    # 7. Validar completitud y generar resumen
-    validation_result = validator.validate_completeness(final_analysis)
-    validator.log_final_summary(final_analysis, pdf_path.name)
+    return {
+        "scheduler": scheduler,
+        "cache": cache,
+        "provider": provider,
+        "analyzer": analyzer,
+        "synthesizer": synthesizer
+    }
 
-    # Agregar información del archivo
-    final_analysis["pdf_filename"] = pdf_path.name
-    final_analysis["processing_date"] = datetime.now().isoformat()
 
-    return final_analysis
+def log_usage_summary(logger: logging.Logger, components: dict, documents: int) -> None:
+    """
+    Muestra el uso de tokens, costo, cache y llamadas, y escribe el reporte
+    de métricas de la ejecución.
 
+    El uso y el costo del analizador incluyen las llamadas de síntesis,
+    fusión y re-análisis (ver create_components).
+    """
+    analyzer = components["analyzer"]
+    scheduler = components["scheduler"]
 
-def main():
-    """Función principal."""
-    logger = setup_logging()
+    # Mostrar uso de tokens y costo estimado
+    token_usage = analyzer.get_token_usage()
+    estimated_cost = analyzer.estimate_cost()
 
-    try:
-        # Encontrar documentos (PDF y TXT)
-        document_files = find_documents()
-        logger.info(f"Encontrados {len(document_files)} archivos:")
-        for doc in document_files:
-            logger.info(f"  - {doc.name}")
-
-        # Inicializar componentes
-        logger.info(f"Inicializando componentes con {LLM_PROVIDER.upper()}...")
-        extractor = PDFExtractor()
-        chunker = TextChunker()
-        analyzer = Analyzer()
-        synthesizer = Synthesizer()
-        validator = AnalysisValidator()
-
-        # Procesar cada documento
-        all_results = []
-
-        for document_path in document_files:
-            result = process_single_pdf(
-                pdf_path=document_path,
-                extractor=extractor,
-                chunker=chunker,
-                analyzer=analyzer,
-                synthesizer=synthesizer,
-                validator=validator,
-                logger=logger
+    logger.info("")
+    logger.info("Uso de Tokens:")
+    logger.info(f"  Input:  {token_usage['input_tokens']:,}")
+    logger.info(
+        f"    desde cache de prompts: {token_usage['cached_input_tokens']:,} "
+        f"(sin cache: {token_usage['uncached_input_tokens']:,})"
+    )
+    logger.info(f"  Output: {token_usage['output_tokens']:,}")
+    logger.info(f"  Total:  {token_usage['total_tokens']:,}")
+    logger.info(f"  Costo estimado: ${estimated_cost:.4f} USD")
+
+    if components["cache"]:
+        logger.info(
+            f"  Cache LLM: {token_usage['cache_hits']} hits, "
+            f"{token_usage['cache_misses']} misses "
+            f"({token_usage['cache_entries']} entradas)"
+        )
+
+    if LLM_PROVIDER == "fake":
+        fake_stats = components["provider"].backend.get_stats()
+        logger.info(
+            f"  Backend fake: {fake_stats['calls']} llamadas, "
+            f"{fake_stats['errors']} errores y {fake_stats['truncations']} "
+            f"respuestas truncadas inyectadas"
+        )
+
+    scheduler_stats = scheduler.get_stats()
+    logger.info(
+        f"  Llamadas LLM: {scheduler_stats['requests']} "
+        f"(rate limits: {scheduler_stats['rate_limit_hits']}, "
+        f"reintentos: {recorder.counter_value('llm_retries_total'):.0f}, "
+        f"espera: {scheduler_stats['wait_seconds']}s)"
+    )
+
+    # Tokens por etapa (incluye metadata y síntesis, no solo los chunks)
+    logger.info("  Tokens por etapa:")
+    for stage, usage in recorder.tokens_by_stage().items():
+        logger.info(
+            f"    {stage}: {usage['requests']} llamadas, "
+            f"{usage['input_tokens']:,} input "
+            f"({usage['cached_input_tokens']:,} desde cache), "
+            f"{usage['output_tokens']:,} output"
+        )
+    logger.info("=" * 80)
+
+    report_extra = {
+        "documents": documents,
+        "token_usage": token_usage,
+        "estimated_cost_usd": round(estimated_cost, 6),
+        "scheduler": scheduler_stats
+    }
+    if METRICS_REPORT_FILE:
+        recorder.write_json(Path(METRICS_REPORT_FILE), report_extra)
+    if PROMETHEUS_TEXTFILE:
+        recorder.write_prometheus(Path(PROMETHEUS_TEXTFILE))
+
+
+def command_run(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Pipeline completo: extracción, análisis, síntesis y validación."""
+    # Encontrar documentos (PDF y TXT)
+    document_files = select_documents(args.documents)
+    logger.info(f"Encontrados {len(document_files)} archivos:")
+    for doc in document_files:
+        logger.info(f"  - {doc.name}")
+
+    # Inicializar componentes
+    components = create_components(logger)
+    validator = AnalysisValidator()
+
+    # Compactar lo que haya dejado una ejecución interrumpida antes de empezar
+    sink = ResultSink()
+    sink.recover()
+
+    # Los resultados de esta ejecución reemplazan solo los de sus documentos;
+    # los recuperados y los de otros documentos de la entrada se conservan, y
+    # los de documentos borrados o renombrados se descartan
+    previous_results = load_previous_results(OUTPUT_FILE)
+    input_names = {path.name for path in list_documents() + document_files}
+    kept_results = drop_missing_results(previous_results, input_names)
+    if len(kept_results) < len(previous_results):
+        logger.info(
+            f"Descartados {len(previous_results) - len(kept_results)} resultados de "
+            f"documentos que ya no están en {PDFS_DIR.name}/"
+        )
+    previous_results = kept_results
+
+    # En modo incremental, reutilizar documentos sin cambios
+    documents_to_process = document_files
+    if INCREMENTAL_RUN:
+        reused, documents_to_process = split_unchanged(document_files, previous_results)
+        logger.info(
+            f"Modo incremental: {len(reused)} documentos sin cambios, "
+            f"{len(documents_to_process)} por procesar"
+        )
+
+    # Procesar documentos (secuencialmente o en paralelo)
+    processed = asyncio.run(process_documents(
+        document_files=documents_to_process,
+        analyzer=components["analyzer"],
+        synthesizer=components["synthesizer"],
+        validator=validator,
+        logger=logger,
+        sink=sink
+    ))
+    all_results = compact_results(previous_results)
+
+    logger.info("")
+    logger.info("=" * 80)
+    logger.info("ANÁLISIS COMPLETADO")
+    logger.info("=" * 80)
+    logger.info(f"Resultados guardados en: {OUTPUT_FILE}")
+    logger.info(f"Candidatos procesados: {processed} (total en archivo: {len(all_results)})")
+
+    log_usage_summary(logger, components, processed)
+
+
+def command_plan(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Extrae y divide los documentos y estima llamadas, tokens, costo y duración."""
+    observed = load_observed(args.report)
+    call_seconds = args.call_seconds or observed["call_seconds"] or DEFAULT_CALL_SECONDS
+    if observed["output_per_call"]:
+        logger.info(f"Tokens de salida por llamada según {args.report}")
+    else:
+        logger.info("Sin reporte de métricas previo: tokens de salida al máximo configurado (cota superior)")
+
+    plans = []
+    for path in select_documents(args.documents):
+        extracted = extract_and_chunk(path)
+        if extracted is None:
+            logger.error(f"No se pudo extraer texto de {path.name}")
+            continue
+        first_pages, chunks, _ = extracted
+        plans.append(plan_document(path.name, first_pages, chunks, observed))
+
+    totals = plan_totals(plans, provider_pricing(), call_seconds)
+
+    logger.info("")
+    logger.info(f"{'Documento':40s} {'Chunks':>7s} {'Llamadas':>9s} {'Input':>12s} {'Output':>10s} {'Costo USD':>10s}")
+    for plan in plans:
+        calls = sum(stage["calls"] for stage in plan["stages"].values())
+        input_tokens = sum(stage["input_tokens"] for stage in plan["stages"].values())
+        output_tokens = sum(stage["output_tokens"] for stage in plan["stages"].values())
+        logger.info(
+            f"{plan['document'][:40]:40s} {plan['chunks']:>7,} {calls:>9,} "
+            f"{input_tokens:>12,} {output_tokens:>10,} {plan['cost_usd']:>10.4f}"
+        )
+    logger.info(
+        f"{'TOTAL':40s} {totals['chunks']:>7,} {totals['calls']:>9,} "
+        f"{totals['input_tokens']:>12,} {totals['output_tokens']:>10,} {totals['cost_usd']:>10.4f}"
+    )
+
+    bounds = totals["wall_clock_bounds_s"]
+    logger.info("")
+    logger.info(
+        f"Proveedor {LLM_PROVIDER.upper()}: {totals['cached_input_tokens']:,} tokens de input "
+        f"desde cache de prompts"
+    )
+    logger.info(
+        f"Duración proyectada: {format_duration(totals['projected_wall_clock_s'])} "
+        f"(limitada por {totals['limited_by']}; concurrencia {format_duration(bounds['concurrency'])} "
+        f"con {call_seconds:.2f}s por llamada, requests/min {format_duration(bounds['requests_per_minute'])}, "
+        f"tokens/min {format_duration(bounds['tokens_per_minute'])})"
+    )
+
+    if args.output:
+        write_json_atomic(args.output, {"documents": plans, "totals": totals})
+        logger.info(f"Plan guardado en: {args.output}")
+
+
+def command_extract(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Extrae el texto de cada documento y lo guarda en output/stages/."""
+    artifacts = StageArtifacts()
+    extractor = PDFExtractor()
+
+    for path in select_documents(args.documents):
+        with recorder.span("extract", document=path.name):
+            document = extractor.load(path)
+            text = None
+            if document is not None:
+                with document:
+                    text = extractor.read_full_text(document)
+                    first_pages = document.first_pages(num_pages=3)
+                    pages = document.page_count
+                    # Por página, para que chunk pueda filtrar el boilerplate
+                    page_texts = list(document.iter_pages())
+
+        if not text:
+            logger.error(f"No se pudo extraer texto de {path.name}")
+            continue
+
+        saved = artifacts.save(path, "extract", {
+            "pages": pages,
+            "characters": len(text),
+            "first_pages": first_pages,
+            "page_texts": page_texts
+        })
+        logger.info(f"{path.name}: {pages} páginas, {len(text):,} caracteres → {saved.name}")
+
+
+def command_chunk(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Divide cada documento en chunks (desde el texto extraído si existe)."""
+    artifacts = StageArtifacts()
+    chunker = TextChunker()
+
+    for path in select_documents(args.documents):
+        extracted = artifacts.load(path, "extract")
+        if extracted is not None:
+            page_texts = extracted["page_texts"]
+            if BOILERPLATE_FILTER:
+                with recorder.span("filter", document=path.name):
+                    text = BoilerplateFilter().filter_text(page_texts, path.name)
+            else:
+                text = "\n\n".join(page_texts)
+            with recorder.span("chunk", document=path.name):
+                first_pages, chunks = extracted["first_pages"], chunker.chunk_text(text)
+        else:
+            result = extract_and_chunk(path)
+            if result is None:
+                logger.error(f"No se pudo extraer texto de {path.name}")
+                continue
+            first_pages, chunks, timings = result
+            for stage, seconds in timings.items():
+                recorder.record_span(stage, seconds, document=path.name)
+
+        saved = artifacts.save(path, "chunks", {"first_pages": first_pages, "chunks": chunks})
+        tokens = sum(estimate_tokens(chunk) for chunk in chunks)
+        logger.info(f"{path.name}: {len(chunks)} chunks, ~{tokens:,} tokens → {saved.name}")
+
+
+async def analyze_documents(
+    document_files: List[Path],
+    analyzer: ChunkAnalyzer,
+    logger: logging.Logger,
+    artifacts: StageArtifacts
+) -> int:
+    """
+    Analiza los chunks y la metadata de cada documento y guarda el resultado
+    para el subcomando synthesize.
+
+    Returns:
+        Número de documentos analizados
+    """
+    chunk_engine = ConcurrentChunkAnalyzer(analyzer)
+    document_slots = asyncio.Semaphore(max(1, MAX_PARALLEL_DOCUMENTS))
+
+    async def analyze_one(path: Path) -> bool:
+        async with document_slots:
+            with recorder.span("document", document=path.name):
+                log_document_header(logger, path)
+                saved = artifacts.load(path, "chunks")
+                extracted = (saved["first_pages"], saved["chunks"], {}) if saved else None
+
+                analyzed = await analyze_document(
+                    path, analyzer, logger, chunk_engine,
+                    journal=DocumentJournal(path.name) if ENABLE_CHECKPOINTS else None,
+                    extracted=extracted
+                )
+                if analyzed is None:
+                    return False
+
+                first_pages, _, chunk_results, metadata = analyzed
+                partial_analyses = [analysis for analysis in chunk_results if analysis]
+                logger.info(f"Análisis parciales completados: {len(partial_analyses)}/{len(chunk_results)}")
+                artifacts.save(path, "analysis", {
+                    "first_pages": first_pages,
+                    "metadata": metadata,
+                    "chunks": len(chunk_results),
+                    "partial_analyses": partial_analyses
+                })
+                return True
+
+    results = await asyncio.gather(*(analyze_one(path) for path in document_files))
+    return sum(results)
+
+
+def command_analyze(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Analiza chunks y metadata (sin síntesis) y guarda los análisis parciales."""
+    document_files = select_documents(args.documents)
+    components = create_components(logger)
+
+    analyzed = asyncio.run(analyze_documents(
+        document_files, components["analyzer"], logger, StageArtifacts()
+    ))
+    logger.info(f"Documentos analizados: {analyzed}/{len(document_files)} (ver {STAGES_DIR})")
+    log_usage_summary(logger, components, analyzed)
+
+
+async def synthesize_documents(
+    document_files: List[Path],
+    synthesizer: Synthesizer,
+    validator: AnalysisValidator,
+    logger: logging.Logger,
+    artifacts: StageArtifacts,
+    sink: ResultSink,
+    analyzer: Optional[ChunkAnalyzer] = None
+) -> int:
+    """
+    Sintetiza y valida los documentos con análisis guardado por analyze.
+
+    El re-análisis de categorías faltantes usa los chunks guardados por
+    chunk si existen.
+
+    Returns:
+        Número de documentos sintetizados (cada resultado va al JSONL)
+    """
+    document_slots = asyncio.Semaphore(max(1, MAX_PARALLEL_DOCUMENTS))
+
+    async def synthesize_one(path: Path) -> bool:
+        saved = artifacts.load(path, "analysis")
+        if saved is None:
+            logger.warning(f"{path.name}: sin análisis guardado; ejecuta antes 'python main.py analyze'")
+            return False
+
+        async with document_slots:
+            with recorder.span("document", document=path.name):
+                log_document_header(logger, path)
+                chunked = artifacts.load(path, "chunks")
+                result = await synthesize_document(
+                    path, saved["partial_analyses"], saved["first_pages"], saved["metadata"],
+                    synthesizer, validator, logger,
+                    journal=DocumentJournal(path.name) if ENABLE_CHECKPOINTS else None,
+                    analyzer=analyzer,
+                    chunks=chunked["chunks"] if chunked else None
+                )
+                sink.write_document(result)
+                return True
+
+    results = await asyncio.gather(*(synthesize_one(path) for path in document_files))
+    return sum(results)
+
+
+def command_synthesize(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Sintetiza los análisis guardados y actualiza el archivo de resultados."""
+    document_files = select_documents(args.documents)
+    components = create_components(logger)
+    sink = ResultSink()
+    sink.recover()
+
+    synthesized = asyncio.run(synthesize_documents(
+        document_files, components["synthesizer"], AnalysisValidator(), logger, StageArtifacts(),
+        sink, analyzer=components["analyzer"]
+    ))
+    all_results = compact_results(load_previous_results(OUTPUT_FILE))
+
+    logger.info(f"Resultados guardados en: {OUTPUT_FILE}")
+    logger.info(f"Candidatos sintetizados: {synthesized} (total en archivo: {len(all_results)})")
+    log_usage_summary(logger, components, synthesized)
+
+
+def command_compact(args: argparse.Namespace, logger: logging.Logger) -> None:
+    """Reconstruye el JSON consolidado desde el JSONL de resultados."""
+    all_results = compact_results(load_previous_results(OUTPUT_FILE))
+    logger.info(f"Resultados compactados desde {RESULTS_JSONL} en: {OUTPUT_FILE} ({len(all_results)} candidatos)")
+
+
+COMMANDS = {
+    "run": (command_run, "Pipeline completo (por defecto)"),
+    "plan": (command_plan, "Estima chunks, llamadas, tokens, costo y duración sin llamar al LLM"),
+    "extract": (command_extract, "Extrae el texto de los documentos"),
+    "chunk": (command_chunk, "Divide los documentos en chunks"),
+    "analyze": (command_analyze, "Analiza chunks y metadata (sin síntesis)"),
+    "synthesize": (command_synthesize, "Sintetiza, valida y re-analiza categorías faltantes"),
+    "compact": (command_compact, "Reconstruye el JSON consolidado desde el JSONL de resultados"),
+}
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """Parser de la línea de comandos con un subcomando por etapa."""
+    parser = argparse.ArgumentParser(description="Análisis de programas presidenciales")
+    parser.set_defaults(documents=[])
+    subparsers = parser.add_subparsers(dest="command", metavar="comando")
+
+    for name, (_, help_text) in COMMANDS.items():
+        subparser = subparsers.add_parser(name, help=help_text, description=help_text)
+        subparser.add_argument(
+            "documents", nargs="*",
+            help="Documentos a procesar (rutas o nombres en pdfs/); por defecto todos"
+        )
+        if name == "plan":
+            subparser.add_argument(
+                "--report", type=Path,
+                default=Path(METRICS_REPORT_FILE) if METRICS_REPORT_FILE else None,
+                help="Reporte de métricas previo para estimar tokens de salida y latencia"
+            )
+            subparser.add_argument(
+                "--call-seconds", type=float,
+                help=f"Duración por llamada al LLM (por defecto la del reporte o {DEFAULT_CALL_SECONDS:.0f}s)"
             )
+            subparser.add_argument("--output", type=Path, help="Guarda el plan como JSON")
 
-            if result:
-                all_results.append(result)
-
-        # Guardar resultados consolidados
-        output_data = {
-            "fecha_analisis": datetime.now().isoformat(),
-            "total_candidatos": len(all_results),
-            "candidatos": all_results
-        }
-
-        with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-            json.dump(output_data, f, ensure_ascii=False, indent=2)
-
-        logger.info("")
-        logger.info("=" * 80)
-        logger.info("ANÁLISIS COMPLETADO")
-        logger.info("=" * 80)
-        logger.info(f"Resultados guardados en: {OUTPUT_FILE}")
-        logger.info(f"Candidatos procesados: {len(all_results)}")
-
-        # Mostrar uso de tokens y costo estimado
-        token_usage = analyzer.get_token_usage()
-        estimated_cost = analyzer.estimate_cost()
-
-        logger.info("")
-        logger.info("Uso de Tokens:")
-        logger.info(f"  Input:  {token_usage['input_tokens']:,}")
-        logger.info(f"  Output: {token_usage['output_tokens']:,}")
-        logger.info(f"  Total:  {token_usage['total_tokens']:,}")
-        logger.info(f"  Costo estimado: ${estimated_cost:.4f} USD")
-        logger.info("=" * 80)
+    return parser
 
+
+def main(argv: Optional[List[str]] = None):
+    """Función principal."""
+    args = build_parser().parse_args(argv)
+    ensure_directories()
+    logger = setup_logging()
+
+    try:
+        COMMANDS[args.command or "run"][0](args, logger)
     except Exception as e:
         logger.error(f"Error en el proceso principal: {e}", exc_info=True)
         raise
@@ -8,16 +8,31 @@ información de programas presidenciales en formato PDF.
 __version__ = "1.0.0"
 __author__ = "Data Presidentes"
 
-from src.pdf_extractor import PDFExtractor, extract_pdf_text
-from src.text_chunker import TextChunker, chunk_text_smart
-from src.llm_analyzer import LLMAnalyzer
-from src.synthesizer import AnalysisSynthesizer
-
-__all__ = [
-    "PDFExtractor",
-    "extract_pdf_text",
-    "TextChunker",
-    "chunk_text_smart",
-    "LLMAnalyzer",
-    "AnalysisSynthesizer",
-]
+import importlib
+
+# Los símbolos públicos se importan al primer uso (PEP 562): importar
+# src.text_chunker o src.validator no carga PyMuPDF ni los SDK de los
+# proveedores
+_LAZY_EXPORTS = {
+    "PDFExtractor": "src.pdf_extractor",
+    "LoadedDocument": "src.pdf_extractor",
+    "extract_pdf_text": "src.pdf_extractor",
+    "TextChunker": "src.text_chunker",
+    "chunk_text_smart": "src.text_chunker",
+    "LLMAnalyzer": "src.llm_analyzer",
+    "AnalysisSynthesizer": "src.synthesizer",
+}
+
+__all__ = list(_LAZY_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_EXPORTS[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,90 @@
+"""
+Módulo para analizar los chunks de toda una ejecución en un solo batch.
+"""
+import logging
+from typing import Dict, List, Optional, Tuple
+from src.config import MAX_CONCURRENT_REQUESTS
+from src.checkpoint import DocumentJournal, content_hash
+from src.metrics import recorder
+from src.concurrent_analyzer import ConcurrentChunkAnalyzer
+
+logger = logging.getLogger(__name__)
+
+
+class BatchChunkAnalyzer(ConcurrentChunkAnalyzer):
+    """
+    Envía los chunks de todos los documentos como un único batch del
+    proveedor (más barato y sin pelear con los rate limits) y luego
+    entrega los resultados documento por documento.
+
+    Requiere un analizador con analyze_chunks_batch (LLMAnalyzer). Los
+    chunks que fallan en el batch se reintentan con llamadas interactivas
+    concurrentes, igual que ConcurrentChunkAnalyzer.
+    """
+
+    def __init__(self, analyzer, max_concurrency: int = MAX_CONCURRENT_REQUESTS):
+        """
+        Inicializa el motor batch.
+
+        Args:
+            analyzer: Analizador LLM con analyze_chunks_batch y analyze_chunk_async
+            max_concurrency: Llamadas simultáneas para reintentos interactivos
+        """
+        super().__init__(analyzer, max_concurrency)
+        self._results: Dict[str, Dict] = {}
+
+    async def submit(
+        self,
+        documents: List[Tuple[List[str], Optional[DocumentJournal]]]
+    ) -> None:
+        """
+        Analiza en un solo batch los chunks de todos los documentos.
+
+        Los chunks que ya están en el journal de su documento no se envían;
+        los resultados nuevos y completos se registran en el journal al
+        terminar el batch.
+
+        Args:
+            documents: Lista de (chunks del documento, journal o None)
+        """
+        items = []
+        owners = []
+
+        for chunks, journal in documents:
+            total_chunks = len(chunks)
+            for index, chunk in enumerate(chunks):
+                if journal and journal.get_chunk(chunk) is not None:
+                    continue
+                items.append((chunk, index + 1, total_chunks))
+                owners.append((chunk, journal, content_hash(chunk)))
+
+        if not items:
+            self.logger.info("Todos los chunks están en checkpoint; no se envía batch")
+            return
+
+        self.logger.info(f"Enviando {len(items)} chunks de {len(documents)} documentos en un batch")
+        with recorder.span("analyze", mode="batch", chunks=len(items)):
+            analyses = await self.analyzer.analyze_chunks_batch(items)
+
+        failed = 0
+        for (chunk, journal, key), (analysis, complete) in zip(owners, analyses):
+            if analysis is None:
+                failed += 1
+                continue
+            self._results[key] = analysis
+            if journal and complete:
+                journal.record_chunk(chunk, analysis)
+
+        if failed:
+            self.logger.warning(f"{failed} chunks fallaron en el batch; se reintentarán de forma interactiva")
+
+    def _recover(self, chunk: str, journal: Optional[DocumentJournal]) -> Optional[Dict]:
+        """
+        Análisis del checkpoint o del batch ya completado, si existe.
+
+        Igual que el journal, el batch identifica cada chunk por su contenido.
+        """
+        previous = super()._recover(chunk, journal)
+        if previous is None:
+            previous = self._results.get(content_hash(chunk))
+        return previous
@@ -0,0 +1,201 @@
+"""
+Servidor local que imita la API de Anthropic (Messages y Message Batches)
+para probar el modo batch sin conexión ni costo.
+
+Uso:
+    python -m src.batch_stub_server --port 8765
+    ANTHROPIC_BASE_URL=http://127.0.0.1:8765 BATCH_MODE=true BATCH_POLL_SECONDS=1 python main.py
+
+Las respuestas son las del proveedor fake (src/fake_llm.py): JSON válido y
+determinista según el tipo de prompt. No pretende reproducir la calidad del
+modelo, solo el protocolo.
+"""
+import argparse
+import json
+import logging
+import re
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from src.fake_llm import fake_response, request_text
+
+logger = logging.getLogger(__name__)
+
+BATCH_PATH = re.compile(r"^/v1/messages/batches/([\w-]+)(/results|/cancel)?$")
+
+
+def _message(params: Dict) -> Dict:
+    """Objeto Message de la API con la respuesta stub."""
+    prompt = request_text(params.get("system"), params.get("messages", []))
+    text = fake_response(prompt)
+    return {
+        "id": f"msg_{uuid.uuid4().hex[:24]}",
+        "type": "message",
+        "role": "assistant",
+        "model": params.get("model", "stub"),
+        "content": [{"type": "text", "text": text}],
+        "stop_reason": "end_turn",
+        "stop_sequence": None,
+        "usage": {
+            "input_tokens": len(prompt) // 4,
+            "output_tokens": len(text) // 4
+        }
+    }
+
+
+class StubState:
+    """Batches creados y parámetros del servidor stub."""
+
+    def __init__(self, processing_seconds: float, error_rate: float):
+        self.processing_seconds = processing_seconds
+        self.error_rate = error_rate
+        self.batches: Dict[str, Dict] = {}
+        self.lock = threading.Lock()
+
+    def create_batch(self, requests: List[Dict]) -> Dict:
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        now = datetime.now(timezone.utc)
+        with self.lock:
+            self.batches[batch_id] = {
+                "requests": requests,
+                "created": time.monotonic(),
+                "created_at": now.isoformat(),
+                "expires_at": (now + timedelta(days=1)).isoformat(),
+                "canceled": False
+            }
+        return self.batch_object(batch_id)
+
+    def batch_object(self, batch_id: str, base_url: str = "") -> Optional[Dict]:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+
+        total = len(batch["requests"])
+        ended = batch["canceled"] or time.monotonic() - batch["created"] >= self.processing_seconds
+        errored = int(total * self.error_rate) if ended else 0
+
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": {
+                "processing": 0 if ended else total,
+                "succeeded": total - errored if ended and not batch["canceled"] else 0,
+                "errored": errored if not batch["canceled"] else 0,
+                "canceled": total if batch["canceled"] else 0,
+                "expired": 0
+            },
+            "created_at": batch["created_at"],
+            "expires_at": batch["expires_at"],
+            "ended_at": datetime.now(timezone.utc).isoformat() if ended else None,
+            "cancel_initiated_at": None,
+            "archived_at": None,
+            "results_url": f"{base_url}/v1/messages/batches/{batch_id}/results" if ended else None
+        }
+
+    def results(self, batch_id: str) -> List[Dict]:
+        batch = self.batches[batch_id]
+        requests = batch["requests"]
+        errored = int(len(requests) * self.error_rate)
+        lines = []
+
+        for position, request in enumerate(requests):
+            if batch["canceled"]:
+                result = {"type": "canceled"}
+            elif position < errored:
+                result = {
+                    "type": "errored",
+                    "error": {"type": "error", "error": {"type": "api_error", "message": "stub"}}
+                }
+            else:
+                result = {"type": "succeeded", "message": _message(request["params"])}
+            lines.append({"custom_id": request["custom_id"], "result": result})
+        return lines
+
+
+def make_handler(state: StubState):
+    """Crea el handler HTTP ligado al estado del stub."""
+
+    class StubHandler(BaseHTTPRequestHandler):
+        def _send_json(self, status: int, payload) -> None:
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _read_json(self) -> Dict:
+            length = int(self.headers.get("Content-Length", 0))
+            return json.loads(self.rfile.read(length) or b"{}")
+
+        def _base_url(self) -> str:
+            return f"http://{self.headers.get('Host')}"
+
+        def do_POST(self):
+            path = self.path.split("?", 1)[0]
+            if path == "/v1/messages":
+                self._send_json(200, _message(self._read_json()))
+            elif path == "/v1/messages/batches":
+                self._send_json(200, state.create_batch(self._read_json()["requests"]))
+            else:
+                match = BATCH_PATH.match(path)
+                if match and match.group(2) == "/cancel" and match.group(1) in state.batches:
+                    state.batches[match.group(1)]["canceled"] = True
+                    self._send_json(200, state.batch_object(match.group(1), self._base_url()))
+                else:
+                    self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": path}})
+
+        def do_GET(self):
+            match = BATCH_PATH.match(self.path.split("?", 1)[0])
+            batch = state.batch_object(match.group(1), self._base_url()) if match else None
+            if batch is None:
+                self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            elif match.group(2) == "/results":
+                body = "\n".join(
+                    json.dumps(line, ensure_ascii=False) for line in state.results(match.group(1))
+                ).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/binary")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            else:
+                self._send_json(200, batch)
+
+        def log_message(self, format, *args):
+            logger.debug(format % args)
+
+    return StubHandler
+
+
+def main():
+    """Levanta el servidor stub."""
+    parser = argparse.ArgumentParser(description="Servidor local que imita la API de batches de Anthropic")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--processing-seconds", type=float, default=2.0,
+                        help="Segundos que un batch permanece en proceso")
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fracción de requests de cada batch que terminan con error")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = ThreadingHTTPServer(
+        (args.host, args.port),
+        make_handler(StubState(args.processing_seconds, args.error_rate))
+    )
+    logger.info(f"Stub de la API escuchando en http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Filtro local de boilerplate y páginas de poca información antes del chunking.
+
+Los programas traen portadas, índices, páginas separadoras, menús de la web,
+pies de página y lemas repetidos. Todo eso se enviaría al LLM como parte de
+los chunks sin aportar propuestas.
+"""
+import logging
+import re
+from collections import Counter
+from typing import Dict, Iterable, Iterator, List
+from src.config import (
+    BOILERPLATE_REPEAT_LIMIT, BOILERPLATE_MIN_PAGE_WORDS, BOILERPLATE_MENU_MIN_LINES
+)
+from src.near_duplicates import normalize_text
+
+logger = logging.getLogger(__name__)
+
+LETTER_PATTERN = re.compile(r"[^\W\d_]")
+DIGIT_PATTERN = re.compile(r"\d+")
+
+# Entrada de índice: texto, relleno de puntos (o espacios) y número de página
+TOC_ENTRY_PATTERN = re.compile(r"^\S.{2,}?(?:\.{3,}|…+|\s{3,})\s*\d{1,4}$")
+
+# Viñetas o numeración al inicio de una línea: las listas de propuestas se conservan
+BULLET_PATTERN = re.compile(r"^\s*(?:[-•*▪●◦–]|\d{1,3}[.)])\s")
+
+# Puntuación de cierre de una oración
+SENTENCE_END = (".", ":", ";", "?", "!")
+
+# Un bloque es un menú si al menos esta fracción de sus líneas son rótulos:
+# pocas palabras, más cortas que las líneas típicas de la página, sin
+# puntuación de cierre, cifras ni viñetas, y sin continuar una oración
+MENU_LABEL_MAX_WORDS = 8
+MENU_LABEL_SHARE = 0.8
+MENU_LABEL_MAX_MEDIAN_RATIO = 0.6
+
+# Una línea que termina así sigue en la siguiente (prosa cortada en columnas)
+CONTINUATION_END = (",", "-", "(")
+CONTINUATION_WORDS = frozenset(
+    "a al ante bajo con contra de del desde e el en entre hacia hasta la las lo los "
+    "mediante ni o para por que se sin sobre su sus tras u un una y".split()
+)
+
+# Largo máximo (caracteres) de una línea que puede ser encabezado o pie repetido
+REPEATED_LINE_MAX_CHARS = 100
+
+
+class BoilerplateFilter:
+    """
+    Descarta texto de poca información, en una sola pasada por las páginas
+    (sirve también para el pipeline en streaming):
+
+    - Líneas sin letras (números de página, separadores) y entradas de índice.
+    - Líneas cortas repetidas (encabezados, pies, lemas): se conservan las
+      primeras BOILERPLATE_REPEAT_LIMIT - 1 apariciones.
+    - Bloques formados casi solo por rótulos cortos sin puntuación, cifras
+      ni viñetas (menús, índices sin número, listas de leyendas de fotos).
+      Las líneas de prosa cortada en columnas angostas no cuentan como
+      rótulos: continúan la oración o tienen el largo típico de la página.
+    - Páginas que quedan con menos de BOILERPLATE_MIN_PAGE_WORDS palabras
+      (portadas, separadores, páginas de fotos), si el documento tiene más
+      de una página.
+    """
+
+    def __init__(
+        self,
+        repeat_limit: int = BOILERPLATE_REPEAT_LIMIT,
+        min_page_words: int = BOILERPLATE_MIN_PAGE_WORDS,
+        menu_min_lines: int = BOILERPLATE_MENU_MIN_LINES
+    ):
+        """
+        Inicializa el filtro.
+
+        Args:
+            repeat_limit: Aparición desde la cual una línea repetida se descarta
+            min_page_words: Palabras mínimas para conservar una página
+            menu_min_lines: Líneas mínimas de un bloque para tratarlo como menú
+        """
+        self.repeat_limit = repeat_limit
+        self.min_page_words = min_page_words
+        self.menu_min_lines = menu_min_lines
+        self.seen_lines: Counter = Counter()
+        self.stats = {
+            "pages": 0,
+            "input_chars": 0,
+            "dropped_chars": 0,
+            "dropped_pages": 0,
+            "dropped_lines": 0,
+            "dropped_blocks": 0
+        }
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def _keep_line(self, line: str) -> bool:
+        """True si la línea aporta información (y registra las repetidas)."""
+        stripped = line.strip()
+        if not stripped:
+            return True
+        if not LETTER_PATTERN.search(stripped) or TOC_ENTRY_PATTERN.match(stripped):
+            return False
+
+        if len(stripped) <= REPEATED_LINE_MAX_CHARS:
+            # Los números (de página, de año) no distinguen un pie de otro
+            key = DIGIT_PATTERN.sub("#", normalize_text(stripped))
+            if len(key.split()) >= 2:
+                self.seen_lines[key] += 1
+                if self.seen_lines[key] >= self.repeat_limit:
+                    return False
+        return True
+
+    @staticmethod
+    def _continues(line: str, next_line: str) -> bool:
+        """True si la oración de la línea sigue en la siguiente."""
+        stripped = line.rstrip()
+        words = stripped.split()
+        if stripped.endswith(CONTINUATION_END) or (words and words[-1].lower() in CONTINUATION_WORDS):
+            return True
+        return next_line.lstrip()[:1].islower()
+
+    def _is_menu(self, lines: List[str], typical_length: float) -> bool:
+        """
+        True si el bloque es una lista de rótulos cortos (menú, índice, leyendas).
+
+        Args:
+            lines: Líneas no vacías del bloque
+            typical_length: Largo típico de las líneas de la página (ver _typical_length)
+        """
+        if len(lines) < self.menu_min_lines:
+            return False
+        max_length = MENU_LABEL_MAX_MEDIAN_RATIO * typical_length
+        labels = sum(
+            1 for line, next_line in zip(lines, lines[1:] + [""])
+            if len(line.split()) <= MENU_LABEL_MAX_WORDS
+            and len(line.strip()) <= max_length
+            and not line.rstrip().endswith(SENTENCE_END)
+            and not DIGIT_PATTERN.search(line)
+            and not BULLET_PATTERN.match(line)
+            and not self._continues(line, next_line)
+        )
+        return labels >= MENU_LABEL_SHARE * len(lines)
+
+    @staticmethod
+    def _typical_length(page: str) -> int:
+        """
+        Largo mediano de las líneas de la página, ponderado por caracteres:
+        la mitad del texto está en líneas al menos así de largas. Un menú de
+        muchas líneas cortas no baja la referencia de la prosa que lo rodea.
+        """
+        lengths = sorted(len(line.strip()) for line in page.splitlines() if line.strip())
+        remaining = sum(lengths) / 2
+        for length in reversed(lengths):
+            remaining -= length
+            if remaining <= 0:
+                return length
+        return 0
+
+    def _filter_page(self, page: str) -> str:
+        """Texto de la página sin las líneas y bloques descartados."""
+        typical_length = self._typical_length(page)
+        kept_blocks = []
+        for block in re.split(r"\n\s*\n", page):
+            lines = [line for line in block.splitlines() if line.strip()]
+            kept = [line for line in lines if self._keep_line(line)]
+            self.stats["dropped_lines"] += len(lines) - len(kept)
+
+            if self._is_menu(kept, typical_length):
+                self.stats["dropped_blocks"] += 1
+                continue
+            if kept:
+                kept_blocks.append("\n".join(kept))
+        return "\n\n".join(kept_blocks)
+
+    def filter_pages(self, pages: Iterable[str], name: str = "") -> Iterator[str]:
+        """
+        Filtra las páginas de un documento a medida que se leen.
+
+        Args:
+            pages: Texto de cada página (un TXT sin saltos de página es una sola)
+            name: Nombre del documento (para el reporte en el log)
+
+        Yields:
+            Texto filtrado de cada página conservada
+        """
+        pending_short = []
+
+        for page in pages:
+            self.stats["pages"] += 1
+            self.stats["input_chars"] += len(page)
+            filtered = self._filter_page(page)
+
+            if len(filtered.split()) < self.min_page_words:
+                # Se decide al final: si el documento tiene una sola página, se conserva
+                pending_short.append((page, filtered))
+                continue
+
+            self.stats["dropped_chars"] += len(page) - len(filtered)
+            yield filtered
+
+        if pending_short and self.stats["pages"] == 1:
+            page, filtered = pending_short.pop()
+            self.stats["dropped_chars"] += len(page) - len(filtered)
+            if filtered:
+                yield filtered
+
+        for page, _ in pending_short:
+            self.stats["dropped_pages"] += 1
+            self.stats["dropped_chars"] += len(page)
+
+        self.log_report(name)
+
+    def filter_text(self, pages: Iterable[str], name: str = "") -> str:
+        """Texto filtrado completo, con las páginas unidas por líneas en blanco."""
+        return "\n\n".join(self.filter_pages(pages, name))
+
+    def log_report(self, name: str = "") -> Dict[str, int]:
+        """Reporta (y retorna) lo descartado del documento."""
+        stats = self.stats
+        share = stats["dropped_chars"] / stats["input_chars"] if stats["input_chars"] else 0.0
+        self.logger.info(
+            f"Boilerplate{f' en {name}' if name else ''}: "
+            f"{stats['dropped_chars']:,} de {stats['input_chars']:,} caracteres descartados ({share:.1%}); "
+            f"{stats['dropped_pages']} páginas, {stats['dropped_blocks']} bloques y "
+            f"{stats['dropped_lines']} líneas"
+        )
+        return stats
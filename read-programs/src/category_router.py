@@ -0,0 +1,322 @@
+"""
+Enrutador local de categorías: decide, sin llamar al LLM, qué categorías
+puede cubrir un chunk para pedir al modelo solo esas.
+
+Usa las palabras clave de cada categoría (ver src.retrieval) y, si existe,
+un modelo entrenado desde resultados anteriores (analisis_consolidado.json):
+una regresión logística por categoría sobre features de palabras con hashing.
+
+Uso (entrenamiento):
+    python -m src.category_router output/analisis_consolidado.json [otros.json ...]
+"""
+import argparse
+import json
+import logging
+import math
+import random
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from src.config import (
+    CATEGORIAS, CATEGORY_ROUTING, CATEGORY_ROUTER_MODEL, CATEGORY_ROUTER_THRESHOLD,
+    CATEGORY_ROUTER_MIN_HITS, CATEGORY_ROUTER_MIN_DENSITY, CATEGORY_ROUTER_MIN_CATEGORIES,
+    OUTPUT_FILE
+)
+from src.incremental import write_json_atomic
+from src.retrieval import category_query, split_passages, text_terms, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Dimensión del espacio de features (hashing de palabras)
+FEATURE_BITS = 18
+
+# Versión de los features; cambia si cambia la tokenización de src.retrieval,
+# y un modelo guardado con otra versión no se usa
+FEATURE_VERSION = 2
+
+# Largo de los pasajes que se clasifican: del orden de una propuesta o cita,
+# que es el tamaño de los ejemplos de entrenamiento
+PASSAGE_CHARS = 1000
+
+# Categorías que no dependen de palabras clave y siempre se piden
+ALWAYS_ROUTED = ("Perfil y Estilo Político del Candidato",)
+
+
+def hashed_features(text: str) -> Dict[int, float]:
+    """Features binarias de las palabras del texto, con norma L2 = 1."""
+    buckets = {zlib.crc32(token.encode("utf-8")) & ((1 << FEATURE_BITS) - 1) for token in tokenize(text)}
+    if not buckets:
+        return {}
+    value = 1 / math.sqrt(len(buckets))
+    return {bucket: value for bucket in buckets}
+
+
+def _sigmoid(z: float) -> float:
+    if z < -30:
+        return 0.0
+    return 1 / (1 + math.exp(-z))
+
+
+class CategoryRouter:
+    """Selecciona las categorías plausibles de un chunk."""
+
+    def __init__(
+        self,
+        weights: Optional[Dict[str, Dict[int, float]]] = None,
+        bias: Optional[Dict[str, float]] = None,
+        threshold: float = CATEGORY_ROUTER_THRESHOLD,
+        min_hits: int = CATEGORY_ROUTER_MIN_HITS,
+        min_density: float = CATEGORY_ROUTER_MIN_DENSITY,
+        min_categories: int = CATEGORY_ROUTER_MIN_CATEGORIES
+    ):
+        """
+        Inicializa el enrutador.
+
+        Args:
+            weights: Pesos por categoría del modelo entrenado (None = solo palabras clave)
+            bias: Sesgo por categoría del modelo entrenado
+            threshold: Probabilidad mínima del modelo entrenado para pedir una categoría
+            min_hits: Menciones de palabras clave mínimas para pedir una categoría
+            min_density: Menciones mínimas por palabra del chunk
+            min_categories: Categorías mínimas por chunk (se completan por menciones)
+        """
+        self.weights = weights
+        self.bias = bias or {}
+        self.threshold = threshold
+        self.min_hits = min_hits
+        self.min_density = min_density
+        self.min_categories = min_categories
+        self.queries = {category: set(category_query(category)) for category in CATEGORIAS}
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    @property
+    def trained(self) -> bool:
+        """True si hay un modelo entrenado además de las palabras clave."""
+        return self.weights is not None
+
+    def _lexical_scores(self, chunk_text: str) -> Tuple[Dict[str, float], float]:
+        """
+        Menciones de las palabras clave de cada categoría en el chunk.
+
+        Las palabras clave de varias palabras cuentan solo como frase.
+
+        Returns:
+            Tupla (menciones por categoría, menciones mínimas para pedir una
+            categoría según el largo del chunk)
+        """
+        counts = Counter(text_terms(chunk_text))
+        hits = {
+            category: float(sum(counts[term] for term in query))
+            for category, query in self.queries.items()
+        }
+        return hits, max(self.min_hits, self.min_density * len(tokenize(chunk_text)))
+
+    def _model_scores(self, chunk_text: str) -> Dict[str, float]:
+        """Probabilidad máxima de cada categoría entre los pasajes del chunk."""
+        scores = {category: 0.0 for category in CATEGORIAS}
+        for passage in split_passages([chunk_text], PASSAGE_CHARS):
+            features = hashed_features(passage)
+            for category in CATEGORIAS:
+                weights = self.weights.get(category, {})
+                z = self.bias.get(category, 0.0) + sum(
+                    value * weights.get(bucket, 0.0) for bucket, value in features.items()
+                )
+                scores[category] = max(scores[category], _sigmoid(z))
+        return scores
+
+    def route(self, chunk_text: str) -> List[str]:
+        """
+        Categorías a pedir al LLM para un chunk, en el orden de CATEGORIAS.
+
+        Se pide una categoría si sus palabras clave aparecen al menos
+        min_hits veces y min_density veces por palabra del chunk o, con
+        modelo entrenado, si algún pasaje del chunk supera el umbral de
+        probabilidad. El modelo solo agrega categorías: cubre las que se
+        expresan sin las palabras clave.
+
+        Args:
+            chunk_text: Texto del chunk
+
+        Returns:
+            Categorías seleccionadas, más las de ALWAYS_ROUTED y, si faltan,
+            las de más menciones hasta min_categories
+        """
+        lexical, cutoff = self._lexical_scores(chunk_text)
+        selected = {category for category, hits in lexical.items() if hits >= cutoff}
+        if self.trained:
+            selected.update(
+                category for category, probability in self._model_scores(chunk_text).items()
+                if probability >= self.threshold
+            )
+        selected.update(ALWAYS_ROUTED)
+
+        for category in sorted(lexical, key=lexical.get, reverse=True):
+            if len(selected) >= self.min_categories:
+                break
+            selected.add(category)
+
+        return [category for category in CATEGORIAS if category in selected]
+
+    def train(
+        self,
+        examples: List[Tuple[str, Set[str]]],
+        epochs: int = 8,
+        learning_rate: float = 0.5,
+        l2: float = 1e-4,
+        seed: int = 42
+    ) -> None:
+        """
+        Entrena una regresión logística por categoría (SGD) sobre los ejemplos.
+
+        Args:
+            examples: Pares (texto, categorías a las que pertenece)
+            epochs: Pasadas sobre los ejemplos
+            learning_rate: Tasa de aprendizaje
+            l2: Regularización L2
+            seed: Semilla del orden de los ejemplos
+        """
+        featurized = [(hashed_features(text), labels) for text, labels in examples]
+        featurized = [(features, labels) for features, labels in featurized if features]
+        weights: Dict[str, Dict[int, float]] = {category: {} for category in CATEGORIAS}
+        bias = {category: 0.0 for category in CATEGORIAS}
+        rng = random.Random(seed)
+
+        for _ in range(epochs):
+            rng.shuffle(featurized)
+            for features, labels in featurized:
+                for category in CATEGORIAS:
+                    category_weights = weights[category]
+                    z = bias[category] + sum(
+                        value * category_weights.get(bucket, 0.0) for bucket, value in features.items()
+                    )
+                    gradient = _sigmoid(z) - (1.0 if category in labels else 0.0)
+                    bias[category] -= learning_rate * gradient
+                    for bucket, value in features.items():
+                        current = category_weights.get(bucket, 0.0)
+                        category_weights[bucket] = current - learning_rate * (gradient * value + l2 * current)
+
+        # Pesos casi nulos no aportan y solo agrandan el archivo
+        self.weights = {
+            category: {bucket: w for bucket, w in category_weights.items() if abs(w) >= 1e-3}
+            for category, category_weights in weights.items()
+        }
+        self.bias = bias
+        self.logger.info(f"Enrutador entrenado con {len(featurized)} ejemplos")
+
+    def save(self, path: Path = CATEGORY_ROUTER_MODEL) -> None:
+        """Guarda el modelo entrenado (escritura atómica)."""
+        write_json_atomic(path, {
+            "feature_bits": FEATURE_BITS,
+            "feature_version": FEATURE_VERSION,
+            "categories": CATEGORIAS,
+            "bias": self.bias,
+            "weights": {
+                category: {str(bucket): round(w, 5) for bucket, w in weights.items()}
+                for category, weights in (self.weights or {}).items()
+            }
+        })
+
+    @classmethod
+    def load(cls, path: Path = CATEGORY_ROUTER_MODEL) -> "CategoryRouter":
+        """
+        Carga el modelo entrenado o, si no existe o no es compatible, un
+        enrutador solo con palabras clave.
+
+        Args:
+            path: Archivo del modelo
+
+        Returns:
+            Enrutador listo para usar
+        """
+        if not Path(path).exists():
+            return cls()
+
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"No se pudo leer el modelo del enrutador {path}: {e}")
+            return cls()
+
+        if data.get("feature_bits") != FEATURE_BITS or data.get("categories") != CATEGORIAS:
+            logger.warning(f"El modelo del enrutador {path} es de otras categorías; se usan solo palabras clave")
+            return cls()
+
+        if data.get("feature_version") != FEATURE_VERSION:
+            logger.warning(
+                f"El modelo del enrutador {path} usa otros features; reentrenar con "
+                f"python -m src.category_router. Se usan solo palabras clave"
+            )
+            return cls()
+
+        weights = {
+            category: {int(bucket): w for bucket, w in category_weights.items()}
+            for category, category_weights in data["weights"].items()
+        }
+        return cls(weights=weights, bias=data["bias"])
+
+
+def default_router() -> Optional[CategoryRouter]:
+    """Enrutador según la configuración (None si CATEGORY_ROUTING está desactivado)."""
+    return CategoryRouter.load() if CATEGORY_ROUTING else None
+
+
+def training_examples(results_files: Iterable[Path]) -> List[Tuple[str, Set[str]]]:
+    """
+    Ejemplos de entrenamiento desde resultados consolidados anteriores.
+
+    Cada propuesta (título + descripción) y cada cita de una categoría
+    presente es un ejemplo de esa categoría.
+
+    Args:
+        results_files: Archivos analisis_consolidado.json
+
+    Returns:
+        Pares (texto, {categoría})
+    """
+    examples = []
+    for path in results_files:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        for candidate in data.get("candidatos", []):
+            for cat_data in candidate.get("categorias", []):
+                category = cat_data.get("categoria")
+                if category not in CATEGORIAS or not cat_data.get("presente", True):
+                    continue
+                for proposal in cat_data.get("propuestas_clave", []):
+                    if isinstance(proposal, dict):
+                        text = f"{proposal.get('titulo', '')} {proposal.get('descripcion', '')}"
+                    else:
+                        text = str(proposal)
+                    examples.append((text, {category}))
+                for quote in cat_data.get("citas_textuales", []):
+                    examples.append((str(quote), {category}))
+    return examples
+
+
+def main():
+    """Entrena el enrutador con resultados anteriores."""
+    parser = argparse.ArgumentParser(description="Entrena el enrutador local de categorías")
+    parser.add_argument("results", nargs="*", type=Path, default=[OUTPUT_FILE],
+                        help="Archivos analisis_consolidado.json (por defecto el actual)")
+    parser.add_argument("--output", type=Path, default=CATEGORY_ROUTER_MODEL,
+                        help="Archivo del modelo entrenado")
+    parser.add_argument("--epochs", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    examples = training_examples(args.results)
+    if not examples:
+        raise SystemExit("Los resultados no tienen propuestas ni citas para entrenar")
+
+    counts = Counter(category for _, labels in examples for category in labels)
+    for category in CATEGORIAS:
+        logger.info(f"  {category}: {counts[category]} ejemplos")
+
+    router = CategoryRouter()
+    router.train(examples, epochs=args.epochs)
+    router.save(args.output)
+    logger.info(f"Modelo guardado en: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
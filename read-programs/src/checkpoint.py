@@ -0,0 +1,220 @@
+"""
+Journal de checkpoints por documento para reanudar ejecuciones interrumpidas.
+"""
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from src.config import (
+    CHECKPOINTS_DIR, MODEL_NAME, CATEGORIAS, MAX_TOKENS_OUTPUT_CHUNK, MAX_TOKENS_OUTPUT_SYNTHESIS,
+    CHUNK_SIZING, MAX_TOKENS_PER_CHUNK, CHUNK_OVERLAP_TOKENS, MAX_CHARS_PER_CHUNK, CHUNK_OVERLAP_CHARS,
+    BOILERPLATE_FILTER, BOILERPLATE_REPEAT_LIMIT, BOILERPLATE_MIN_PAGE_WORDS, BOILERPLATE_MENU_MIN_LINES,
+    CATEGORY_ROUTING, CATEGORY_ROUTER_MODEL, CATEGORY_ROUTER_THRESHOLD, CATEGORY_ROUTER_MIN_HITS,
+    CATEGORY_ROUTER_MIN_DENSITY, CATEGORY_ROUTER_MIN_CATEGORIES,
+    HIERARCHICAL_SYNTHESIS, SYNTHESIS_GROUP_SIZE, SYNTHESIS_GROUP_MAX_TOKENS,
+    COMPACT_SYNTHESIS_PAYLOAD, NEAR_DUPLICATE_THRESHOLD,
+    REANALYZE_MISSING_CATEGORIES, REANALYSIS_TOP_K, REANALYSIS_PASSAGE_CHARS
+)
+from src.prompts import (
+    CHUNK_ANALYSIS_PROMPT, SYNTHESIS_PROMPT, METADATA_EXTRACTION_PROMPT, MERGE_PROMPT,
+    REANALYSIS_PROMPT, CONTINUATION_PROMPT
+)
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(value: Any) -> str:
+    """
+    Hash SHA-256 de un texto o de una estructura serializable a JSON.
+
+    Args:
+        value: Texto o estructura JSON
+
+    Returns:
+        Hash en hexadecimal
+    """
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def pipeline_config() -> Dict[str, Any]:
+    """
+    Configuración que determina los resultados del pipeline.
+
+    Es la única lista de opciones que se hashea, tanto en la firma de los
+    journals (pipeline_signature) como en la huella de los documentos
+    (src.incremental.document_fingerprint). Una opción nueva que cambie los
+    chunks, los prompts o los resultados debe agregarse aquí.
+
+    Returns:
+        Diccionario con el modelo, los prompts y las opciones de chunking,
+        filtrado, enrutamiento, síntesis y re-análisis
+    """
+    router_model = None
+    if CATEGORY_ROUTING and CATEGORY_ROUTER_MODEL.exists():
+        router_model = hashlib.sha256(CATEGORY_ROUTER_MODEL.read_bytes()).hexdigest()
+
+    return {
+        "model": MODEL_NAME,
+        "categories": CATEGORIAS,
+        "prompts": [
+            CHUNK_ANALYSIS_PROMPT, SYNTHESIS_PROMPT, METADATA_EXTRACTION_PROMPT,
+            MERGE_PROMPT, REANALYSIS_PROMPT, CONTINUATION_PROMPT
+        ],
+        "max_output_tokens": [MAX_TOKENS_OUTPUT_CHUNK, MAX_TOKENS_OUTPUT_SYNTHESIS],
+        "chunking": [
+            CHUNK_SIZING, MAX_TOKENS_PER_CHUNK, CHUNK_OVERLAP_TOKENS,
+            MAX_CHARS_PER_CHUNK, CHUNK_OVERLAP_CHARS
+        ],
+        "boilerplate": [
+            BOILERPLATE_FILTER, BOILERPLATE_REPEAT_LIMIT, BOILERPLATE_MIN_PAGE_WORDS,
+            BOILERPLATE_MENU_MIN_LINES
+        ],
+        "routing": [
+            CATEGORY_ROUTING, router_model, CATEGORY_ROUTER_THRESHOLD, CATEGORY_ROUTER_MIN_HITS,
+            CATEGORY_ROUTER_MIN_DENSITY, CATEGORY_ROUTER_MIN_CATEGORIES
+        ],
+        "synthesis": [
+            HIERARCHICAL_SYNTHESIS, SYNTHESIS_GROUP_SIZE, SYNTHESIS_GROUP_MAX_TOKENS,
+            COMPACT_SYNTHESIS_PAYLOAD, NEAR_DUPLICATE_THRESHOLD
+        ],
+        "reanalysis": [REANALYZE_MISSING_CATEGORIES, REANALYSIS_TOP_K, REANALYSIS_PASSAGE_CHARS]
+    }
+
+
+def pipeline_signature() -> str:
+    """
+    Firma de la configuración del pipeline (ver pipeline_config).
+
+    Si cambia el modelo, algún prompt o una opción de chunking, filtrado,
+    enrutamiento o síntesis, los resultados guardados dejan de ser válidos.
+
+    Returns:
+        Hash que identifica la versión del pipeline
+    """
+    return content_hash(pipeline_config())
+
+
+class DocumentJournal:
+    """
+    Journal append-only (JSONL) con el trabajo terminado de un documento.
+
+    Registra cada análisis de chunk, la metadata y la síntesis junto con un
+    hash de su entrada. Al reanudar, solo se reutilizan registros cuya
+    entrada coincide; el resto se vuelve a pedir al LLM.
+    """
+
+    def __init__(
+        self,
+        document_name: str,
+        directory: Path = CHECKPOINTS_DIR,
+        signature: Optional[str] = None
+    ):
+        """
+        Abre (o crea) el journal de un documento.
+
+        Args:
+            document_name: Nombre del archivo del documento
+            directory: Carpeta donde se guardan los journals
+            signature: Firma del pipeline (por defecto pipeline_signature())
+        """
+        self.path = Path(directory) / f"{document_name}.jsonl"
+        self.signature = signature or pipeline_signature()
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._records: Dict[str, Dict[str, Any]] = {}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._load()
+
+    def _load(self) -> None:
+        """Carga los registros existentes o reinicia el journal si es de otra versión."""
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+
+            header = self._parse_line(lines[0]) if lines else None
+            if header and header.get("type") == "header" and header.get("signature") == self.signature:
+                for line in lines[1:]:
+                    record = self._parse_line(line)
+                    if record and "key" in record:
+                        self._records[record["key"]] = record
+                if self._records:
+                    self.logger.info(
+                        f"Checkpoint encontrado para {self.path.stem}: "
+                        f"{len(self._records)} resultados reutilizables"
+                    )
+                return
+
+            self.logger.info(f"Checkpoint de {self.path.stem} es de otra versión del pipeline, se reinicia")
+
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({"type": "header", "signature": self.signature}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _parse_line(line: str) -> Optional[Dict[str, Any]]:
+        """Parsea una línea del journal, ignorando líneas truncadas."""
+        try:
+            return json.loads(line)
+        except json.JSONDecodeError:
+            return None
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        """Agrega un registro al journal y lo fuerza a disco."""
+        self._records[record["key"]] = record
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def _get(self, kind: str, input_value: Any) -> Optional[Any]:
+        """Busca un registro por tipo y hash de su entrada."""
+        record = self._records.get(f"{kind}:{content_hash(input_value)}")
+        return record["value"] if record else None
+
+    def _record(self, kind: str, input_value: Any, value: Any) -> None:
+        """Guarda un registro indexado por tipo y hash de su entrada."""
+        self._append({"type": kind, "key": f"{kind}:{content_hash(input_value)}", "value": value})
+
+    def get_chunk(self, chunk_text: str) -> Optional[Dict]:
+        """
+        Retorna el análisis guardado de un chunk, si existe.
+
+        Args:
+            chunk_text: Texto del chunk
+
+        Returns:
+            Análisis del chunk o None
+        """
+        return self._get("chunk", chunk_text)
+
+    def record_chunk(self, chunk_text: str, analysis: Dict) -> None:
+        """
+        Guarda el análisis de un chunk.
+
+        Args:
+            chunk_text: Texto del chunk
+            analysis: Análisis resultante
+        """
+        self._record("chunk", chunk_text, analysis)
+
+    def get_metadata(self, first_pages_text: str) -> Optional[Dict[str, str]]:
+        """Retorna la metadata guardada para estas primeras páginas, si existe."""
+        return self._get("metadata", first_pages_text)
+
+    def record_metadata(self, first_pages_text: str, metadata: Dict[str, str]) -> None:
+        """Guarda la metadata extraída de las primeras páginas."""
+        self._record("metadata", first_pages_text, metadata)
+
+    def get_synthesis(self, partial_analyses: List[Dict], metadata: Dict[str, str]) -> Optional[Dict]:
+        """Retorna la síntesis guardada para estos análisis parciales, si existe."""
+        return self._get("synthesis", [partial_analyses, metadata])
+
+    def record_synthesis(self, partial_analyses: List[Dict], metadata: Dict[str, str], synthesis: Dict) -> None:
+        """Guarda la síntesis de los análisis parciales."""
+        self._record("synthesis", [partial_analyses, metadata], synthesis)
+
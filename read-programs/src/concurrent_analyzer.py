@@ -0,0 +1,185 @@
+"""
+Módulo para analizar chunks de forma concurrente con asyncio.
+"""
+import asyncio
+import logging
+import time
+from typing import Callable, Iterator, List, Optional, Dict
+from tqdm import tqdm
+from src.config import MAX_CONCURRENT_REQUESTS
+from src.checkpoint import DocumentJournal
+from src.metrics import recorder
+
+logger = logging.getLogger(__name__)
+
+# Se llama con (número de chunk, total de chunks o None en streaming, análisis)
+ChunkCallback = Callable[[int, Optional[int], Dict], None]
+
+
+class ConcurrentChunkAnalyzer:
+    """
+    Ejecuta el análisis de chunks con varias llamadas al LLM en vuelo.
+
+    Funciona con cualquier analizador que implemente analyze_chunk_async
+    (LLMAnalyzer y GeminiAnalyzer).
+    """
+
+    def __init__(self, analyzer, max_concurrency: int = MAX_CONCURRENT_REQUESTS):
+        """
+        Inicializa el motor concurrente.
+
+        Args:
+            analyzer: Analizador LLM con método analyze_chunk_async
+            max_concurrency: Máximo de llamadas simultáneas
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+
+        self.analyzer = analyzer
+        self.max_concurrency = max_concurrency
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def analyze_chunks(
+        self,
+        chunks: List[str],
+        desc: str = "Analizando",
+        journal: Optional[DocumentJournal] = None,
+        on_result: Optional[ChunkCallback] = None
+    ) -> List[Optional[Dict]]:
+        """
+        Analiza todos los chunks de forma concurrente.
+
+        Si se entrega un journal, los chunks ya analizados se reutilizan y
+        cada análisis nuevo y completo se registra apenas termina.
+
+        Args:
+            chunks: Lista de chunks de texto
+            desc: Descripción para la barra de progreso
+            journal: Journal de checkpoints del documento (opcional)
+            on_result: Se llama con cada análisis disponible (recuperado o
+                apenas termina), p. ej. ResultSink.write_chunk
+
+        Returns:
+            Lista de análisis en el mismo orden que los chunks
+            (None para los chunks que fallaron)
+        """
+        total_chunks = len(chunks)
+        results: List[Optional[Dict]] = [None] * total_chunks
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        pending = []
+        for index, chunk in enumerate(chunks):
+            previous = self._recover(chunk, journal)
+            if previous is not None:
+                results[index] = previous
+                if on_result:
+                    on_result(index + 1, total_chunks, previous)
+            else:
+                pending.append(index)
+
+        if len(pending) < total_chunks:
+            self.logger.info(
+                f"{total_chunks - len(pending)} chunks recuperados sin nuevas llamadas"
+            )
+
+        self.logger.info(
+            f"Analizando {len(pending)} chunks con hasta "
+            f"{self.max_concurrency} llamadas simultáneas"
+        )
+
+        with tqdm(total=total_chunks, initial=total_chunks - len(pending), desc=desc, unit="chunk") as pbar:
+
+            async def analyze_one(index: int) -> None:
+                async with semaphore:
+                    with recorder.span("chunk_analysis", chunk=index + 1):
+                        analysis, complete = await self.analyzer.analyze_chunk_async(
+                            chunks[index], index + 1, total_chunks
+                        )
+                results[index] = analysis
+                if journal and analysis is not None and complete:
+                    journal.record_chunk(chunks[index], analysis)
+                if on_result and analysis is not None:
+                    on_result(index + 1, total_chunks, analysis)
+                pbar.update(1)
+
+            await asyncio.gather(*(analyze_one(i) for i in pending))
+
+        return results
+
+    def _recover(self, chunk: str, journal: Optional[DocumentJournal]) -> Optional[Dict]:
+        """Análisis ya disponible de un chunk (checkpoint), si existe."""
+        return journal.get_chunk(chunk) if journal else None
+
+    async def analyze_chunk_stream(
+        self,
+        chunk_stream: Iterator[str],
+        desc: str = "Analizando",
+        journal: Optional[DocumentJournal] = None,
+        on_result: Optional[ChunkCallback] = None
+    ) -> List[Optional[Dict]]:
+        """
+        Analiza chunks a medida que el chunker los produce.
+
+        El siguiente chunk solo se pide cuando hay un espacio libre entre las
+        llamadas en vuelo, así la extracción avanza al ritmo del análisis y la
+        memoria no crece con el tamaño del documento. El generador se consume
+        en un thread para no bloquear el event loop.
+
+        Args:
+            chunk_stream: Iterador de chunks (p. ej. TextChunker.iter_chunks)
+            desc: Descripción para la barra de progreso
+            journal: Journal de checkpoints del documento (opcional)
+            on_result: Se llama con cada análisis disponible (el total de
+                chunks no se conoce: None)
+
+        Returns:
+            Lista de análisis en el orden en que se emitieron los chunks
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        results: List[Optional[Dict]] = []
+        tasks = []
+        started = time.perf_counter()
+
+        with tqdm(desc=desc, unit="chunk") as pbar:
+
+            async def analyze_one(index: int, chunk: str) -> None:
+                try:
+                    analysis = self._recover(chunk, journal)
+                    if analysis is None:
+                        with recorder.span("chunk_analysis", chunk=index + 1):
+                            analysis, complete = await self.analyzer.analyze_chunk_async(chunk, index + 1, None)
+                        if journal and analysis is not None and complete:
+                            journal.record_chunk(chunk, analysis)
+                    results[index] = analysis
+                    if on_result and analysis is not None:
+                        on_result(index + 1, None, analysis)
+                finally:
+                    semaphore.release()
+                    pbar.update(1)
+
+            try:
+                while True:
+                    await semaphore.acquire()
+                    chunk = await loop.run_in_executor(None, next, chunk_stream, None)
+                    if chunk is None:
+                        semaphore.release()
+                        break
+
+                    if not tasks:
+                        self.logger.info(
+                            f"Primer chunk listo en {time.perf_counter() - started:.2f}s"
+                        )
+
+                    results.append(None)
+                    pbar.total = len(results)
+                    tasks.append(asyncio.create_task(analyze_one(len(results) - 1, chunk)))
+            except BaseException:
+                # Si falla la extracción, no dejar llamadas huérfanas
+                for task in tasks:
+                    task.cancel()
+                raise
+
+            await asyncio.gather(*tasks)
+
+        return results
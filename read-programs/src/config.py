@@ -5,7 +5,7 @@ import os
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Cargar variables de entorno
+# Cargar variables de entorno (solo lee .env; no crea archivos ni valida keys)
 load_dotenv()
 
 # Rutas del proyecto
@@ -14,13 +14,9 @@ PDFS_DIR = PROJECT_ROOT / "pdfs"
 OUTPUT_DIR = PROJECT_ROOT / "output"
 LOGS_DIR = PROJECT_ROOT / "logs"
 
-# Crear directorios si no existen
-PDFS_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
-LOGS_DIR.mkdir(exist_ok=True)
-
 # Configuración de LLM Provider
-LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()  # "gemini" o "claude"
+LLM_PROVIDER = os.getenv("LLM_PROVIDER", "gemini").lower()  # "gemini", "claude" o "fake"
+REQUESTED_LLM_PROVIDER = LLM_PROVIDER
 
 # Configuración de Anthropic API
 ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
@@ -28,38 +24,33 @@ ANTHROPIC_API_KEY = os.getenv("ANTHROPIC_API_KEY")
 # Configuración de Google Gemini API
 GEMINI_API_KEY = os.getenv("GEMINI_KEY")
 
-# Validar que al menos una API key esté configurada
-if not ANTHROPIC_API_KEY and not GEMINI_API_KEY:
-    raise ValueError(
-        "Ni ANTHROPIC_API_KEY ni GEMINI_KEY encontradas. "
-        "Por favor configura al menos una en tu archivo .env"
-    )
-
-# Configurar proveedor predeterminado basado en API keys disponibles
-if LLM_PROVIDER == "gemini" and not GEMINI_API_KEY:
-    if ANTHROPIC_API_KEY:
-        LLM_PROVIDER = "claude"
-        print("⚠️  GEMINI_KEY no encontrada, usando Claude")
-    else:
-        raise ValueError("LLM_PROVIDER configurado como 'gemini' pero GEMINI_KEY no encontrada")
-
-if LLM_PROVIDER == "claude" and not ANTHROPIC_API_KEY:
-    if GEMINI_API_KEY:
-        LLM_PROVIDER = "gemini"
-        print("⚠️  ANTHROPIC_API_KEY no encontrada, usando Gemini")
-    else:
-        raise ValueError("LLM_PROVIDER configurado como 'claude' pero ANTHROPIC_API_KEY no encontrada")
+# Si falta la key del proveedor elegido pero existe la del otro, usar ese.
+# Las keys no se validan al importar (las herramientas locales como el
+# chunker no las necesitan); ver validate_api_keys
+if LLM_PROVIDER == "gemini" and not GEMINI_API_KEY and ANTHROPIC_API_KEY:
+    LLM_PROVIDER = "claude"
+elif LLM_PROVIDER == "claude" and not ANTHROPIC_API_KEY and GEMINI_API_KEY:
+    LLM_PROVIDER = "gemini"
 
 # Modelos por proveedor
 CLAUDE_MODEL = os.getenv("CLAUDE_MODEL", "claude-3-haiku-20240307")
 GEMINI_MODEL = os.getenv("GEMINI_MODEL", "gemini-2.0-flash-exp")  # Modelo más reciente y rápido
+FAKE_MODEL = "fake-llm"
 
 # Modelo activo según proveedor
 if LLM_PROVIDER == "gemini":
     MODEL_NAME = GEMINI_MODEL
+elif LLM_PROVIDER == "fake":
+    MODEL_NAME = FAKE_MODEL
 else:
     MODEL_NAME = CLAUDE_MODEL
 
+# Proveedor fake (LLM_PROVIDER=fake): respuestas deterministas sin red
+FAKE_LLM_LATENCY_MS = float(os.getenv("FAKE_LLM_LATENCY_MS", "200"))
+FAKE_LLM_ERROR_RATE = float(os.getenv("FAKE_LLM_ERROR_RATE", "0"))
+FAKE_LLM_TRUNCATION_RATE = float(os.getenv("FAKE_LLM_TRUNCATION_RATE", "0"))
+FAKE_LLM_SEED = int(os.getenv("FAKE_LLM_SEED", "0"))
+
 # Configuración de chunking
 MAX_TOKENS_PER_CHUNK = int(os.getenv("MAX_TOKENS_PER_CHUNK", "6000"))  # Ajustado para respetar rate limits (10K/min)
 CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "600"))  # Reducido proporcionalmente
@@ -69,6 +60,17 @@ CHARS_PER_TOKEN = 4
 MAX_CHARS_PER_CHUNK = MAX_TOKENS_PER_CHUNK * CHARS_PER_TOKEN
 CHUNK_OVERLAP_CHARS = CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN
 
+# Dimensionamiento de chunks: "chars" (heurística de 4 chars/token) o
+# "tokens" (conteo con tokenizer local, chunks más llenos)
+CHUNK_SIZING = os.getenv("CHUNK_SIZING", "chars").lower()
+
+# Filtro de boilerplate antes del chunking (portadas, índices, menús, pies repetidos).
+# Opcional: sus heurísticas pueden descartar texto útil de algunos formatos
+BOILERPLATE_FILTER = os.getenv("BOILERPLATE_FILTER", "false").lower() == "true"
+BOILERPLATE_REPEAT_LIMIT = int(os.getenv("BOILERPLATE_REPEAT_LIMIT", "3"))
+BOILERPLATE_MIN_PAGE_WORDS = int(os.getenv("BOILERPLATE_MIN_PAGE_WORDS", "25"))
+BOILERPLATE_MENU_MIN_LINES = int(os.getenv("BOILERPLATE_MENU_MIN_LINES", "4"))
+
 # Configuración de análisis LLM
 # Ajustado para respetar rate limits (4K output/min) y evitar truncamiento JSON
 if LLM_PROVIDER == "gemini":
@@ -78,9 +80,87 @@ else:
     MAX_TOKENS_OUTPUT_CHUNK = int(os.getenv("MAX_TOKENS_OUTPUT_CHUNK", "3000"))
     MAX_TOKENS_OUTPUT_SYNTHESIS = int(os.getenv("MAX_TOKENS_OUTPUT_SYNTHESIS", "3000"))
 
+# Respuestas del LLM en streaming; si una respuesta se corta por el máximo de
+# tokens (stop reason), se pide la continuación en vez de repetir la llamada
+STREAM_RESPONSES = os.getenv("STREAM_RESPONSES", "true").lower() == "true"
+MAX_CONTINUATIONS = int(os.getenv("MAX_CONTINUATIONS", "2"))
+
+# Configuración de concurrencia
+# Número de llamadas de análisis de chunks en vuelo simultáneamente
+MAX_CONCURRENT_REQUESTS = int(os.getenv("MAX_CONCURRENT_REQUESTS", "4"))
+
+# Límites del proveedor usados por el scheduler compartido (0 = sin límite)
+MAX_REQUESTS_PER_MINUTE = int(os.getenv("MAX_REQUESTS_PER_MINUTE", "0"))
+MAX_TOKENS_PER_MINUTE = int(os.getenv("MAX_TOKENS_PER_MINUTE", "0"))
+
+# Procesamiento de varios documentos en paralelo (1 = secuencial)
+MAX_PARALLEL_DOCUMENTS = int(os.getenv("MAX_PARALLEL_DOCUMENTS", "1"))
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", str(os.cpu_count() or 1)))
+
+# Pipeline en streaming: el análisis empieza mientras se extrae el documento
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "false").lower() == "true"
+
+# Cache de prompts del proveedor para el prompt de análisis de chunks (idéntico en cada llamada)
+PROMPT_CACHING = os.getenv("PROMPT_CACHING", "true").lower() == "true"
+
+# Modo batch: todos los chunks de la ejecución en un solo batch del proveedor
+BATCH_MODE = os.getenv("BATCH_MODE", "false").lower() == "true"
+BATCH_POLL_SECONDS = float(os.getenv("BATCH_POLL_SECONDS", "30"))
+BATCH_MAX_WAIT_SECONDS = float(os.getenv("BATCH_MAX_WAIT_SECONDS", str(24 * 3600)))
+
+# Extracción de páginas en paralelo para PDFs grandes (0 = desactivada)
+PARALLEL_EXTRACTION_MIN_PAGES = int(os.getenv("PARALLEL_EXTRACTION_MIN_PAGES", "150"))
+
+# Cache persistente de respuestas LLM (SQLite)
+ENABLE_LLM_CACHE = os.getenv("ENABLE_LLM_CACHE", "true").lower() == "true"
+LLM_CACHE_PATH = Path(os.getenv("LLM_CACHE_PATH", str(OUTPUT_DIR / "llm_cache.sqlite")))
+LLM_CACHE_MAX_SIZE_MB = float(os.getenv("LLM_CACHE_MAX_SIZE_MB", "500"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "90"))
+
+# Journal de checkpoints por documento (reanudar ejecuciones interrumpidas)
+ENABLE_CHECKPOINTS = os.getenv("ENABLE_CHECKPOINTS", "true").lower() == "true"
+CHECKPOINTS_DIR = OUTPUT_DIR / "checkpoints"
+
+# Resultados intermedios de los subcomandos extract, chunk y analyze
+STAGES_DIR = OUTPUT_DIR / "stages"
+
+# Resultados en streaming: una línea JSONL por documento terminado (con fsync),
+# compactada en OUTPUT_FILE al final de la ejecución
+RESULTS_JSONL = Path(os.getenv("RESULTS_JSONL", str(OUTPUT_DIR / "resultados.jsonl")))
+RESULTS_JSONL_CHUNKS = os.getenv("RESULTS_JSONL_CHUNKS", "false").lower() == "true"
+
+# Ejecución incremental: reutilizar resultados de documentos sin cambios
+INCREMENTAL_RUN = os.getenv("INCREMENTAL_RUN", "false").lower() == "true"
+
+# Payload de síntesis compacto: análisis agrupados por categoría, sin vacíos ni duplicados
+COMPACT_SYNTHESIS_PAYLOAD = os.getenv("COMPACT_SYNTHESIS_PAYLOAD", "true").lower() == "true"
+
+# Similitud de Jaccard mínima para considerar casi-duplicadas dos propuestas o citas
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.7"))
+
+# Síntesis jerárquica (map-reduce) para documentos con muchos análisis parciales
+HIERARCHICAL_SYNTHESIS = os.getenv("HIERARCHICAL_SYNTHESIS", "false").lower() == "true"
+SYNTHESIS_GROUP_SIZE = int(os.getenv("SYNTHESIS_GROUP_SIZE", "4"))
+SYNTHESIS_GROUP_MAX_TOKENS = int(os.getenv("SYNTHESIS_GROUP_MAX_TOKENS", "12000"))
+
+# Enrutador local de categorías: cada chunk pide al LLM solo las categorías
+# que plausiblemente cubre (palabras clave y, si existe, modelo entrenado).
+# Desactivado hasta medir su cobertura con un proveedor real
+CATEGORY_ROUTING = os.getenv("CATEGORY_ROUTING", "false").lower() == "true"
+CATEGORY_ROUTER_MODEL = Path(os.getenv("CATEGORY_ROUTER_MODEL", str(OUTPUT_DIR / "category_router.json")))
+CATEGORY_ROUTER_THRESHOLD = float(os.getenv("CATEGORY_ROUTER_THRESHOLD", "0.3"))
+# Menciones de palabras clave para pedir una categoría: al menos MIN_HITS y
+# MIN_DENSITY por palabra del chunk (los chunks grandes mencionan de todo)
+CATEGORY_ROUTER_MIN_HITS = int(os.getenv("CATEGORY_ROUTER_MIN_HITS", "2"))
+CATEGORY_ROUTER_MIN_DENSITY = float(os.getenv("CATEGORY_ROUTER_MIN_DENSITY", "0.01"))
+CATEGORY_ROUTER_MIN_CATEGORIES = int(os.getenv("CATEGORY_ROUTER_MIN_CATEGORIES", "4"))
+
 # Configuración de validación y re-análisis
 ENABLE_VALIDATION = os.getenv("ENABLE_VALIDATION", "true").lower() == "true"
 REANALYZE_MISSING_CATEGORIES = os.getenv("REANALYZE_MISSING_CATEGORIES", "true").lower() == "true"
+# Pasajes (BM25) que se envían por cada categoría faltante y su largo máximo
+REANALYSIS_TOP_K = int(os.getenv("REANALYSIS_TOP_K", "4"))
+REANALYSIS_PASSAGE_CHARS = int(os.getenv("REANALYSIS_PASSAGE_CHARS", "2000"))
 
 # Categorías de análisis (basadas en topics.md)
 CATEGORIAS = [
@@ -108,3 +188,43 @@ LOG_DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
 
 # Archivo de salida
 OUTPUT_FILE = OUTPUT_DIR / "analisis_consolidado.json"
+
+# Reporte de métricas y trazas de la ejecución (vacío = no se escribe)
+METRICS_REPORT_FILE = os.getenv("METRICS_REPORT_FILE", str(OUTPUT_DIR / "run_report.json"))
+# Textfile en formato Prometheus (p. ej. para el textfile collector de node_exporter)
+PROMETHEUS_TEXTFILE = os.getenv("PROMETHEUS_TEXTFILE", "")
+
+
+def ensure_directories() -> None:
+    """Crea las carpetas de entrada, salida y logs si no existen."""
+    for directory in (PDFS_DIR, OUTPUT_DIR, LOGS_DIR):
+        directory.mkdir(exist_ok=True)
+
+
+def validate_api_keys(provider: str = LLM_PROVIDER) -> None:
+    """
+    Verifica que exista la API key del proveedor.
+
+    Se llama al crear el proveedor, no al importar la configuración.
+
+    Args:
+        provider: Proveedor a usar ("claude", "gemini" o "fake")
+
+    Raises:
+        ValueError: Si falta la API key necesaria
+    """
+    # El proveedor fake no usa red
+    if provider == "fake":
+        return
+
+    if not ANTHROPIC_API_KEY and not GEMINI_API_KEY:
+        raise ValueError(
+            "Ni ANTHROPIC_API_KEY ni GEMINI_KEY encontradas. "
+            "Por favor configura al menos una en tu archivo .env"
+        )
+
+    if provider == "gemini" and not GEMINI_API_KEY:
+        raise ValueError("LLM_PROVIDER configurado como 'gemini' pero GEMINI_KEY no encontrada")
+
+    if provider == "claude" and not ANTHROPIC_API_KEY:
+        raise ValueError("LLM_PROVIDER configurado como 'claude' pero ANTHROPIC_API_KEY no encontrada")
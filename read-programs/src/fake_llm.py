@@ -0,0 +1,367 @@
+"""
+Backend LLM falso y determinista para ejecutar el pipeline sin red.
+
+Imita la superficie del SDK de Anthropic que usan LLMAnalyzer y
+AnalysisSynthesizer (messages.create, messages.stream y messages.batches,
+con continuación desde un prefijo del asistente), de modo que el scheduler,
+la concurrencia, los reintentos y el cache se ejercitan igual que con la
+API real. Las respuestas son JSON válido según el tipo de prompt y
+dependen solo del contenido de la request, la semilla y el número de intento.
+"""
+import asyncio
+import hashlib
+import json
+import random
+import threading
+import time
+import uuid
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+from anthropic import APIConnectionError, RateLimitError
+from src.config import (
+    CATEGORIAS, FAKE_LLM_LATENCY_MS, FAKE_LLM_ERROR_RATE,
+    FAKE_LLM_TRUNCATION_RATE, FAKE_LLM_SEED
+)
+from src.prompts import (
+    CHUNK_ANALYSIS_PROMPT, SYNTHESIS_PROMPT, MERGE_PROMPT, METADATA_EXTRACTION_PROMPT,
+    REANALYSIS_PROMPT, CATEGORY_SCOPE_HEADER
+)
+
+# Prefijos que identifican cada tipo de prompt
+PROMPT_MARKERS = {
+    "chunk": CHUNK_ANALYSIS_PROMPT[:120],
+    "synthesis": SYNTHESIS_PROMPT[:120],
+    "merge": MERGE_PROMPT[:120],
+    "metadata": METADATA_EXTRACTION_PROMPT[:80],
+    "reanalysis": REANALYSIS_PROMPT[:120],
+}
+
+
+def request_text(system, messages: List[Dict]) -> str:
+    """Concatena el system prompt y los mensajes de una request."""
+    if isinstance(system, list):
+        system = " ".join(block.get("text", "") for block in system)
+
+    parts = [system or ""]
+    for message in messages:
+        content = message.get("content", "")
+        if isinstance(content, list):
+            content = " ".join(block.get("text", "") for block in content)
+        parts.append(content)
+    return "\n".join(parts)
+
+
+def prompt_kind(text: str) -> str:
+    """Tipo de prompt (chunk, synthesis, merge, metadata, reanalysis) según su prefijo."""
+    for kind, marker in PROMPT_MARKERS.items():
+        if marker in text:
+            return kind
+    return "chunk"
+
+
+def mentioned_categories(text: str) -> List[str]:
+    """Categorías cuya primera palabra aparece en el texto."""
+    lowered = text.lower()
+    return [cat for cat in CATEGORIAS if cat.split()[0].lower() in lowered]
+
+
+def fake_response(text: str) -> str:
+    """
+    Respuesta JSON válida para el tipo de prompt recibido.
+
+    Args:
+        text: System prompt y mensajes concatenados
+
+    Returns:
+        Texto JSON con el formato que espera el pipeline
+    """
+    kind = prompt_kind(text)
+
+    if kind == "metadata":
+        return json.dumps({
+            "candidato": "Candidato de prueba",
+            "partido_coalicion": "Coalición de prueba",
+            "año": "2025"
+        }, ensure_ascii=False)
+
+    # Solo el contenido variable (fragmento o análisis parciales), sin el prompt fijo
+    payload = text.replace(CHUNK_ANALYSIS_PROMPT, "")
+    if "ANÁLISIS PARCIALES" in payload:
+        payload = payload.split("ANÁLISIS PARCIALES", 1)[1].split("INSTRUCCIONES", 1)[0]
+    found = mentioned_categories(payload)
+    if CATEGORY_SCOPE_HEADER in payload:
+        # Solo las categorías preseleccionadas que aparecen en el fragmento
+        scope, fragment = payload.split(CATEGORY_SCOPE_HEADER, 1)[1].split("SOLO categorías de esta lista.", 1)
+        found = [cat for cat in mentioned_categories(fragment) if cat in scope]
+    if kind == "reanalysis":
+        # Solo las categorías pedidas que aparecen en los fragmentos enviados
+        requested, excerpts = payload.split("FRAGMENTOS SELECCIONADOS", 1)
+        requested = requested.split("TAREA:", 1)[0]
+        found = [cat for cat in mentioned_categories(excerpts) if cat in requested]
+    digest = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:8]
+
+    def category(name: str) -> Dict:
+        return {
+            "categoria": name,
+            "analisis_perspectiva": {
+                "rol_del_estado": "Regulador",
+                "enfoque_ideologico": "Tecnocrático",
+                "tono": "Técnico"
+            },
+            "propuestas_clave": [
+                {"titulo": f"Propuesta {digest} sobre {name}", "descripcion": f"Descripción de prueba {digest}"}
+            ],
+            "citas_textuales": [f"Cita de prueba {digest}"]
+        }
+
+    if kind == "synthesis":
+        return json.dumps({
+            "metadata": {},
+            "categorias": [
+                {**category(name), "presente": True} if name in found else {
+                    "categoria": name,
+                    "presente": False,
+                    "analisis_perspectiva": {},
+                    "propuestas_clave": [],
+                    "citas_textuales": []
+                }
+                for name in CATEGORIAS
+            ]
+        }, ensure_ascii=False)
+
+    return json.dumps(
+        {"categorias_encontradas": [category(name) for name in found]},
+        ensure_ascii=False
+    )
+
+
+def message_object(text: str, model: str, response_text: str, truncated: bool = False):
+    """Objeto con la forma de un Message del SDK de Anthropic."""
+    return SimpleNamespace(
+        id=f"msg_{uuid.uuid4().hex[:24]}",
+        type="message",
+        role="assistant",
+        model=model,
+        content=[SimpleNamespace(type="text", text=response_text)],
+        stop_reason="max_tokens" if truncated else "end_turn",
+        stop_sequence=None,
+        usage=SimpleNamespace(
+            input_tokens=len(text) // 4,
+            output_tokens=len(response_text) // 4,
+            cache_creation_input_tokens=0,
+            cache_read_input_tokens=0
+        )
+    )
+
+
+class _FakeHTTPResponse:
+    """Respuesta HTTP mínima para construir las excepciones del SDK."""
+
+    def __init__(self, status_code: int):
+        self.status_code = status_code
+        self.headers = {}
+        self.request = SimpleNamespace(method="POST", url="fake://llm/v1/messages")
+
+
+class FakeLLMBackend:
+    """
+    Genera respuestas, latencia, errores y truncamiento deterministas.
+
+    Un mismo backend se comparte entre el analizador y el sintetizador para
+    que las estadísticas cubran toda la ejecución.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = FAKE_LLM_LATENCY_MS,
+        error_rate: float = FAKE_LLM_ERROR_RATE,
+        truncation_rate: float = FAKE_LLM_TRUNCATION_RATE,
+        seed: int = FAKE_LLM_SEED
+    ):
+        """
+        Inicializa el backend.
+
+        Args:
+            latency_ms: Latencia media por llamada en milisegundos (±50%)
+            error_rate: Fracción de llamadas que fallan (rate limit o conexión)
+            truncation_rate: Fracción de respuestas cortadas (stop_reason max_tokens)
+            seed: Semilla para que las ejecuciones sean reproducibles
+        """
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.truncation_rate = truncation_rate
+        self.seed = seed
+        self._attempts: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.errors = 0
+        self.truncations = 0
+
+    def _rng(self, text: str) -> random.Random:
+        """Generador determinista por contenido de la request y número de intento."""
+        key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        with self._lock:
+            attempt = self._attempts.get(key, 0)
+            self._attempts[key] = attempt + 1
+            self.calls += 1
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def plan(self, text: str):
+        """
+        Decide latencia, error y truncamiento de una llamada.
+
+        Returns:
+            Tupla (segundos de latencia, excepción o None, truncar)
+        """
+        rng = self._rng(text)
+        latency = self.latency_ms / 1000 * rng.uniform(0.5, 1.5)
+
+        error = None
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            if rng.random() < 0.5:
+                error = RateLimitError("Rate limit (fake)", response=_FakeHTTPResponse(429), body=None)
+            else:
+                error = APIConnectionError(request=_FakeHTTPResponse(0).request)
+
+        truncate = error is None and rng.random() < self.truncation_rate
+        if truncate:
+            with self._lock:
+                self.truncations += 1
+        return latency, error, truncate
+
+    def respond(self, kwargs: Dict, truncate: bool):
+        """
+        Construye el Message de respuesta para los parámetros de messages.create.
+
+        Si el último mensaje es del asistente (continuación), la respuesta es
+        solo lo que falta después de ese prefijo.
+        """
+        messages = kwargs.get("messages", [])
+        prefill = ""
+        if messages and messages[-1].get("role") == "assistant":
+            prefill = messages[-1].get("content", "")
+            messages = messages[:-1]
+
+        text = request_text(kwargs.get("system"), messages)
+        response_text = fake_response(text)
+        if prefill and response_text.startswith(prefill):
+            response_text = response_text[len(prefill):]
+        if truncate:
+            response_text = response_text[:max(1, len(response_text) // 2)]
+        return message_object(text, kwargs.get("model", "fake-llm"), response_text, truncate)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Llamadas, errores inyectados y respuestas truncadas."""
+        return {"calls": self.calls, "errors": self.errors, "truncations": self.truncations}
+
+
+class _FakeMessages:
+    def __init__(self, backend: FakeLLMBackend):
+        self.backend = backend
+
+    def create(self, **kwargs):
+        text = request_text(kwargs.get("system"), kwargs.get("messages", []))
+        latency, error, truncate = self.backend.plan(text)
+        time.sleep(latency)
+        if error:
+            raise error
+        return self.backend.respond(kwargs, truncate)
+
+
+class _FakeAsyncBatches:
+    """messages.batches: los batches terminan en la primera consulta."""
+
+    def __init__(self, backend: FakeLLMBackend):
+        self.backend = backend
+        self._batches: Dict[str, List[Dict]] = {}
+
+    def _batch(self, batch_id: str, status: str):
+        total = len(self._batches[batch_id])
+        ended = status == "ended"
+        return SimpleNamespace(
+            id=batch_id,
+            processing_status=status,
+            request_counts=SimpleNamespace(
+                processing=0 if ended else total,
+                succeeded=total if ended else 0,
+                errored=0,
+                canceled=0,
+                expired=0
+            )
+        )
+
+    async def create(self, requests: List[Dict]):
+        batch_id = f"msgbatch_{uuid.uuid4().hex[:24]}"
+        self._batches[batch_id] = requests
+        return self._batch(batch_id, "in_progress")
+
+    async def retrieve(self, batch_id: str):
+        return self._batch(batch_id, "ended")
+
+    async def cancel(self, batch_id: str):
+        return self._batch(batch_id, "ended")
+
+    async def results(self, batch_id: str):
+        async def entries():
+            for request in self._batches.pop(batch_id, []):
+                text = request_text(request["params"].get("system"), request["params"].get("messages", []))
+                _, error, truncate = self.backend.plan(text)
+                if error:
+                    result = SimpleNamespace(type="errored")
+                else:
+                    result = SimpleNamespace(
+                        type="succeeded", message=self.backend.respond(request["params"], truncate)
+                    )
+                yield SimpleNamespace(custom_id=request["custom_id"], result=result)
+        return entries()
+
+
+class _FakeAsyncMessageStream:
+    """messages.stream: la respuesta llega completa al entrar al contexto."""
+
+    def __init__(self, request):
+        self._request = request
+        self._message = None
+
+    async def __aenter__(self):
+        self._message = await self._request
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def get_final_message(self):
+        return self._message
+
+
+class _FakeAsyncMessages:
+    def __init__(self, backend: FakeLLMBackend):
+        self.backend = backend
+        self.batches = _FakeAsyncBatches(backend)
+
+    async def create(self, **kwargs):
+        text = request_text(kwargs.get("system"), kwargs.get("messages", []))
+        latency, error, truncate = self.backend.plan(text)
+        await asyncio.sleep(latency)
+        if error:
+            raise error
+        return self.backend.respond(kwargs, truncate)
+
+    def stream(self, **kwargs):
+        return _FakeAsyncMessageStream(self.create(**kwargs))
+
+
+class FakeAnthropic:
+    """Cliente síncrono compatible con anthropic.Anthropic (solo messages.create)."""
+
+    def __init__(self, backend: Optional[FakeLLMBackend] = None):
+        self.messages = _FakeMessages(backend or FakeLLMBackend())
+
+
+class FakeAsyncAnthropic:
+    """Cliente asíncrono compatible con anthropic.AsyncAnthropic."""
+
+    def __init__(self, backend: Optional[FakeLLMBackend] = None):
+        self.messages = _FakeAsyncMessages(backend or FakeLLMBackend())
@@ -1,13 +1,24 @@
 """
 Módulo para análisis de texto usando la API de Google Gemini.
 """
+import asyncio
 import logging
 import json
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple
 import google.generativeai as genai
-from src.config import GEMINI_API_KEY, GEMINI_MODEL, MAX_TOKENS_OUTPUT_CHUNK
-from src.prompts import CHUNK_ANALYSIS_PROMPT, METADATA_EXTRACTION_PROMPT
+from src.config import GEMINI_API_KEY, GEMINI_MODEL, MAX_TOKENS_OUTPUT_CHUNK, PROMPT_CACHING
+from src.prompts import (
+    CHUNK_ANALYSIS_PROMPT, METADATA_EXTRACTION_PROMPT, REANALYSIS_PROMPT,
+    format_chunk_header, format_excerpts, format_category_scope
+)
+from src.llm_scheduler import LLMScheduler, estimate_tokens
+from src.llm_streaming import complete_gemini_async
+from src.json_salvage import loads_tolerant, parse_llm_json
+from src.metrics import recorder
+from src.llm_cache import LLMCache
+from src.category_router import CategoryRouter, default_router
+from src.pricing import GEMINI_INPUT_COST_PER_1M, GEMINI_OUTPUT_COST_PER_1M, GEMINI_CACHED_INPUT_MULTIPLIER
 
 logger = logging.getLogger(__name__)
 
@@ -15,13 +26,26 @@ logger = logging.getLogger(__name__)
 class GeminiAnalyzer:
     """Analizador de texto usando Google Gemini."""
 
-    def __init__(self, api_key: str = GEMINI_API_KEY, model: str = GEMINI_MODEL):
+    # google-generativeai no expone la API de batch; el modo batch usa llamadas interactivas
+    supports_batch = False
+
+    def __init__(
+        self,
+        api_key: str = GEMINI_API_KEY,
+        model: str = GEMINI_MODEL,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None,
+        router: Optional[CategoryRouter] = None
+    ):
         """
         Inicializa el analizador.
 
         Args:
             api_key: API key de Google
             model: Nombre del modelo a usar
+            scheduler: Scheduler compartido para las llamadas asíncronas (opcional)
+            cache: Cache persistente de respuestas (opcional)
+            router: Enrutador de categorías por chunk (por defecto según CATEGORY_ROUTING)
         """
         genai.configure(api_key=api_key)
 
@@ -37,16 +61,29 @@ class GeminiAnalyzer:
             generation_config=self.generation_config,
         )
 
+        # El prompt de análisis va como system_instruction: un prefijo idéntico
+        # en todas las llamadas de chunks, que Gemini cachea implícitamente
+        # (los prompts son más cortos que el mínimo de CachedContent explícito)
+        self.chunk_model = genai.GenerativeModel(
+            model_name=model,
+            generation_config=self.generation_config,
+            system_instruction=CHUNK_ANALYSIS_PROMPT,
+        ) if PROMPT_CACHING else self.model
+
         self.model_name = model
+        self.scheduler = scheduler
+        self.cache = cache
+        self.router = router or default_router()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.total_input_tokens = 0
         self.total_output_tokens = 0
+        self.cached_input_tokens = 0
 
     def analyze_chunk(
         self,
         chunk_text: str,
         chunk_number: int,
-        total_chunks: int,
+        total_chunks: Optional[int],
         max_retries: int = 3
     ) -> Optional[Dict]:
         """
@@ -55,48 +92,41 @@ class GeminiAnalyzer:
         Args:
             chunk_text: Texto del chunk a analizar
             chunk_number: Número del chunk actual
-            total_chunks: Total de chunks
+            total_chunks: Total de chunks (None si no se conoce, en streaming)
             max_retries: Intentos máximos en caso de error
 
         Returns:
             Diccionario con el análisis o None si hay error
         """
         self.logger.info(
-            f"Analizando chunk {chunk_number}/{total_chunks} "
+            f"Analizando chunk {chunk_number}/{total_chunks or '?'} "
             f"({len(chunk_text):,} caracteres)"
         )
 
-        prompt = f"""{CHUNK_ANALYSIS_PROMPT}
-
-Fragmento {chunk_number}/{total_chunks} del programa:
-
-{chunk_text}
-"""
+        prompt = self._build_chunk_prompt(chunk_text, chunk_number, total_chunks)
+        cache_key = self._cache_key(CHUNK_ANALYSIS_PROMPT, prompt)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_chunk_response(cached_text, chunk_number)[0]
 
         for attempt in range(max_retries):
             try:
-                response = self.model.generate_content(prompt)
-
-                # Registrar uso de tokens si está disponible
-                if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                    self.total_input_tokens += response.usage_metadata.prompt_token_count
-                    self.total_output_tokens += response.usage_metadata.candidates_token_count
+                response = self.chunk_model.generate_content(prompt)
 
-                    self.logger.debug(
-                        f"Tokens - Input: {response.usage_metadata.prompt_token_count}, "
-                        f"Output: {response.usage_metadata.candidates_token_count}"
-                    )
+                self.record_usage(response)
 
                 # Extraer texto de la respuesta
                 response_text = response.text.strip()
 
-                # Intentar parsear el JSON
+                # Intentar parsear el JSON (un JSON cortado conserva sus categorías completas)
                 try:
-                    analysis = json.loads(response_text)
+                    analysis, partial = parse_llm_json(response_text, "categorias_encontradas")
                     self.logger.info(
-                        f"✓ Chunk {chunk_number} analizado: "
+                        f"✓ Chunk {chunk_number} analizado{' (parcial)' if partial else ''}: "
                         f"{len(analysis.get('categorias_encontradas', []))} categorías encontradas"
                     )
+                    if self.cache and not partial:
+                        self.cache.put(cache_key, response_text)
                     return analysis
 
                 except json.JSONDecodeError as e:
@@ -134,6 +164,152 @@ Fragmento {chunk_number}/{total_chunks} del programa:
         self.logger.error(f"Falló análisis del chunk {chunk_number} después de {max_retries} intentos")
         return None
 
+    async def analyze_chunk_async(
+        self,
+        chunk_text: str,
+        chunk_number: int,
+        total_chunks: Optional[int],
+        max_retries: int = 3
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Versión asíncrona de analyze_chunk usando generate_content_async.
+
+        El control de concurrencia queda en manos de quien la invoca
+        (ver ConcurrentChunkAnalyzer).
+
+        Args:
+            chunk_text: Texto del chunk a analizar
+            chunk_number: Número del chunk actual
+            total_chunks: Total de chunks (None si no se conoce, en streaming)
+            max_retries: Intentos máximos en caso de error
+
+        Returns:
+            Tupla (análisis o None si hay error, True si la respuesta llegó
+            completa)
+        """
+        self.logger.info(
+            f"Analizando chunk {chunk_number}/{total_chunks or '?'} "
+            f"({len(chunk_text):,} caracteres)"
+        )
+
+        prompt = self._build_chunk_prompt(chunk_text, chunk_number, total_chunks)
+        cache_key = self._cache_key(CHUNK_ANALYSIS_PROMPT, prompt)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_chunk_response(cached_text, chunk_number)
+
+        estimated = estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_CHUNK
+
+        for attempt in range(max_retries):
+            try:
+                response_text, _ = await complete_gemini_async(
+                    self.chunk_model, self.scheduler, prompt, self.generation_config, estimated,
+                    on_response=self.record_usage,
+                    list_key="categorias_encontradas"
+                )
+
+                # Solo se reintenta el chunk completo si no se recupera ninguna categoría
+                try:
+                    analysis, partial = parse_llm_json(response_text, "categorias_encontradas")
+                    self.logger.info(
+                        f"✓ Chunk {chunk_number} analizado{' (parcial)' if partial else ''}: "
+                        f"{len(analysis.get('categorias_encontradas', []))} categorías encontradas"
+                    )
+                    if self.cache and not partial:
+                        self.cache.put(cache_key, response_text)
+                    return analysis, not partial
+
+                except json.JSONDecodeError as e:
+                    self.logger.error(f"Error parseando JSON del chunk {chunk_number}: {e}")
+                    self.logger.warning(f"Respuesta recibida (primeros 1000 chars): {response_text[:1000]}...")
+
+                    if attempt < max_retries - 1:
+                        self.logger.info(f"Reintentando chunk {chunk_number}... (intento {attempt + 2}/{max_retries})")
+                        recorder.record_retry("invalid_json")
+                        await asyncio.sleep(2)
+                        continue
+                    else:
+                        self.logger.error(f"No se pudo parsear JSON después de {max_retries} intentos")
+                        return None, False
+
+            except Exception as e:
+                error_str = str(e)
+
+                if "429" in error_str or "quota" in error_str.lower():
+                    wait_time = 2 ** attempt
+                    self.logger.warning(
+                        f"Rate limit alcanzado. Esperando {wait_time}s... "
+                        f"(intento {attempt + 1}/{max_retries})"
+                    )
+                    if self.scheduler:
+                        self.scheduler.report_rate_limit(wait_time)
+                    if attempt < max_retries - 1:
+                        recorder.record_retry("rate_limit")
+                    await asyncio.sleep(wait_time)
+                else:
+                    self.logger.error(f"Error analizando chunk {chunk_number}: {e}")
+                    if attempt < max_retries - 1:
+                        recorder.record_retry("api_error")
+                        await asyncio.sleep(2)
+                    else:
+                        return None, False
+
+        self.logger.error(f"Falló análisis del chunk {chunk_number} después de {max_retries} intentos")
+        return None, False
+
+    def _build_chunk_prompt(self, chunk_text: str, chunk_number: int, total_chunks: Optional[int]) -> str:
+        """
+        Construye el prompt para analizar un chunk.
+
+        Con PROMPT_CACHING, CHUNK_ANALYSIS_PROMPT ya va como system_instruction
+        de chunk_model y el prompt solo lleva el fragmento. Con enrutador, el
+        fragmento lista solo las categorías que plausiblemente cubre.
+        """
+        header = format_chunk_header(chunk_number, total_chunks)
+        if self.router:
+            header = f"{header}\n\n{format_category_scope(self.router.route(chunk_text))}"
+        fragment = f"""{header}
+
+{chunk_text}
+"""
+        if PROMPT_CACHING:
+            return fragment
+        return f"""{CHUNK_ANALYSIS_PROMPT}
+
+{fragment}"""
+
+    def _parse_chunk_response(self, response_text: str, chunk_number: int) -> Tuple[Optional[Dict], bool]:
+        """Parsea una respuesta de chunk guardada en cache (solo se guardan completas)."""
+        try:
+            analysis = loads_tolerant(response_text)
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON del chunk {chunk_number}: {e}")
+            return None, False
+
+        self.logger.info(
+            f"✓ Chunk {chunk_number} analizado (cache): "
+            f"{len(analysis.get('categorias_encontradas', []))} categorías encontradas"
+        )
+        return analysis, True
+
+    def _cache_key(self, prompt_template: str, prompt: str) -> str:
+        """Clave de cache para una llamada con la configuración de generación actual."""
+        return LLMCache.make_key("gemini", self.model_name, self.generation_config, prompt_template, prompt)
+
+    def record_usage(self, response) -> None:
+        """Registra el uso de tokens de una respuesta, si está disponible."""
+        if hasattr(response, 'usage_metadata') and response.usage_metadata:
+            cached = getattr(response.usage_metadata, "cached_content_token_count", 0) or 0
+            self.total_input_tokens += response.usage_metadata.prompt_token_count
+            self.total_output_tokens += response.usage_metadata.candidates_token_count
+            self.cached_input_tokens += cached
+
+            self.logger.debug(
+                f"Tokens - Input: {response.usage_metadata.prompt_token_count} "
+                f"(cache: {cached}), "
+                f"Output: {response.usage_metadata.candidates_token_count}"
+            )
+
     def extract_metadata(self, first_pages_text: str) -> Dict[str, str]:
         """
         Extrae metadata del candidato de las primeras páginas.
@@ -147,55 +323,148 @@ Fragmento {chunk_number}/{total_chunks} del programa:
         try:
             prompt = METADATA_EXTRACTION_PROMPT.format(texto=first_pages_text[:5000])
 
-            response = self.model.generate_content(prompt)
+            cache_key = self._cache_key(METADATA_EXTRACTION_PROMPT, prompt)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return self._parse_metadata_response(cached_text)
 
-            # Registrar tokens
-            if hasattr(response, 'usage_metadata') and response.usage_metadata:
-                self.total_input_tokens += response.usage_metadata.prompt_token_count
-                self.total_output_tokens += response.usage_metadata.candidates_token_count
+            response = self.model.generate_content(prompt)
+            self.record_usage(response)
 
-            # Parsear respuesta
             response_text = response.text.strip()
-            metadata = json.loads(response_text)
-
-            # Si Gemini devolvió una lista con un dict, extraer el primer elemento
-            if isinstance(metadata, list) and len(metadata) > 0 and isinstance(metadata[0], dict):
-                self.logger.warning(f"Metadata devuelta como lista, extrayendo primer elemento")
-                metadata = metadata[0]
-
-            # Validar que sea un diccionario
-            if not isinstance(metadata, dict):
-                self.logger.error(f"Metadata no es un diccionario, es {type(metadata)}: {metadata}")
-                return {
-                    "candidato": "No especificado",
-                    "partido_coalicion": "No especificado",
-                    "año": "No especificado"
-                }
-
-            self.logger.info(f"✓ Metadata extraída: {metadata.get('candidato', 'N/A')}")
+            metadata = self._parse_metadata_response(response_text)
+
+            if self.cache:
+                self.cache.put(cache_key, response_text)
+
             return metadata
 
         except Exception as e:
             self.logger.error(f"Error extrayendo metadata: {e}")
             self.logger.debug(f"Response text: {response_text[:500] if 'response_text' in locals() else 'N/A'}")
-            return {
-                "candidato": "No especificado",
-                "partido_coalicion": "No especificado",
-                "año": "No especificado"
-            }
+            return self._default_metadata()
+
+    async def extract_metadata_async(self, first_pages_text: str) -> Tuple[Dict[str, str], bool]:
+        """
+        Versión asíncrona de extract_metadata.
+
+        Args:
+            first_pages_text: Texto de las primeras páginas
+
+        Returns:
+            Tupla (metadata, True si se extrajo del modelo). Si hay un error
+            se retorna la metadata por defecto con False, para que no se
+            guarde como trabajo terminado
+        """
+        try:
+            prompt = METADATA_EXTRACTION_PROMPT.format(texto=first_pages_text[:5000])
+            cache_key = self._cache_key(METADATA_EXTRACTION_PROMPT, prompt)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return self._parse_metadata_response(cached_text), True
+
+            response_text, _ = await complete_gemini_async(
+                self.model, self.scheduler, prompt, self.generation_config,
+                estimate_tokens(prompt) + 500,
+                on_response=self.record_usage
+            )
+            metadata = self._parse_metadata_response(response_text)
+
+            if self.cache:
+                self.cache.put(cache_key, response_text)
+
+            return metadata, True
+
+        except Exception as e:
+            self.logger.error(f"Error extrayendo metadata: {e}")
+            return self._default_metadata(), False
+
+    async def reanalyze_categories_async(
+        self,
+        missing_categories: List[str],
+        passages: List[str]
+    ) -> Optional[Dict]:
+        """
+        Busca categorías faltantes solo en los pasajes recuperados del documento.
+
+        Args:
+            missing_categories: Categorías que la síntesis no encontró
+            passages: Pasajes relevantes (ver src.retrieval)
+
+        Returns:
+            Análisis con el formato de un chunk o None si hay error
+        """
+        try:
+            prompt = REANALYSIS_PROMPT.format(
+                missing_categories="\n".join(f"- {cat}" for cat in missing_categories),
+                excerpts=format_excerpts(passages)
+            )
+            cache_key = self._cache_key(REANALYSIS_PROMPT, prompt)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return loads_tolerant(cached_text)
+
+            response_text, _ = await complete_gemini_async(
+                self.model, self.scheduler, prompt, self.generation_config,
+                estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_CHUNK,
+                on_response=self.record_usage,
+                list_key="categorias_encontradas"
+            )
+            reanalysis, partial = parse_llm_json(response_text, "categorias_encontradas")
+
+            if self.cache and not partial:
+                self.cache.put(cache_key, response_text)
+
+            return reanalysis
+
+        except Exception as e:
+            self.logger.error(f"Error en re-análisis de categorías faltantes: {e}")
+            return None
+
+    def _parse_metadata_response(self, response_text: str) -> Dict[str, str]:
+        """Parsea la respuesta JSON de metadata, normalizando listas."""
+        metadata = loads_tolerant(response_text)
+
+        # Si Gemini devolvió una lista con un dict, extraer el primer elemento
+        if isinstance(metadata, list) and len(metadata) > 0 and isinstance(metadata[0], dict):
+            self.logger.warning(f"Metadata devuelta como lista, extrayendo primer elemento")
+            metadata = metadata[0]
+
+        # Validar que sea un diccionario (el error lleva a la metadata por defecto)
+        if not isinstance(metadata, dict):
+            raise ValueError(f"Metadata no es un diccionario, es {type(metadata)}: {metadata}")
+
+        self.logger.info(f"✓ Metadata extraída: {metadata.get('candidato', 'N/A')}")
+        return metadata
+
+    def _default_metadata(self) -> Dict[str, str]:
+        """Metadata por defecto cuando no se puede extraer."""
+        return {
+            "candidato": "No especificado",
+            "partido_coalicion": "No especificado",
+            "año": "No especificado"
+        }
 
     def get_token_usage(self) -> Dict[str, int]:
         """
-        Retorna el uso total de tokens.
+        Retorna el uso total de tokens y, si hay cache, sus hits y misses.
+
+        input_tokens incluye los tokens servidos desde el cache implícito de
+        Gemini (cached_input_tokens); uncached_input_tokens es el resto.
 
         Returns:
             Diccionario con uso de tokens
         """
-        return {
+        usage = {
             "input_tokens": self.total_input_tokens,
+            "uncached_input_tokens": self.total_input_tokens - self.cached_input_tokens,
+            "cached_input_tokens": self.cached_input_tokens,
             "output_tokens": self.total_output_tokens,
             "total_tokens": self.total_input_tokens + self.total_output_tokens
         }
+        if self.cache:
+            usage.update(self.cache.get_stats())
+        return usage
 
     def estimate_cost(self) -> float:
         """
@@ -205,16 +474,10 @@ Fragmento {chunk_number}/{total_chunks} del programa:
         Returns:
             Costo estimado en USD
         """
-        # Precios aproximados de Gemini 2.0 Flash (verificar en https://ai.google.dev/pricing)
-        # Para prompts <= 128K tokens
-        INPUT_COST_PER_1M = 0.00  # Gratis hasta cierto límite
-        OUTPUT_COST_PER_1M = 0.00  # Gratis hasta cierto límite
-
-        # Si supera el límite gratuito, usar precios reales
-        # INPUT_COST_PER_1M = 0.10  # USD por millón de tokens de input
-        # OUTPUT_COST_PER_1M = 0.40  # USD por millón de tokens de output
-
-        input_cost = (self.total_input_tokens / 1_000_000) * INPUT_COST_PER_1M
-        output_cost = (self.total_output_tokens / 1_000_000) * OUTPUT_COST_PER_1M
+        uncached_tokens = self.total_input_tokens - self.cached_input_tokens
+        input_cost = (
+            (uncached_tokens + self.cached_input_tokens * GEMINI_CACHED_INPUT_MULTIPLIER) / 1_000_000
+        ) * GEMINI_INPUT_COST_PER_1M
+        output_cost = (self.total_output_tokens / 1_000_000) * GEMINI_OUTPUT_COST_PER_1M
 
         return input_cost + output_cost
@@ -3,10 +3,16 @@ Módulo para sintetizar análisis usando Google Gemini.
 """
 import logging
 import json
-from typing import List, Dict
+from typing import Any, Callable, List, Dict, Optional, Tuple
 import google.generativeai as genai
 from src.config import GEMINI_API_KEY, GEMINI_MODEL, MAX_TOKENS_OUTPUT_SYNTHESIS, CATEGORIAS
-from src.prompts import SYNTHESIS_PROMPT
+from src.prompts import SYNTHESIS_PROMPT, MERGE_PROMPT
+from src.llm_scheduler import LLMScheduler, estimate_tokens
+from src.llm_streaming import complete_gemini_async
+from src.json_salvage import parse_llm_json
+from src.llm_cache import LLMCache
+from src.payload_compactor import serialize_analyses, format_savings
+from src.near_duplicates import NearDuplicateDetector, deduplicate_category
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +20,24 @@ logger = logging.getLogger(__name__)
 class GeminiSynthesizer:
     """Sintetiza análisis parciales usando Google Gemini."""
 
-    def __init__(self, api_key: str = GEMINI_API_KEY, model: str = GEMINI_MODEL):
+    def __init__(
+        self,
+        api_key: str = GEMINI_API_KEY,
+        model: str = GEMINI_MODEL,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None,
+        on_response: Optional[Callable[[Any], None]] = None
+    ):
         """
         Inicializa el sintetizador.
 
         Args:
             api_key: API key de Google
             model: Nombre del modelo a usar
+            scheduler: Scheduler compartido para las llamadas asíncronas (opcional)
+            cache: Cache persistente de respuestas (opcional)
+            on_response: Se llama con cada respuesta para registrar su uso de
+                tokens (p. ej. GeminiAnalyzer.record_usage, para el costo total)
         """
         genai.configure(api_key=api_key)
 
@@ -36,6 +53,9 @@ class GeminiSynthesizer:
         )
 
         self.model_name = model
+        self.scheduler = scheduler
+        self.cache = cache
+        self.on_response = on_response
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def synthesize(
@@ -57,58 +77,186 @@ class GeminiSynthesizer:
         """
         self.logger.info(f"Sintetizando {len(partial_analyses)} análisis parciales...")
 
-        # Filtrar análisis vacíos
-        valid_analyses = [
-            a for a in partial_analyses
-            if a and a.get("categorias_encontradas")
-        ]
+        valid_analyses = self._filter_valid(partial_analyses)
 
         if not valid_analyses:
             self.logger.warning("No hay análisis válidos para sintetizar")
             return self._empty_result(metadata)
 
-        # Preparar el prompt
-        analyses_json = json.dumps(valid_analyses, ensure_ascii=False, indent=2)
-        sample_text = original_text_sample[:5000]
-
-        prompt = SYNTHESIS_PROMPT.replace(
-            "{analisis_parciales}", analyses_json
-        ).replace(
-            "{texto_original}", sample_text
-        )
+        prompt = self._build_prompt(valid_analyses, original_text_sample)
+        cache_key = self._cache_key(prompt)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_synthesis_response(cached_text, valid_analyses, metadata)[0]
 
         try:
             response = self.model.generate_content(prompt)
+            if self.on_response:
+                self.on_response(response)
+            return self._parse_synthesis_response(response.text.strip(), valid_analyses, metadata, cache_key)[0]
 
-            # Parsear respuesta
-            response_text = response.text.strip()
+        except Exception as e:
+            self.logger.error(f"Error en síntesis: {e}")
+            return self._fallback_synthesis(valid_analyses, metadata)
 
-            try:
-                synthesis = json.loads(response_text)
+    async def synthesize_async(
+        self,
+        partial_analyses: List[Dict],
+        original_text_sample: str,
+        metadata: Dict[str, str]
+    ) -> Tuple[Dict, bool]:
+        """
+        Versión asíncrona de synthesize usando generate_content_async.
+
+        Args:
+            partial_analyses: Lista de análisis parciales de chunks
+            original_text_sample: Muestra del texto original (primeras páginas)
+            metadata: Metadata ya extraída
 
-                # Validar estructura
-                if "categorias" not in synthesis:
-                    self.logger.error("La síntesis no tiene la estructura esperada")
-                    return self._fallback_synthesis(valid_analyses, metadata)
+        Returns:
+            Tupla (análisis consolidado, True si la síntesis del modelo llegó
+            completa). Tras un error o una respuesta incompleta se retorna la
+            síntesis de respaldo con False, para que no se guarde como
+            trabajo terminado
+        """
+        self.logger.info(f"Sintetizando {len(partial_analyses)} análisis parciales...")
 
-                # Asegurar que metadata esté presente
-                if "metadata" not in synthesis or not synthesis["metadata"]:
-                    synthesis["metadata"] = metadata
+        valid_analyses = self._filter_valid(partial_analyses)
 
-                self.logger.info(
-                    f"✓ Síntesis completada: {len(synthesis.get('categorias', []))} categorías"
-                )
+        if not valid_analyses:
+            self.logger.warning("No hay análisis válidos para sintetizar")
+            return self._empty_result(metadata), True
 
-                return synthesis
+        prompt = self._build_prompt(valid_analyses, original_text_sample)
+        cache_key = self._cache_key(prompt)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_synthesis_response(cached_text, valid_analyses, metadata)
 
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Error parseando JSON de síntesis: {e}")
-                self.logger.debug(f"Respuesta: {response_text[:500]}...")
-                return self._fallback_synthesis(valid_analyses, metadata)
+        try:
+            response_text, _ = await complete_gemini_async(
+                self.model, self.scheduler, prompt, self.generation_config,
+                estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_SYNTHESIS,
+                on_response=self.on_response,
+                list_key="categorias"
+            )
+            return self._parse_synthesis_response(response_text, valid_analyses, metadata, cache_key)
 
         except Exception as e:
             self.logger.error(f"Error en síntesis: {e}")
-            return self._fallback_synthesis(valid_analyses, metadata)
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+    async def merge_async(self, partial_analyses: List[Dict]) -> Optional[Dict]:
+        """
+        Fusiona un grupo de análisis parciales en uno solo (síntesis jerárquica).
+
+        Args:
+            partial_analyses: Análisis parciales del grupo
+
+        Returns:
+            Análisis fusionado con formato de chunk, o None si falla
+        """
+        analyses_json, _ = serialize_analyses(partial_analyses)
+        prompt = MERGE_PROMPT.replace("{analisis_parciales}", analyses_json)
+        cache_key = self._cache_key(prompt, MERGE_PROMPT)
+
+        response_text = self.cache.get(cache_key) if self.cache else None
+        if response_text is None:
+            try:
+                response_text, _ = await complete_gemini_async(
+                    self.model, self.scheduler, prompt, self.generation_config,
+                    estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_SYNTHESIS,
+                    on_response=self.on_response,
+                    list_key="categorias_encontradas"
+                )
+            except Exception as e:
+                self.logger.error(f"Error fusionando grupo de {len(partial_analyses)} análisis: {e}")
+                return None
+
+        try:
+            merged, partial = parse_llm_json(response_text, "categorias_encontradas")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON de fusión: {e}")
+            return None
+
+        if partial:
+            # Una fusión incompleta perdería categorías: mejor la fusión local del grupo
+            self.logger.warning("Fusión incompleta, se descarta")
+            return None
+
+        if not isinstance(merged, dict) or "categorias_encontradas" not in merged:
+            self.logger.error("La fusión no tiene la estructura esperada")
+            return None
+
+        if self.cache:
+            self.cache.put(cache_key, response_text)
+
+        return merged
+
+    def _filter_valid(self, partial_analyses: List[Dict]) -> List[Dict]:
+        """Filtra análisis vacíos o sin categorías."""
+        return [
+            a for a in partial_analyses
+            if a and a.get("categorias_encontradas")
+        ]
+
+    def _build_prompt(self, valid_analyses: List[Dict], original_text_sample: str) -> str:
+        """Construye el prompt de síntesis."""
+        analyses_json, stats = serialize_analyses(valid_analyses)
+        self.logger.info(f"Payload de síntesis: {format_savings(stats)}")
+        sample_text = original_text_sample[:5000]
+
+        return SYNTHESIS_PROMPT.replace(
+            "{analisis_parciales}", analyses_json
+        ).replace(
+            "{texto_original}", sample_text
+        )
+
+    def _parse_synthesis_response(
+        self,
+        response_text: str,
+        valid_analyses: List[Dict],
+        metadata: Dict[str, str],
+        cache_key: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """Parsea la respuesta de síntesis, con fallback si es inválida."""
+        try:
+            synthesis, partial = parse_llm_json(response_text, "categorias")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON de síntesis: {e}")
+            self.logger.debug(f"Respuesta: {response_text[:500]}...")
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+        # Validar estructura
+        if "categorias" not in synthesis:
+            self.logger.error("La síntesis no tiene la estructura esperada")
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+        if partial:
+            # Las categorías que no alcanzaron a llegar salen del merge simple
+            present = {cat.get("categoria") for cat in synthesis["categorias"]}
+            fallback = self._fallback_synthesis(valid_analyses, metadata)
+            synthesis["categorias"].extend(
+                cat for cat in fallback["categorias"] if cat["categoria"] not in present
+            )
+
+        # Guardar en cache solo respuestas completas con la estructura esperada
+        elif cache_key and self.cache:
+            self.cache.put(cache_key, response_text)
+
+        # Asegurar que metadata esté presente
+        if "metadata" not in synthesis or not synthesis["metadata"]:
+            synthesis["metadata"] = metadata
+
+        self.logger.info(
+            f"✓ Síntesis completada: {len(synthesis.get('categorias', []))} categorías"
+        )
+
+        return synthesis, not partial
+
+    def _cache_key(self, prompt: str, prompt_template: str = SYNTHESIS_PROMPT) -> str:
+        """Clave de cache para una llamada de síntesis o de fusión."""
+        return LLMCache.make_key("gemini", self.model_name, self.generation_config, prompt_template, prompt)
 
     def _fallback_synthesis(
         self,
@@ -141,8 +289,10 @@ class GeminiSynthesizer:
                 citas = cat_data.get("citas_textuales", [])
                 categories_map[cat_name]["citas_textuales"].extend(citas)
 
+        detector = NearDuplicateDetector()
         for cat in categories_map.values():
-            cat["citas_textuales"] = list(set(cat["citas_textuales"]))[:5]
+            deduplicate_category(cat, detector)
+            cat["citas_textuales"] = cat["citas_textuales"][:5]
             cat["presente"] = True
 
         # Asegurar que todas las 16 categorías estén presentes
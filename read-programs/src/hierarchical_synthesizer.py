@@ -0,0 +1,178 @@
+"""
+Síntesis jerárquica (map-reduce) de análisis parciales.
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import Dict, List, Tuple
+from src.config import SYNTHESIS_GROUP_SIZE, SYNTHESIS_GROUP_MAX_TOKENS
+from src.llm_scheduler import estimate_tokens
+from src.near_duplicates import NearDuplicateDetector, deduplicate_category
+
+logger = logging.getLogger(__name__)
+
+
+class HierarchicalSynthesizer:
+    """
+    Sintetiza en árbol: fusiona los análisis parciales en grupos acotados,
+    nivel por nivel, hasta que caben en una sola llamada de síntesis final.
+
+    Los grupos de un mismo nivel se fusionan concurrentemente, por lo que el
+    tamaño de cada prompt queda acotado y la latencia crece con el
+    logaritmo del número de chunks. Envuelve a AnalysisSynthesizer o
+    GeminiSynthesizer (usa su merge_async y synthesize_async).
+    """
+
+    def __init__(
+        self,
+        synthesizer,
+        group_size: int = SYNTHESIS_GROUP_SIZE,
+        group_max_tokens: int = SYNTHESIS_GROUP_MAX_TOKENS
+    ):
+        """
+        Inicializa el sintetizador jerárquico.
+
+        Args:
+            synthesizer: Sintetizador base con merge_async y synthesize_async
+            group_size: Máximo de análisis por grupo
+            group_max_tokens: Máximo de tokens estimados por grupo
+        """
+        if group_size < 2:
+            raise ValueError("group_size debe ser al menos 2")
+
+        self.synthesizer = synthesizer
+        self.group_size = group_size
+        self.group_max_tokens = group_max_tokens
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    async def synthesize_async(
+        self,
+        partial_analyses: List[Dict],
+        original_text_sample: str,
+        metadata: Dict[str, str]
+    ) -> Tuple[Dict, bool]:
+        """
+        Sintetiza los análisis parciales reduciéndolos por niveles.
+
+        Args:
+            partial_analyses: Lista de análisis parciales de chunks
+            original_text_sample: Muestra del texto original (primeras páginas)
+            metadata: Metadata ya extraída
+
+        Returns:
+            Tupla (análisis consolidado, True si la síntesis final y todas
+            las fusiones llegaron completas del modelo)
+        """
+        level = [
+            a for a in partial_analyses
+            if a and a.get("categorias_encontradas")
+        ]
+        depth = 0
+        merges_complete = True
+
+        while self._needs_reduction(level):
+            depth += 1
+            groups = self._group(level)
+            started = time.perf_counter()
+
+            merged = await asyncio.gather(
+                *(self.synthesizer.merge_async(group) for group in groups)
+            )
+            # Si una fusión falla, se combina el grupo localmente
+            merges_complete = merges_complete and all(result is not None for result in merged)
+            level = [
+                result if result is not None else self._local_merge(group)
+                for group, result in zip(groups, merged)
+            ]
+
+            self.logger.info(
+                f"Nivel {depth}: {len(groups)} grupos fusionados en "
+                f"{time.perf_counter() - started:.1f}s"
+            )
+
+        synthesis, complete = await self.synthesizer.synthesize_async(level, original_text_sample, metadata)
+        return synthesis, complete and merges_complete
+
+    def _needs_reduction(self, analyses: List[Dict]) -> bool:
+        """True si los análisis no caben en un solo grupo."""
+        return len(analyses) > 1 and (
+            len(analyses) > self.group_size
+            or sum(self._tokens(a) for a in analyses) > self.group_max_tokens
+        )
+
+    def _group(self, analyses: List[Dict]) -> List[List[Dict]]:
+        """
+        Agrupa análisis consecutivos respetando tamaño y tokens por grupo.
+        Cada grupo tiene al menos 2 análisis para garantizar que el nivel
+        siguiente sea más pequeño.
+
+        Args:
+            analyses: Análisis del nivel actual
+
+        Returns:
+            Lista de grupos
+        """
+        groups = []
+        current: List[Dict] = []
+        current_tokens = 0
+
+        for analysis in analyses:
+            tokens = self._tokens(analysis)
+            if len(current) >= 2 and (
+                len(current) >= self.group_size
+                or current_tokens + tokens > self.group_max_tokens
+            ):
+                groups.append(current)
+                current, current_tokens = [], 0
+            current.append(analysis)
+            current_tokens += tokens
+
+        if len(current) == 1 and groups:
+            groups[-1].append(current[0])
+        elif current:
+            groups.append(current)
+
+        return groups
+
+    @staticmethod
+    def _tokens(analysis: Dict) -> int:
+        """Tokens estimados de un análisis serializado."""
+        return estimate_tokens(json.dumps(analysis, ensure_ascii=False))
+
+    @staticmethod
+    def _local_merge(group: List[Dict]) -> Dict:
+        """
+        Combina un grupo sin LLM: une las entradas por categoría y elimina
+        propuestas y citas casi duplicadas.
+
+        Args:
+            group: Análisis del grupo
+
+        Returns:
+            Análisis combinado con formato de chunk
+        """
+        categories: Dict[str, Dict] = {}
+
+        for analysis in group:
+            for cat_data in analysis.get("categorias_encontradas", []):
+                cat_name = cat_data.get("categoria")
+                if not cat_name:
+                    continue
+
+                if cat_name not in categories:
+                    categories[cat_name] = {
+                        "categoria": cat_name,
+                        "analisis_perspectiva": cat_data.get("analisis_perspectiva", {}),
+                        "propuestas_clave": [],
+                        "citas_textuales": []
+                    }
+
+                categories[cat_name]["propuestas_clave"].extend(cat_data.get("propuestas_clave", []))
+                categories[cat_name]["citas_textuales"].extend(cat_data.get("citas_textuales", []))
+
+        detector = NearDuplicateDetector()
+        for cat_data in categories.values():
+            deduplicate_category(cat_data, detector)
+
+        return {"categorias_encontradas": list(categories.values())}
@@ -0,0 +1,149 @@
+"""
+Soporte para ejecuciones incrementales sobre el corpus de documentos.
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Set, Tuple
+from src.checkpoint import pipeline_signature, content_hash
+
+logger = logging.getLogger(__name__)
+
+
+def document_fingerprint(document_path: Path) -> str:
+    """
+    Huella de un documento: hash de su contenido más la versión del pipeline.
+
+    Cambia si cambia el archivo o la configuración del pipeline (modelo,
+    prompts y opciones de src.checkpoint.pipeline_config).
+
+    Args:
+        document_path: Ruta al archivo PDF o TXT
+
+    Returns:
+        Hash en hexadecimal
+    """
+    file_hash = hashlib.sha256()
+    with open(document_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            file_hash.update(block)
+
+    return content_hash([file_hash.hexdigest(), pipeline_signature()])
+
+
+def load_previous_results(output_file: Path) -> Dict[str, dict]:
+    """
+    Carga los resultados de una ejecución anterior, indexados por archivo.
+
+    Args:
+        output_file: Archivo JSON consolidado
+
+    Returns:
+        Diccionario {pdf_filename: resultado}, vacío si no existe o es inválido
+    """
+    if not output_file.exists():
+        return {}
+
+    try:
+        with open(output_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (json.JSONDecodeError, OSError) as e:
+        logger.warning(f"No se pudo leer {output_file.name} ({e}), se procesará todo el corpus")
+        return {}
+
+    return {
+        entry["pdf_filename"]: entry
+        for entry in data.get("candidatos", [])
+        if entry.get("pdf_filename")
+    }
+
+
+def split_unchanged(
+    document_files: List[Path],
+    previous_results: Dict[str, dict]
+) -> Tuple[List[dict], List[Path]]:
+    """
+    Separa los documentos sin cambios de los nuevos o modificados.
+
+    Args:
+        document_files: Documentos encontrados en pdfs/
+        previous_results: Resultados previos indexados por archivo
+
+    Returns:
+        Tupla (resultados reutilizados, documentos a procesar)
+    """
+    reused = []
+    to_process = []
+
+    for document_path in document_files:
+        previous = previous_results.get(document_path.name)
+        if previous and previous.get("document_fingerprint") == document_fingerprint(document_path):
+            reused.append(previous)
+        else:
+            to_process.append(document_path)
+
+    return reused, to_process
+
+
+def drop_missing_results(previous_results: Dict[str, dict], document_names: Set[str]) -> Dict[str, dict]:
+    """
+    Descarta los resultados de documentos que ya no están en la entrada
+    (borrados o renombrados), para que no queden para siempre en el archivo.
+
+    Args:
+        previous_results: Resultados previos indexados por archivo
+        document_names: Nombres de los documentos de entrada
+
+    Returns:
+        Resultados previos de documentos que siguen en la entrada
+    """
+    return {
+        name: result
+        for name, result in previous_results.items()
+        if name in document_names
+    }
+
+
+def merge_results(previous_results: Dict[str, dict], new_results: List[dict]) -> List[dict]:
+    """
+    Combina resultados previos y nuevos; los nuevos reemplazan por archivo.
+
+    Args:
+        previous_results: Resultados previos indexados por archivo
+        new_results: Resultados de esta ejecución
+
+    Returns:
+        Lista combinada ordenada por nombre de archivo
+    """
+    merged = dict(previous_results)
+    for result in new_results:
+        merged[result["pdf_filename"]] = result
+
+    return [merged[name] for name in sorted(merged)]
+
+
+def write_json_atomic(path: Path, data: dict) -> None:
+    """
+    Escribe un JSON de forma atómica (archivo temporal + rename).
+
+    Un lector nunca ve un archivo a medio escribir, y una interrupción
+    deja intacta la versión anterior.
+
+    Args:
+        path: Archivo destino
+        data: Datos a serializar
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
@@ -0,0 +1,222 @@
+"""
+Parseo tolerante del JSON que devuelven los modelos.
+
+Una respuesta cortada o con un error al final no se descarta entera: se
+recuperan las entradas completas de su lista principal
+(categorias_encontradas o categorias) y se informa que el resultado es
+parcial, sin modificar el valor. El prefijo hasta la última entrada
+completa sirve para pedir al modelo solo el resto (ver src.llm_streaming).
+"""
+import json
+import logging
+import re
+from typing import Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Bloque de código markdown alrededor del JSON
+CODE_FENCE_PATTERN = re.compile(r"^\s*```(?:json)?\s*|\s*```\s*$")
+
+# Intentos de cierre desde los últimos puntos de corte antes de rendirse
+MAX_SALVAGE_ATTEMPTS = 20
+
+_decoder = json.JSONDecoder()
+
+
+def _strip_trailing_commas(text: str) -> str:
+    """Elimina comas antes de } o ] fuera de los strings."""
+    result = []
+    in_string = escape = False
+    for ch in text:
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "}]":
+            # Quitar la coma (y los espacios) que quedó antes del cierre
+            index = len(result) - 1
+            while index >= 0 and result[index].isspace():
+                index -= 1
+            if index >= 0 and result[index] == ",":
+                del result[index]
+        result.append(ch)
+    return "".join(result)
+
+
+def _json_start(text: str) -> int:
+    """Posición del primer { o [ (el modelo a veces antepone texto)."""
+    starts = [position for position in (text.find("{"), text.find("[")) if position >= 0]
+    return min(starts) if starts else -1
+
+
+def loads_tolerant(text: str) -> Any:
+    """
+    json.loads que acepta bloques de código, texto antes o después del JSON
+    y comas finales.
+
+    Args:
+        text: Respuesta del modelo
+
+    Returns:
+        Valor parseado
+
+    Raises:
+        json.JSONDecodeError: Si el JSON está incompleto o mal formado
+    """
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError as error:
+        cleaned = CODE_FENCE_PATTERN.sub("", text)
+        start = _json_start(cleaned)
+        if start < 0:
+            raise error
+        cleaned = cleaned[start:]
+        for candidate in (cleaned, _strip_trailing_commas(cleaned)):
+            try:
+                value, _ = _decoder.raw_decode(candidate)
+                return value
+            except json.JSONDecodeError:
+                continue
+        raise error
+
+
+def _entry_cut_points(text: str, list_key: str) -> Tuple[List[int], int]:
+    """
+    Puntos de corte tras cada entrada completa de la lista list_key del
+    objeto raíz.
+
+    Returns:
+        Tupla (posiciones justo después del cierre de cada entrada, posición
+        justo después del [ de la lista o -1 si no se abrió)
+    """
+    cuts = []
+    list_open = -1
+    stack: List[Tuple[str, Optional[str]]] = []  # (apertura, clave del valor)
+    in_string = escape = False
+    string_start = 0
+    last_string = None
+
+    for position, ch in enumerate(text):
+        if in_string:
+            if escape:
+                escape = False
+            elif ch == "\\":
+                escape = True
+            elif ch == '"':
+                in_string = False
+                last_string = text[string_start + 1:position]
+            continue
+
+        if ch == '"':
+            in_string = True
+            string_start = position
+        elif ch in "{[":
+            key = last_string if stack and stack[-1][0] == "{" else None
+            stack.append((ch, key))
+            if ch == "[" and len(stack) == 2 and key == list_key:
+                list_open = position + 1
+        elif ch in "}]":
+            if not stack:
+                break
+            stack.pop()
+            if ch == "}" and len(stack) == 2 and stack[1] == ("[", list_key):
+                cuts.append(position + 1)
+
+    return cuts, list_open
+
+
+def salvage_json(text: str, list_key: str) -> Optional[Tuple[dict, str]]:
+    """
+    Recupera las entradas completas de la lista list_key de un JSON
+    cortado o mal formado.
+
+    Args:
+        text: Respuesta del modelo
+        list_key: Lista principal del objeto raíz (p. ej. "categorias_encontradas")
+
+    Returns:
+        Tupla (objeto con las entradas completas, prefijo de la respuesta
+        hasta la última de ellas) o None si no se recupera ninguna
+    """
+    cleaned = CODE_FENCE_PATTERN.sub("", text)
+    start = _json_start(cleaned)
+    if start < 0:
+        return None
+    cleaned = cleaned[start:]
+
+    cuts, _ = _entry_cut_points(cleaned, list_key)
+    for cut in reversed(cuts[-MAX_SALVAGE_ATTEMPTS:]):
+        prefix = cleaned[:cut]
+        try:
+            value = json.loads(_strip_trailing_commas(prefix + "]}"))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(value, dict) and isinstance(value.get(list_key), list):
+            return value, prefix
+    return None
+
+
+def resume_prefix(text: str, list_key: str) -> Optional[str]:
+    """
+    Prefijo desde el cual pedir al modelo el resto de una respuesta
+    incompleta: hasta la última entrada completa de list_key (más una coma)
+    o, si no hay ninguna, hasta la apertura de la lista.
+
+    Args:
+        text: Respuesta del modelo
+        list_key: Lista principal del objeto raíz
+
+    Returns:
+        Prefijo o None si la respuesta ya es JSON válido o no se puede retomar
+    """
+    try:
+        loads_tolerant(text)
+        return None
+    except json.JSONDecodeError:
+        pass
+
+    salvaged = salvage_json(text, list_key)
+    if salvaged is not None:
+        return salvaged[1] + ","
+
+    cleaned = CODE_FENCE_PATTERN.sub("", text)
+    start = _json_start(cleaned)
+    if start < 0:
+        return None
+    _, list_open = _entry_cut_points(cleaned[start:], list_key)
+    return cleaned[start:start + list_open] if list_open > 0 else None
+
+
+def parse_llm_json(text: str, list_key: str) -> Tuple[Any, bool]:
+    """
+    Parsea una respuesta del modelo, recuperando lo posible si está incompleta.
+
+    Args:
+        text: Respuesta del modelo
+        list_key: Lista principal del objeto raíz
+
+    Returns:
+        Tupla (valor, True si es un resultado parcial). El valor no se
+        marca: quien llama decide qué hacer con un resultado parcial
+
+    Raises:
+        json.JSONDecodeError: Si no se puede recuperar ninguna entrada
+    """
+    try:
+        return loads_tolerant(text), False
+    except json.JSONDecodeError as error:
+        salvaged = salvage_json(text, list_key)
+        if salvaged is None:
+            raise
+        reason = str(error)
+
+    value, _ = salvaged
+    logger.warning(
+        f"JSON incompleto ({reason}); recuperadas {len(value[list_key])} entradas de {list_key}"
+    )
+    return value, True
@@ -1,13 +1,30 @@
 """
 Módulo para análisis de texto usando la API de Anthropic (Claude).
 """
+import asyncio
 import logging
 import json
 import time
-from typing import Optional, Dict, List
-from anthropic import Anthropic, APIError, RateLimitError
-from src.config import ANTHROPIC_API_KEY, MODEL_NAME, MAX_TOKENS_OUTPUT_CHUNK
-from src.prompts import CHUNK_ANALYSIS_PROMPT, METADATA_EXTRACTION_PROMPT
+from typing import Optional, Dict, List, Tuple
+from anthropic import Anthropic, AsyncAnthropic, APIError, RateLimitError
+from src.config import (
+    ANTHROPIC_API_KEY, MODEL_NAME, MAX_TOKENS_OUTPUT_CHUNK,
+    BATCH_POLL_SECONDS, BATCH_MAX_WAIT_SECONDS, PROMPT_CACHING
+)
+from src.prompts import (
+    CHUNK_ANALYSIS_PROMPT, METADATA_EXTRACTION_PROMPT, REANALYSIS_PROMPT,
+    format_chunk_header, format_excerpts, format_category_scope
+)
+from src.llm_scheduler import LLMScheduler, estimate_tokens
+from src.llm_streaming import complete_claude_async, claude_text, CLAUDE_TRUNCATED
+from src.json_salvage import loads_tolerant, parse_llm_json, resume_prefix
+from src.metrics import recorder
+from src.llm_cache import LLMCache
+from src.category_router import CategoryRouter, default_router
+from src.pricing import (
+    CLAUDE_INPUT_COST_PER_1M, CLAUDE_OUTPUT_COST_PER_1M, CLAUDE_CACHE_WRITE_MULTIPLIER,
+    CLAUDE_CACHE_READ_MULTIPLIER, CLAUDE_BATCH_DISCOUNT
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,25 +32,48 @@ logger = logging.getLogger(__name__)
 class LLMAnalyzer:
     """Analizador de texto usando Claude de Anthropic."""
 
-    def __init__(self, api_key: str = ANTHROPIC_API_KEY, model: str = MODEL_NAME):
+    supports_batch = True
+
+    def __init__(
+        self,
+        api_key: str = ANTHROPIC_API_KEY,
+        model: str = MODEL_NAME,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None,
+        client: Optional[Anthropic] = None,
+        async_client: Optional[AsyncAnthropic] = None,
+        router: Optional[CategoryRouter] = None
+    ):
         """
         Inicializa el analizador.
 
         Args:
             api_key: API key de Anthropic
             model: Nombre del modelo a usar
+            scheduler: Scheduler compartido para las llamadas asíncronas (opcional)
+            cache: Cache persistente de respuestas (opcional)
+            client: Cliente síncrono ya construido (p. ej. el del proveedor fake)
+            async_client: Cliente asíncrono ya construido (opcional)
+            router: Enrutador de categorías por chunk (por defecto según CATEGORY_ROUTING)
         """
-        self.client = Anthropic(api_key=api_key)
+        self.client = client or Anthropic(api_key=api_key)
+        self.async_client = async_client or AsyncAnthropic(api_key=api_key)
         self.model = model
+        self.scheduler = scheduler
+        self.cache = cache
+        self.router = router or default_router()
         self.logger = logging.getLogger(self.__class__.__name__)
         self.total_input_tokens = 0
         self.total_output_tokens = 0
+        self.cached_input_tokens = 0
+        self.cache_write_input_tokens = 0
+        self.total_cost = 0.0
 
     def analyze_chunk(
         self,
         chunk_text: str,
         chunk_number: int,
-        total_chunks: int,
+        total_chunks: Optional[int],
         max_retries: int = 3
     ) -> Optional[Dict]:
         """
@@ -42,62 +82,46 @@ class LLMAnalyzer:
         Args:
             chunk_text: Texto del chunk a analizar
             chunk_number: Número del chunk actual
-            total_chunks: Total de chunks
+            total_chunks: Total de chunks (None si no se conoce, en streaming)
             max_retries: Intentos máximos en caso de error
 
         Returns:
             Diccionario con el análisis o None si hay error
         """
         self.logger.info(
-            f"Analizando chunk {chunk_number}/{total_chunks} "
+            f"Analizando chunk {chunk_number}/{total_chunks or '?'} "
             f"({len(chunk_text):,} caracteres)"
         )
 
+        messages = self._build_chunk_messages(chunk_text, chunk_number, total_chunks)
+        cache_key = self._cache_key(CHUNK_ANALYSIS_PROMPT, messages[0]["content"], MAX_TOKENS_OUTPUT_CHUNK)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_chunk_response(cached_text, chunk_number)[0]
+
         for attempt in range(max_retries):
             try:
                 response = self.client.messages.create(
                     model=self.model,
                     max_tokens=MAX_TOKENS_OUTPUT_CHUNK,
                     temperature=0,
-                    system=CHUNK_ANALYSIS_PROMPT,
-                    messages=[
-                        {
-                            "role": "user",
-                            "content": f"Fragmento {chunk_number}/{total_chunks} del programa:\n\n{chunk_text}"
-                        }
-                    ]
-                )
-
-                # Registrar uso de tokens
-                self.total_input_tokens += response.usage.input_tokens
-                self.total_output_tokens += response.usage.output_tokens
-
-                self.logger.debug(
-                    f"Tokens - Input: {response.usage.input_tokens}, "
-                    f"Output: {response.usage.output_tokens}"
+                    system=self._chunk_system(),
+                    messages=messages
                 )
 
-                # Extraer y parsear respuesta
+                self.record_usage(response)
                 response_text = response.content[0].text.strip()
+                analysis, complete = self._parse_chunk_response(response_text, chunk_number)
 
-                # Intentar parsear el JSON
-                try:
-                    analysis = json.loads(response_text)
-                    self.logger.info(
-                        f"✓ Chunk {chunk_number} analizado: "
-                        f"{len(analysis.get('categorias_encontradas', []))} categorías encontradas"
-                    )
+                if analysis is not None:
+                    if self.cache and complete:
+                        self.cache.put(cache_key, response_text)
 
                     # Rate limiting: esperar antes de siguiente llamada
                     self.logger.debug("Esperando 15s para respetar rate limits...")
                     time.sleep(15)
 
-                    return analysis
-
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"Error parseando JSON del chunk {chunk_number}: {e}")
-                    self.logger.debug(f"Respuesta recibida: {response_text[:500]}...")
-                    return None
+                return analysis
 
             except RateLimitError as e:
                 wait_time = 2 ** attempt  # Backoff exponencial
@@ -121,6 +145,341 @@ class LLMAnalyzer:
         self.logger.error(f"Falló análisis del chunk {chunk_number} después de {max_retries} intentos")
         return None
 
+    async def analyze_chunk_async(
+        self,
+        chunk_text: str,
+        chunk_number: int,
+        total_chunks: Optional[int],
+        max_retries: int = 3
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Versión asíncrona de analyze_chunk, sin espera fija entre llamadas.
+
+        El control de concurrencia queda en manos de quien la invoca
+        (ver ConcurrentChunkAnalyzer).
+
+        Args:
+            chunk_text: Texto del chunk a analizar
+            chunk_number: Número del chunk actual
+            total_chunks: Total de chunks (None si no se conoce, en streaming)
+            max_retries: Intentos máximos en caso de error
+
+        Returns:
+            Tupla (análisis o None si hay error, True si la respuesta llegó
+            completa). Un análisis recuperado de un JSON incompleto se usa,
+            pero no debe guardarse como trabajo terminado
+        """
+        self.logger.info(
+            f"Analizando chunk {chunk_number}/{total_chunks or '?'} "
+            f"({len(chunk_text):,} caracteres)"
+        )
+
+        messages = self._build_chunk_messages(chunk_text, chunk_number, total_chunks)
+        cache_key = self._cache_key(CHUNK_ANALYSIS_PROMPT, messages[0]["content"], MAX_TOKENS_OUTPUT_CHUNK)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_chunk_response(cached_text, chunk_number)
+
+        estimated = estimate_tokens(CHUNK_ANALYSIS_PROMPT + chunk_text) + MAX_TOKENS_OUTPUT_CHUNK
+
+        for attempt in range(max_retries):
+            try:
+                response_text, _ = await complete_claude_async(
+                    self.async_client,
+                    self.scheduler,
+                    {
+                        "model": self.model,
+                        "max_tokens": MAX_TOKENS_OUTPUT_CHUNK,
+                        "temperature": 0,
+                        "system": self._chunk_system(),
+                        "messages": messages
+                    },
+                    estimated,
+                    on_response=self.record_usage,
+                    list_key="categorias_encontradas"
+                )
+                analysis, complete = self._parse_chunk_response(response_text, chunk_number)
+
+                if analysis is not None and self.cache and complete:
+                    self.cache.put(cache_key, response_text)
+
+                return analysis, complete
+
+            except RateLimitError:
+                wait_time = 2 ** attempt  # Backoff exponencial
+                self.logger.warning(
+                    f"Rate limit alcanzado. Esperando {wait_time}s... "
+                    f"(intento {attempt + 1}/{max_retries})"
+                )
+                if self.scheduler:
+                    self.scheduler.report_rate_limit(wait_time)
+                if attempt < max_retries - 1:
+                    recorder.record_retry("rate_limit")
+                await asyncio.sleep(wait_time)
+
+            except APIError as e:
+                self.logger.error(f"Error de API en chunk {chunk_number}: {e}")
+                if attempt < max_retries - 1:
+                    recorder.record_retry("api_error")
+                    await asyncio.sleep(2)
+                else:
+                    return None, False
+
+            except Exception as e:
+                self.logger.error(f"Error inesperado analizando chunk {chunk_number}: {e}")
+                return None, False
+
+        self.logger.error(f"Falló análisis del chunk {chunk_number} después de {max_retries} intentos")
+        return None, False
+
+    async def analyze_chunks_batch(
+        self,
+        items: List[Tuple[str, int, Optional[int]]],
+        poll_interval: float = BATCH_POLL_SECONDS,
+        max_wait: float = BATCH_MAX_WAIT_SECONDS
+    ) -> List[Tuple[Optional[Dict], bool]]:
+        """
+        Analiza varios chunks en un solo batch de la Message Batches API.
+
+        Los chunks en cache no se envían. El batch se consulta cada
+        poll_interval segundos hasta que termina; los resultados con error
+        quedan en None para que quien llama los reintente de forma interactiva,
+        y las respuestas truncadas o con JSON incompleto se continúan de forma
+        interactiva desde el texto recibido.
+
+        Args:
+            items: Tuplas (texto del chunk, número de chunk, total de chunks)
+            poll_interval: Segundos entre consultas del estado del batch
+            max_wait: Segundos máximos de espera antes de cancelar el batch
+
+        Returns:
+            Lista de tuplas (análisis o None si falló, True si llegó completo)
+            en el mismo orden que items
+        """
+        results: List[Tuple[Optional[Dict], bool]] = [(None, False)] * len(items)
+        requests = []
+        cache_keys = {}
+        truncated = []
+
+        for index, (chunk_text, chunk_number, total_chunks) in enumerate(items):
+            messages = self._build_chunk_messages(chunk_text, chunk_number, total_chunks)
+            cache_key = self._cache_key(CHUNK_ANALYSIS_PROMPT, messages[0]["content"], MAX_TOKENS_OUTPUT_CHUNK)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                results[index] = self._parse_chunk_response(cached_text, chunk_number)
+                continue
+
+            cache_keys[index] = cache_key
+            requests.append({
+                "custom_id": f"chunk-{index}",
+                "params": {
+                    "model": self.model,
+                    "max_tokens": MAX_TOKENS_OUTPUT_CHUNK,
+                    "temperature": 0,
+                    "system": self._chunk_system(),
+                    "messages": messages
+                }
+            })
+
+        if not requests:
+            return results
+
+        batch = await self.async_client.messages.batches.create(requests=requests)
+        self.logger.info(f"Batch {batch.id} enviado con {len(requests)} chunks")
+
+        started = time.monotonic()
+        while batch.processing_status != "ended":
+            if time.monotonic() - started > max_wait:
+                await self.async_client.messages.batches.cancel(batch.id)
+                self.logger.error(f"Batch {batch.id} cancelado tras {max_wait:.0f}s de espera")
+                return results
+
+            await asyncio.sleep(poll_interval)
+            batch = await self.async_client.messages.batches.retrieve(batch.id)
+            counts = batch.request_counts
+            self.logger.info(
+                f"Batch {batch.id}: {batch.processing_status} "
+                f"({counts.succeeded} ok, {counts.errored} con error, "
+                f"{counts.processing} en proceso)"
+            )
+
+        async for entry in await self.async_client.messages.batches.results(batch.id):
+            index = int(entry.custom_id.split("-", 1)[1])
+            chunk_number = items[index][1]
+
+            if entry.result.type != "succeeded":
+                self.logger.warning(f"Chunk {chunk_number} sin resultado en el batch ({entry.result.type})")
+                continue
+
+            message = entry.result.message
+            self.record_usage(message, batch=True)
+            recorder.record_llm_response(message)
+
+            response_text = claude_text(message).strip()
+            if message.stop_reason == CLAUDE_TRUNCATED:
+                truncated.append((index, response_text))
+                continue
+            tail = resume_prefix(response_text, "categorias_encontradas")
+            if tail is not None:
+                truncated.append((index, tail))
+                continue
+
+            results[index] = self._parse_chunk_response(response_text, chunk_number)
+            if results[index][0] is not None and self.cache:
+                self.cache.put(cache_keys[index], response_text)
+
+        self.logger.info(
+            f"Batch {batch.id} completado en {time.monotonic() - started:.0f}s"
+        )
+
+        if truncated:
+            self.logger.info(f"{len(truncated)} respuestas del batch incompletas, pidiendo su continuación")
+            params = {int(request["custom_id"].split("-", 1)[1]): request["params"] for request in requests}
+            continued = await asyncio.gather(
+                *(
+                    complete_claude_async(
+                        self.async_client,
+                        self.scheduler,
+                        params[index],
+                        estimate_tokens(CHUNK_ANALYSIS_PROMPT + items[index][0]) + MAX_TOKENS_OUTPUT_CHUNK,
+                        on_response=self.record_usage,
+                        prefix=partial_text,
+                        list_key="categorias_encontradas"
+                    )
+                    for index, partial_text in truncated
+                ),
+                return_exceptions=True
+            )
+            for (index, _), outcome in zip(truncated, continued):
+                if isinstance(outcome, Exception):
+                    self.logger.error(f"Error continuando el chunk {items[index][1]}: {outcome}")
+                    continue
+                response_text, _ = outcome
+                results[index] = self._parse_chunk_response(response_text, items[index][1])
+                analysis, complete = results[index]
+                if analysis is not None and self.cache and complete:
+                    self.cache.put(cache_keys[index], response_text)
+
+        return results
+
+    def _build_chunk_messages(
+        self,
+        chunk_text: str,
+        chunk_number: int,
+        total_chunks: Optional[int]
+    ) -> List[Dict]:
+        """
+        Construye los mensajes de usuario para analizar un chunk.
+
+        Con enrutador, el mensaje lista solo las categorías que el chunk
+        plausiblemente cubre.
+        """
+        header = format_chunk_header(chunk_number, total_chunks)
+        if self.router:
+            categories = self.router.route(chunk_text)
+            self.logger.debug(f"Chunk {chunk_number}: {len(categories)} categorías preseleccionadas")
+            header = f"{header}\n\n{format_category_scope(categories)}"
+        return [
+            {
+                "role": "user",
+                "content": f"{header}\n\n{chunk_text}"
+            }
+        ]
+
+    def _cache_key(self, prompt_template: str, input_text: str, max_tokens: int) -> str:
+        """Clave de cache para una llamada a Claude con temperatura 0."""
+        return LLMCache.make_key(
+            "claude",
+            self.model,
+            {"temperature": 0, "max_tokens": max_tokens},
+            prompt_template,
+            input_text
+        )
+
+    def _chunk_system(self):
+        """
+        System prompt del análisis de chunks.
+
+        Es idéntico en todas las llamadas, así que con PROMPT_CACHING se marca
+        con cache_control para que Claude lo lea desde su cache de prompts
+        en vez de procesarlo de nuevo.
+        """
+        if not PROMPT_CACHING:
+            return CHUNK_ANALYSIS_PROMPT
+        return [
+            {
+                "type": "text",
+                "text": CHUNK_ANALYSIS_PROMPT,
+                "cache_control": {"type": "ephemeral"}
+            }
+        ]
+
+    def record_usage(self, response, batch: bool = False) -> None:
+        """
+        Registra el uso de tokens y el costo de una respuesta.
+
+        Args:
+            response: Respuesta (Message) de la API
+            batch: True si la respuesta viene de un batch (con descuento)
+        """
+        usage = response.usage
+        cache_read = getattr(usage, "cache_read_input_tokens", 0) or 0
+        cache_write = getattr(usage, "cache_creation_input_tokens", 0) or 0
+
+        self.total_input_tokens += usage.input_tokens + cache_read + cache_write
+        self.total_output_tokens += usage.output_tokens
+        self.cached_input_tokens += cache_read
+        self.cache_write_input_tokens += cache_write
+
+        input_equivalent = (
+            usage.input_tokens
+            + cache_write * CLAUDE_CACHE_WRITE_MULTIPLIER
+            + cache_read * CLAUDE_CACHE_READ_MULTIPLIER
+        )
+        cost = (
+            (input_equivalent / 1_000_000) * CLAUDE_INPUT_COST_PER_1M
+            + (usage.output_tokens / 1_000_000) * CLAUDE_OUTPUT_COST_PER_1M
+        )
+        self.total_cost += cost * (1 - CLAUDE_BATCH_DISCOUNT) if batch else cost
+
+        self.logger.debug(
+            f"Tokens - Input: {usage.input_tokens} "
+            f"(cache: {cache_read} leídos, {cache_write} escritos), "
+            f"Output: {usage.output_tokens}"
+        )
+
+    def _parse_chunk_response(
+        self,
+        response_text: str,
+        chunk_number: int
+    ) -> Tuple[Optional[Dict], bool]:
+        """
+        Parsea la respuesta JSON del análisis de un chunk.
+
+        Args:
+            response_text: Texto devuelto por el modelo
+            chunk_number: Número del chunk (para logging)
+
+        Un JSON cortado o mal formado conserva sus categorías completas y
+        se informa como incompleto.
+
+        Returns:
+            Tupla (análisis o None si no se recupera ninguna categoría,
+            True si la respuesta estaba completa)
+        """
+        try:
+            analysis, partial = parse_llm_json(response_text, "categorias_encontradas")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON del chunk {chunk_number}: {e}")
+            self.logger.debug(f"Respuesta recibida: {response_text[:500]}...")
+            return None, False
+
+        self.logger.info(
+            f"✓ Chunk {chunk_number} analizado{' (parcial)' if partial else ''}: "
+            f"{len(analysis.get('categorias_encontradas', []))} categorías encontradas"
+        )
+        return analysis, not partial
+
     def extract_metadata(self, first_pages_text: str) -> Dict[str, str]:
         """
         Extrae metadata del candidato de las primeras páginas.
@@ -132,29 +491,25 @@ class LLMAnalyzer:
             Diccionario con metadata
         """
         try:
-            prompt = METADATA_EXTRACTION_PROMPT.format(texto=first_pages_text[:5000])
+            messages = self._build_metadata_messages(first_pages_text)
+            cache_key = self._cache_key(METADATA_EXTRACTION_PROMPT, messages[0]["content"], 500)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return self._parse_metadata_response(cached_text)
 
             response = self.client.messages.create(
                 model=self.model,
                 max_tokens=500,
                 temperature=0,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ]
+                messages=messages
             )
 
-            # Registrar tokens
-            self.total_input_tokens += response.usage.input_tokens
-            self.total_output_tokens += response.usage.output_tokens
-
-            # Parsear respuesta
+            self.record_usage(response)
             response_text = response.content[0].text.strip()
-            metadata = json.loads(response_text)
+            metadata = self._parse_metadata_response(response_text)
 
-            self.logger.info(f"✓ Metadata extraída: {metadata.get('candidato', 'N/A')}")
+            if self.cache:
+                self.cache.put(cache_key, response_text)
 
             # Rate limiting: esperar antes de siguiente llamada
             self.logger.debug("Esperando 15s para respetar rate limits...")
@@ -164,38 +519,154 @@ class LLMAnalyzer:
 
         except Exception as e:
             self.logger.error(f"Error extrayendo metadata: {e}")
-            return {
-                "candidato": "No especificado",
-                "partido_coalicion": "No especificado",
-                "año": "No especificado"
+            return self._default_metadata()
+
+    async def extract_metadata_async(self, first_pages_text: str) -> Tuple[Dict[str, str], bool]:
+        """
+        Versión asíncrona de extract_metadata.
+
+        Args:
+            first_pages_text: Texto de las primeras páginas
+
+        Returns:
+            Tupla (metadata, True si se extrajo del modelo). Si hay un error
+            se retorna la metadata por defecto con False, para que no se
+            guarde como trabajo terminado
+        """
+        try:
+            messages = self._build_metadata_messages(first_pages_text)
+            cache_key = self._cache_key(METADATA_EXTRACTION_PROMPT, messages[0]["content"], 500)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return self._parse_metadata_response(cached_text), True
+
+            response_text, _ = await complete_claude_async(
+                self.async_client,
+                self.scheduler,
+                {"model": self.model, "max_tokens": 500, "temperature": 0, "messages": messages},
+                estimate_tokens(messages[0]["content"]) + 500,
+                on_response=self.record_usage
+            )
+            metadata = self._parse_metadata_response(response_text)
+
+            if self.cache:
+                self.cache.put(cache_key, response_text)
+
+            return metadata, True
+
+        except Exception as e:
+            self.logger.error(f"Error extrayendo metadata: {e}")
+            return self._default_metadata(), False
+
+    async def reanalyze_categories_async(
+        self,
+        missing_categories: List[str],
+        passages: List[str]
+    ) -> Optional[Dict]:
+        """
+        Busca categorías faltantes solo en los pasajes recuperados del documento.
+
+        Args:
+            missing_categories: Categorías que la síntesis no encontró
+            passages: Pasajes relevantes (ver src.retrieval)
+
+        Returns:
+            Análisis con el formato de un chunk o None si hay error
+        """
+        try:
+            prompt = REANALYSIS_PROMPT.format(
+                missing_categories="\n".join(f"- {cat}" for cat in missing_categories),
+                excerpts=format_excerpts(passages)
+            )
+            messages = [{"role": "user", "content": prompt}]
+            cache_key = self._cache_key(REANALYSIS_PROMPT, prompt, MAX_TOKENS_OUTPUT_CHUNK)
+            cached_text = self.cache.get(cache_key) if self.cache else None
+            if cached_text is not None:
+                return loads_tolerant(cached_text)
+
+            response_text, _ = await complete_claude_async(
+                self.async_client,
+                self.scheduler,
+                {
+                    "model": self.model,
+                    "max_tokens": MAX_TOKENS_OUTPUT_CHUNK,
+                    "temperature": 0,
+                    "messages": messages
+                },
+                estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_CHUNK,
+                on_response=self.record_usage,
+                list_key="categorias_encontradas"
+            )
+            reanalysis, partial = parse_llm_json(response_text, "categorias_encontradas")
+
+            if self.cache and not partial:
+                self.cache.put(cache_key, response_text)
+
+            return reanalysis
+
+        except Exception as e:
+            self.logger.error(f"Error en re-análisis de categorías faltantes: {e}")
+            return None
+
+    def _build_metadata_messages(self, first_pages_text: str) -> List[Dict]:
+        """Construye los mensajes para extraer metadata."""
+        prompt = METADATA_EXTRACTION_PROMPT.format(texto=first_pages_text[:5000])
+        return [
+            {
+                "role": "user",
+                "content": prompt
             }
+        ]
+
+    def _parse_metadata_response(self, response_text: str) -> Dict[str, str]:
+        """Parsea la respuesta JSON de metadata."""
+        metadata = loads_tolerant(response_text)
+        self.logger.info(f"✓ Metadata extraída: {metadata.get('candidato', 'N/A')}")
+        return metadata
+
+    def _default_metadata(self) -> Dict[str, str]:
+        """Metadata por defecto cuando no se puede extraer."""
+        return {
+            "candidato": "No especificado",
+            "partido_coalicion": "No especificado",
+            "año": "No especificado"
+        }
 
     def get_token_usage(self) -> Dict[str, int]:
         """
-        Retorna el uso total de tokens.
+        Retorna el uso total de tokens y, si hay cache, sus hits y misses.
+
+        input_tokens incluye los tokens servidos desde el cache de prompts
+        del proveedor (cached_input_tokens) y los escritos en él
+        (cache_write_input_tokens); uncached_input_tokens es el resto.
 
         Returns:
             Diccionario con uso de tokens
         """
-        return {
+        usage = {
             "input_tokens": self.total_input_tokens,
+            "uncached_input_tokens": (
+                self.total_input_tokens - self.cached_input_tokens - self.cache_write_input_tokens
+            ),
+            "cached_input_tokens": self.cached_input_tokens,
+            "cache_write_input_tokens": self.cache_write_input_tokens,
             "output_tokens": self.total_output_tokens,
             "total_tokens": self.total_input_tokens + self.total_output_tokens
         }
+        if self.cache:
+            usage.update(self.cache.get_stats())
+        return usage
 
     def estimate_cost(self) -> float:
         """
         Estima el costo en USD basado en el uso de tokens.
         Precios aproximados para Claude 3.5 Sonnet (verificar precios actuales).
 
+        Los tokens leídos del cache de prompts cuestan una fracción del input
+        normal, escribirlos cuesta algo más, y las respuestas en batch tienen
+        descuento; el costo se acumula por respuesta en record_usage.
+
         Returns:
             Costo estimado en USD
         """
-        # Precios aproximados (verificar en https://www.anthropic.com/pricing)
-        INPUT_COST_PER_1M = 3.00  # USD por millón de tokens de input
-        OUTPUT_COST_PER_1M = 15.00  # USD por millón de tokens de output
-
-        input_cost = (self.total_input_tokens / 1_000_000) * INPUT_COST_PER_1M
-        output_cost = (self.total_output_tokens / 1_000_000) * OUTPUT_COST_PER_1M
-
-        return input_cost + output_cost
+        return self.total_cost
@@ -0,0 +1,198 @@
+"""
+Cache persistente (SQLite) de respuestas LLM, direccionado por contenido.
+"""
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+from src.config import LLM_CACHE_PATH, LLM_CACHE_MAX_SIZE_MB, LLM_CACHE_MAX_AGE_DAYS
+from src.metrics import recorder
+
+logger = logging.getLogger(__name__)
+
+# Cada cuántas escrituras se revisa la política de eviction
+EVICTION_INTERVAL = 50
+
+
+class LLMCache:
+    """
+    Cache en disco de respuestas LLM.
+
+    La clave es un hash de proveedor, modelo, configuración de generación,
+    plantilla de prompt y texto de entrada, por lo que cualquier cambio en
+    alguno de ellos produce un miss. Solo se guardan respuestas que se
+    pudieron parsear.
+    """
+
+    def __init__(
+        self,
+        path: Path = LLM_CACHE_PATH,
+        max_size_mb: float = LLM_CACHE_MAX_SIZE_MB,
+        max_age_days: float = LLM_CACHE_MAX_AGE_DAYS
+    ):
+        """
+        Inicializa el cache.
+
+        Args:
+            path: Archivo SQLite del cache
+            max_size_mb: Tamaño máximo de las respuestas guardadas (MB)
+            max_age_days: Antigüedad máxima de una entrada (días)
+        """
+        self.path = Path(path)
+        self.max_size_bytes = int(max_size_mb * 1024 * 1024)
+        self.max_age_seconds = max_age_days * 24 * 3600
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self.hits = 0
+        self.misses = 0
+        self._writes_since_eviction = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path))
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        self.evict()
+
+    @staticmethod
+    def make_key(
+        provider: str,
+        model: str,
+        generation_config: Dict[str, Any],
+        prompt_template: str,
+        input_text: str
+    ) -> str:
+        """
+        Calcula la clave de cache de una llamada.
+
+        Args:
+            provider: Proveedor LLM ("claude", "gemini")
+            model: Nombre del modelo
+            generation_config: Parámetros de generación (temperatura, max tokens...)
+            prompt_template: Plantilla o system prompt de la llamada
+            input_text: Texto de entrada de la llamada
+
+        Returns:
+            Hash SHA-256 en hexadecimal
+        """
+        payload = json.dumps(
+            [provider, model, generation_config, prompt_template, input_text],
+            ensure_ascii=False,
+            sort_keys=True
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """
+        Busca una respuesta en el cache.
+
+        Args:
+            key: Clave calculada con make_key
+
+        Returns:
+            Texto de la respuesta o None si no existe o expiró
+        """
+        row = self._conn.execute(
+            "SELECT value, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or now - row[1] > self.max_age_seconds:
+            self.misses += 1
+            recorder.inc("llm_cache_misses_total", stage=recorder.current_stage())
+            return None
+
+        self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+        self._conn.commit()
+        self.hits += 1
+        recorder.inc("llm_cache_hits_total", stage=recorder.current_stage())
+        self.logger.debug(f"Cache hit: {key[:12]}")
+        return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        """
+        Guarda una respuesta en el cache.
+
+        Args:
+            key: Clave calculada con make_key
+            value: Texto de la respuesta
+        """
+        now = time.time()
+        self._conn.execute(
+            "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (key, value, len(value.encode("utf-8")), now, now)
+        )
+        self._conn.commit()
+
+        self._writes_since_eviction += 1
+        if self._writes_since_eviction >= EVICTION_INTERVAL:
+            self.evict()
+
+    def evict(self) -> int:
+        """
+        Elimina entradas expiradas y, si se supera el tamaño máximo,
+        las menos usadas recientemente.
+
+        Returns:
+            Número de entradas eliminadas
+        """
+        self._writes_since_eviction = 0
+        cutoff = time.time() - self.max_age_seconds
+        removed = self._conn.execute(
+            "DELETE FROM responses WHERE created_at < ?", (cutoff,)
+        ).rowcount
+
+        total_size = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()[0]
+
+        if total_size > self.max_size_bytes:
+            rows = self._conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at ASC"
+            ).fetchall()
+            to_delete = []
+            for key, size in rows:
+                if total_size <= self.max_size_bytes:
+                    break
+                to_delete.append((key,))
+                total_size -= size
+            self._conn.executemany("DELETE FROM responses WHERE key = ?", to_delete)
+            removed += len(to_delete)
+
+        self._conn.commit()
+
+        if removed:
+            self.logger.info(f"Cache LLM: {removed} entradas eliminadas")
+
+        return removed
+
+    def get_stats(self) -> Dict[str, int]:
+        """
+        Retorna los contadores de hits y misses.
+
+        Returns:
+            Diccionario con hits, misses y entradas
+        """
+        entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_entries": entries
+        }
+
+    def close(self) -> None:
+        """Cierra la conexión SQLite."""
+        self._conn.close()
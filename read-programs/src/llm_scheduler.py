@@ -0,0 +1,208 @@
+"""
+Scheduler compartido para llamadas al LLM con control de concurrencia y rate limits.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from src.config import (
+    MAX_CONCURRENT_REQUESTS,
+    MAX_REQUESTS_PER_MINUTE,
+    MAX_TOKENS_PER_MINUTE,
+    CHARS_PER_TOKEN
+)
+from src.metrics import recorder
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+WINDOW_SECONDS = 60.0
+
+
+class LLMScheduler:
+    """
+    Cola única para todas las llamadas al LLM de una ejecución.
+
+    Limita las llamadas simultáneas y respeta ventanas deslizantes de
+    requests/minuto y tokens/minuto. Cuando un analizador recibe un 429,
+    report_rate_limit pausa a todos los llamadores, no solo al afectado.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENT_REQUESTS,
+        requests_per_minute: int = MAX_REQUESTS_PER_MINUTE,
+        tokens_per_minute: int = MAX_TOKENS_PER_MINUTE
+    ):
+        """
+        Inicializa el scheduler.
+
+        Args:
+            max_concurrency: Máximo de llamadas en vuelo
+            requests_per_minute: Límite de requests por minuto (0 = sin límite)
+            tokens_per_minute: Límite de tokens por minuto (0 = sin límite)
+        """
+        if max_concurrency < 1:
+            raise ValueError("max_concurrency debe ser al menos 1")
+
+        self.max_concurrency = max_concurrency
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lock = asyncio.Lock()
+        self._window: deque = deque()  # (timestamp, tokens)
+        self._paused_until = 0.0
+
+        self.total_requests = 0
+        self.rate_limit_hits = 0
+        self.total_wait_seconds = 0.0
+        self.queued = 0
+        self.in_flight = 0
+
+    async def submit(
+        self,
+        call: Callable[[], Awaitable[T]],
+        estimated_tokens: int = 0
+    ) -> T:
+        """
+        Ejecuta una llamada al LLM cuando hay capacidad disponible.
+
+        Args:
+            call: Función sin argumentos que retorna la corrutina de la llamada
+            estimated_tokens: Tokens estimados (input + output) de la llamada
+
+        Returns:
+            Resultado de la llamada
+        """
+        self.queued += 1
+        recorder.set_max("llm_queue_depth_max", self.queued)
+        queued_at = time.monotonic()
+        dequeued = False
+        try:
+            async with self._semaphore:
+                await self._wait_for_capacity(estimated_tokens)
+                self.queued -= 1
+                dequeued = True
+                recorder.observe("llm_queue_wait_seconds", time.monotonic() - queued_at)
+
+                self.total_requests += 1
+                self.in_flight += 1
+                recorder.set_max("llm_in_flight_max", self.in_flight)
+                try:
+                    return await call()
+                finally:
+                    self.in_flight -= 1
+        finally:
+            if not dequeued:
+                self.queued -= 1
+
+    def report_rate_limit(self, wait_seconds: float) -> None:
+        """
+        Pausa todas las llamadas tras recibir un rate limit del proveedor.
+
+        Args:
+            wait_seconds: Segundos a esperar antes de la siguiente llamada
+        """
+        self.rate_limit_hits += 1
+        self._paused_until = max(self._paused_until, time.monotonic() + wait_seconds)
+
+    async def _wait_for_capacity(self, estimated_tokens: int) -> None:
+        """Espera hasta que la llamada quepa en los límites por minuto."""
+        async with self._lock:
+            started = time.monotonic()
+
+            while True:
+                now = time.monotonic()
+
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                while self._window and now - self._window[0][0] >= WINDOW_SECONDS:
+                    self._window.popleft()
+
+                requests_ok = (
+                    not self.requests_per_minute
+                    or len(self._window) < self.requests_per_minute
+                )
+                # Una llamada más grande que el límite completo se deja pasar
+                # con la ventana vacía para no bloquear para siempre
+                tokens_in_window = sum(tokens for _, tokens in self._window)
+                tokens_ok = (
+                    not self.tokens_per_minute
+                    or not self._window
+                    or tokens_in_window + estimated_tokens <= self.tokens_per_minute
+                )
+
+                if requests_ok and tokens_ok:
+                    self._window.append((now, estimated_tokens))
+                    self.total_wait_seconds += now - started
+                    return
+
+                wait = self._window[0][0] + WINDOW_SECONDS - now
+                self.logger.debug(f"Límite por minuto alcanzado, esperando {wait:.1f}s...")
+                await asyncio.sleep(max(wait, 0.05))
+
+    def get_stats(self) -> Dict[str, float]:
+        """
+        Retorna estadísticas del scheduler.
+
+        Returns:
+            Diccionario con requests, rate limits y tiempo de espera
+        """
+        return {
+            "requests": self.total_requests,
+            "rate_limit_hits": self.rate_limit_hits,
+            "wait_seconds": round(self.total_wait_seconds, 2)
+        }
+
+
+async def run_scheduled(
+    scheduler: Optional[LLMScheduler],
+    call: Callable[[], Awaitable[T]],
+    estimated_tokens: int = 0
+) -> T:
+    """
+    Ejecuta una llamada a través del scheduler, o directamente si no hay uno.
+
+    Registra en las métricas de la ejecución la latencia, los tokens y los
+    errores de la llamada, atribuidos a la etapa del span activo.
+
+    Args:
+        scheduler: Scheduler compartido (opcional)
+        call: Función sin argumentos que retorna la corrutina de la llamada
+        estimated_tokens: Tokens estimados de la llamada
+
+    Returns:
+        Resultado de la llamada
+    """
+    async def timed_call() -> T:
+        started = time.perf_counter()
+        try:
+            response = await call()
+        except Exception as e:
+            recorder.record_llm_error(e)
+            raise
+        recorder.record_llm_response(response, time.perf_counter() - started)
+        return response
+
+    if scheduler is None:
+        return await timed_call()
+    return await scheduler.submit(timed_call, estimated_tokens)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Estimación rápida de tokens a partir del largo del texto.
+
+    Args:
+        text: Texto a estimar
+
+    Returns:
+        Número aproximado de tokens
+    """
+    return len(text) // CHARS_PER_TOKEN
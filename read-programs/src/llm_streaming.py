@@ -0,0 +1,229 @@
+"""
+Llamadas al LLM con respuesta en streaming, detección de respuestas
+truncadas (stop reason) y pedidos de continuación.
+
+Una respuesta cortada por el máximo de tokens de salida no se descarta ni se
+vuelve a pedir desde cero: se pide solo la continuación, partiendo del texto
+ya recibido, y las partes se concatenan. Si al final el JSON sigue
+incompleto o mal formado, se pide una vez más solo el resto desde la última
+entrada completa de su lista principal (ver src.json_salvage).
+"""
+import logging
+from typing import Any, Callable, Dict, Optional, Tuple
+from src.config import STREAM_RESPONSES, MAX_CONTINUATIONS
+from src.prompts import CONTINUATION_PROMPT
+from src.json_salvage import resume_prefix
+from src.llm_scheduler import LLMScheduler, run_scheduled
+from src.metrics import recorder
+
+logger = logging.getLogger(__name__)
+
+# Stop reason de Claude y finish reason de Gemini de una respuesta truncada
+CLAUDE_TRUNCATED = "max_tokens"
+GEMINI_TRUNCATED = "MAX_TOKENS"
+
+
+def _tail_prefix(text: str, list_key: Optional[str], tail_requested: bool) -> Optional[str]:
+    """Prefijo para pedir solo el resto de un JSON incompleto (una vez por llamada)."""
+    if list_key is None or tail_requested:
+        return None
+    prefix = resume_prefix(text, list_key)
+    if prefix is not None:
+        logger.info(
+            f"JSON incompleto en {len(text):,} caracteres, pidiendo solo el resto "
+            f"desde el carácter {len(prefix):,}"
+        )
+    return prefix
+
+
+async def claude_request(async_client, params: Dict[str, Any]):
+    """
+    Una llamada a messages de Claude, en streaming si STREAM_RESPONSES.
+
+    Returns:
+        Message final (texto completo, stop_reason y uso de tokens)
+    """
+    if not STREAM_RESPONSES:
+        return await async_client.messages.create(**params)
+    async with async_client.messages.stream(**params) as stream:
+        return await stream.get_final_message()
+
+
+def claude_text(message) -> str:
+    """Texto de un Message de Claude (vacío si no trae bloques de texto)."""
+    return "".join(getattr(block, "text", "") for block in message.content or [])
+
+
+async def complete_claude_async(
+    async_client,
+    scheduler: Optional[LLMScheduler],
+    params: Dict[str, Any],
+    estimated_tokens: int,
+    on_response: Optional[Callable[[Any], None]] = None,
+    prefix: str = "",
+    list_key: Optional[str] = None,
+    max_continuations: int = MAX_CONTINUATIONS
+) -> Tuple[str, bool]:
+    """
+    Llamada a Claude que continúa las respuestas truncadas.
+
+    La continuación repite la request con el texto recibido como prefijo del
+    turno del asistente, de modo que el modelo sigue el JSON desde donde se
+    cortó en vez de generarlo de nuevo.
+
+    Args:
+        async_client: Cliente AsyncAnthropic (o compatible)
+        scheduler: Scheduler compartido (opcional)
+        params: Parámetros de messages.create
+        estimated_tokens: Tokens estimados de cada llamada
+        on_response: Se llama con cada Message (p. ej. para registrar el uso)
+        prefix: Respuesta parcial ya recibida (p. ej. de un batch truncado)
+        list_key: Lista principal del JSON esperado; si la respuesta final no
+            es JSON válido, se pide el resto desde su última entrada completa
+        max_continuations: Continuaciones máximas
+
+    Returns:
+        Tupla (texto completo, True si la respuesta terminó antes del máximo
+        de tokens)
+    """
+    text = prefix.rstrip()
+    continuation = 0
+    tail_requested = False
+
+    while True:
+        if text:
+            request = {**params, "messages": [*params["messages"], {"role": "assistant", "content": text}]}
+            recorder.record_continuation()
+        else:
+            request = params
+
+        response = await run_scheduled(
+            scheduler, lambda: claude_request(async_client, request), estimated_tokens
+        )
+        if on_response:
+            on_response(response)
+
+        # El prefijo del asistente no puede terminar en espacios
+        text = (text + claude_text(response)).rstrip()
+        truncated = response.stop_reason == CLAUDE_TRUNCATED
+        if truncated and continuation < max_continuations:
+            continuation += 1
+            logger.info(
+                f"Respuesta truncada en {len(text):,} caracteres, pidiendo continuación "
+                f"({continuation}/{max_continuations})"
+            )
+            continue
+
+        tail = _tail_prefix(text, list_key, tail_requested)
+        if tail is not None:
+            text, tail_requested = tail, True
+            continue
+
+        if truncated:
+            logger.warning(f"Respuesta truncada tras {max_continuations} continuaciones")
+        return text.strip(), not truncated
+
+
+async def gemini_request(model, contents, generation_config: Optional[Dict] = None):
+    """
+    Una llamada a generate_content_async de Gemini, en streaming si
+    STREAM_RESPONSES (la respuesta se consume completa antes de retornar).
+    """
+    response = await model.generate_content_async(
+        contents, generation_config=generation_config, stream=STREAM_RESPONSES
+    )
+    if STREAM_RESPONSES:
+        await response.resolve()
+    return response
+
+
+def gemini_text(response) -> str:
+    """Texto de una respuesta de Gemini (vacío si el candidato no trae partes)."""
+    try:
+        return response.text
+    except ValueError:
+        return ""
+
+
+def gemini_finish_reason(response) -> str:
+    """Finish reason del primer candidato de una respuesta de Gemini."""
+    candidates = getattr(response, "candidates", None) or []
+    if not candidates:
+        return ""
+    reason = candidates[0].finish_reason
+    return getattr(reason, "name", str(reason))
+
+
+async def complete_gemini_async(
+    model,
+    scheduler: Optional[LLMScheduler],
+    prompt: str,
+    generation_config: Dict[str, Any],
+    estimated_tokens: int,
+    on_response: Optional[Callable[[Any], None]] = None,
+    list_key: Optional[str] = None,
+    max_continuations: int = MAX_CONTINUATIONS
+) -> Tuple[str, bool]:
+    """
+    Llamada a Gemini que continúa las respuestas truncadas.
+
+    Gemini no acepta un prefijo para el turno del modelo: la continuación
+    envía la conversación (prompt, respuesta parcial) más CONTINUATION_PROMPT,
+    con salida de texto plano para que no abra un JSON nuevo.
+
+    Args:
+        model: GenerativeModel (con su system_instruction, si la tiene)
+        scheduler: Scheduler compartido (opcional)
+        prompt: Prompt de la llamada
+        generation_config: Configuración de generación del modelo
+        estimated_tokens: Tokens estimados de cada llamada
+        on_response: Se llama con cada respuesta (p. ej. para registrar el uso)
+        list_key: Lista principal del JSON esperado; si la respuesta final no
+            es JSON válido, se pide el resto desde su última entrada completa
+        max_continuations: Continuaciones máximas
+
+    Returns:
+        Tupla (texto completo, True si la respuesta terminó antes del máximo
+        de tokens)
+    """
+    text = ""
+    continuation = 0
+    tail_requested = False
+    continuation_config = {**generation_config, "response_mime_type": "text/plain"}
+
+    while True:
+        if text:
+            contents = [
+                {"role": "user", "parts": [prompt]},
+                {"role": "model", "parts": [text]},
+                {"role": "user", "parts": [CONTINUATION_PROMPT]}
+            ]
+            config = continuation_config
+            recorder.record_continuation()
+        else:
+            contents, config = prompt, None
+
+        response = await run_scheduled(
+            scheduler, lambda: gemini_request(model, contents, config), estimated_tokens
+        )
+        if on_response:
+            on_response(response)
+
+        text += gemini_text(response)
+        truncated = gemini_finish_reason(response) == GEMINI_TRUNCATED
+        if truncated and continuation < max_continuations:
+            continuation += 1
+            logger.info(
+                f"Respuesta truncada en {len(text):,} caracteres, pidiendo continuación "
+                f"({continuation}/{max_continuations})"
+            )
+            continue
+
+        tail = _tail_prefix(text, list_key, tail_requested)
+        if tail is not None:
+            text, tail_requested = tail, True
+            continue
+
+        if truncated:
+            logger.warning(f"Respuesta truncada tras {max_continuations} continuaciones")
+        return text.strip(), not truncated
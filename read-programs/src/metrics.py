@@ -0,0 +1,394 @@
+"""
+Métricas y trazas por etapa del pipeline: tiempos, tokens, reintentos y colas.
+
+Todas las métricas de una ejecución se acumulan en el recorder global del
+módulo (``recorder``). Los spans se anidan con contextvars, así cada tarea
+de asyncio hereda el span (documento, etapa) desde donde fue creada y las
+llamadas al LLM quedan atribuidas a su etapa sin pasar el contexto a mano.
+"""
+import bisect
+import logging
+import os
+import tempfile
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from pathlib import Path
+from typing import Awaitable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+from src.incremental import write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Etapas del pipeline; los spans anidados heredan la etapa de su padre
+STAGES = ("extract", "filter", "chunk", "analyze", "metadata", "synthesize", "validate", "reanalyze")
+
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+DEFAULT_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+PROMETHEUS_PREFIX = "read_programs_"
+
+_current_span: ContextVar[Optional[Dict]] = ContextVar("current_span", default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict) -> Labels:
+    """Etiquetas como tupla ordenada (clave de los diccionarios de métricas)."""
+    return tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None))
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    """Percentil por rango más cercano de una lista ya ordenada."""
+    if not values:
+        return 0.0
+    index = min(len(values) - 1, max(0, round(fraction * len(values)) - 1))
+    return values[index]
+
+
+class Histogram:
+    """Histograma de buckets fijos que además guarda los valores observados."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.values: List[float] = []
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        """Registra un valor."""
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+        self.values.append(value)
+        self.sum += value
+
+    def cumulative_counts(self) -> List[int]:
+        """Conteos acumulados por bucket (semántica ``le`` de Prometheus)."""
+        counts, total = [], 0
+        for count in self.bucket_counts:
+            total += count
+            counts.append(total)
+        return counts
+
+    def summary(self) -> Dict:
+        """Conteo, suma y percentiles de los valores observados."""
+        ordered = sorted(self.values)
+        return {
+            "count": len(ordered),
+            "sum": round(self.sum, 4),
+            "p50": round(_percentile(ordered, 0.50), 4),
+            "p95": round(_percentile(ordered, 0.95), 4),
+            "p99": round(_percentile(ordered, 0.99), 4),
+            "max": round(ordered[-1], 4) if ordered else 0.0,
+            "buckets": {
+                str(bound): count
+                for bound, count in zip(self.buckets, self.cumulative_counts())
+            }
+        }
+
+
+class MetricsRecorder:
+    """
+    Acumula contadores, gauges (máximos), histogramas y spans de una ejecución.
+
+    Pensado para un solo event loop: las operaciones son simples sumas en
+    diccionarios y no necesitan locks entre corrutinas.
+    """
+
+    def __init__(self):
+        """Inicializa un recorder vacío."""
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.reset()
+
+    def reset(self) -> None:
+        """Descarta todas las métricas y spans registrados."""
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.spans: List[Dict] = []
+        self.started_at = datetime.now()
+        self._started = time.perf_counter()
+        self._next_span_id = 1
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Incrementa un contador."""
+        key = (name, _labels(labels))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_max(self, name: str, value: float, **labels) -> None:
+        """Actualiza un gauge con el máximo observado."""
+        key = (name, _labels(labels))
+        self.gauges[key] = max(self.gauges.get(key, value), value)
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        """Registra un valor en un histograma."""
+        key = (name, _labels(labels))
+        if key not in self.histograms:
+            self.histograms[key] = Histogram()
+        self.histograms[key].observe(value)
+
+    def counter_value(self, name: str, **labels) -> float:
+        """Suma de un contador para las series que coinciden con las etiquetas dadas."""
+        wanted = set(_labels(labels))
+        return sum(
+            value for (metric, series), value in self.counters.items()
+            if metric == name and wanted <= set(series)
+        )
+
+    # ------------------------------------------------------------------
+    # Spans
+    # ------------------------------------------------------------------
+
+    def current_stage(self) -> str:
+        """Etapa del span activo ("none" fuera de cualquier etapa)."""
+        span = _current_span.get()
+        return (span or {}).get("stage") or "none"
+
+    def _open_span(self, name: str, attrs: Dict) -> Dict:
+        parent = _current_span.get()
+        span = {
+            "id": self._next_span_id,
+            "parent_id": parent["id"] if parent else None,
+            "name": name,
+            "stage": name if name in STAGES else (parent or {}).get("stage"),
+            "attrs": attrs,
+            "start": round(time.perf_counter() - self._started, 4),
+            "duration": 0.0,
+            "status": "ok"
+        }
+        self._next_span_id += 1
+        return span
+
+    def _close_span(self, span: Dict, duration: float) -> None:
+        span["duration"] = round(duration, 4)
+        self.spans.append(span)
+        self.observe("span_duration_seconds", duration, span=span["name"])
+
+    @contextmanager
+    def span(self, name: str, **attrs) -> Iterator[Dict]:
+        """
+        Mide un bloque de código como span hijo del span activo.
+
+        Funciona igual dentro de corrutinas: el span activo vive en un
+        contextvar, que cada tarea de asyncio copia al crearse.
+
+        Args:
+            name: Nombre del span (una etapa de STAGES, "document", "chunk_analysis"...)
+            **attrs: Atributos del span (documento, número de chunk...)
+
+        Yields:
+            Diccionario del span; se le pueden agregar atributos en "attrs"
+        """
+        span = self._open_span(name, attrs)
+        token = _current_span.set(span)
+        started = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span["status"] = "error"
+            span["attrs"]["error"] = type(e).__name__
+            raise
+        finally:
+            _current_span.reset(token)
+            self._close_span(span, time.perf_counter() - started)
+
+    async def traced(self, name: str, awaitable: Awaitable[T], **attrs) -> T:
+        """Espera una corrutina dentro de un span (útil con asyncio.gather)."""
+        with self.span(name, **attrs):
+            return await awaitable
+
+    def record_span(self, name: str, duration: float, **attrs) -> None:
+        """
+        Registra un span ya medido en otro lado (p. ej. en un proceso worker).
+
+        Args:
+            name: Nombre del span
+            duration: Duración en segundos
+            **attrs: Atributos del span
+        """
+        span = self._open_span(name, attrs)
+        span["start"] = round(max(0.0, span["start"] - duration), 4)
+        self._close_span(span, duration)
+
+    # ------------------------------------------------------------------
+    # LLM
+    # ------------------------------------------------------------------
+
+    def record_llm_response(self, response, duration: Optional[float] = None) -> None:
+        """
+        Registra latencia y tokens de una respuesta de Claude o Gemini.
+
+        Args:
+            response: Message de Anthropic o respuesta de Gemini
+            duration: Segundos que tardó la llamada (None en resultados de batch)
+        """
+        stage = self.current_stage()
+        self.inc("llm_requests_total", stage=stage)
+        if duration is not None:
+            self.observe("llm_call_duration_seconds", duration, stage=stage)
+
+        usage = getattr(response, "usage", None)
+        metadata = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            cached = getattr(usage, "cache_read_input_tokens", 0) or 0
+            written = getattr(usage, "cache_creation_input_tokens", 0) or 0
+            input_tokens = (usage.input_tokens or 0) + cached + written
+            output_tokens = usage.output_tokens or 0
+        elif metadata is not None:
+            cached = getattr(metadata, "cached_content_token_count", 0) or 0
+            input_tokens = getattr(metadata, "prompt_token_count", 0) or 0
+            output_tokens = getattr(metadata, "candidates_token_count", 0) or 0
+        else:
+            return
+
+        self.inc("llm_input_tokens_total", input_tokens, stage=stage)
+        self.inc("llm_output_tokens_total", output_tokens, stage=stage)
+        self.inc("llm_cached_input_tokens_total", cached, stage=stage)
+
+    def record_llm_error(self, error: BaseException) -> None:
+        """Cuenta un error de llamada al LLM, separando los rate limits (429)."""
+        stage = self.current_stage()
+        self.inc("llm_errors_total", stage=stage, error=type(error).__name__)
+        message = str(error)
+        if getattr(error, "status_code", None) == 429 or "429" in message or "quota" in message.lower():
+            self.inc("llm_rate_limits_total", stage=stage)
+
+    def record_retry(self, reason: str) -> None:
+        """Cuenta un reintento de llamada al LLM en la etapa activa."""
+        self.inc("llm_retries_total", stage=self.current_stage(), reason=reason)
+
+    def record_continuation(self) -> None:
+        """Cuenta un pedido de continuación de una respuesta truncada."""
+        self.inc("llm_continuations_total", stage=self.current_stage())
+
+    # ------------------------------------------------------------------
+    # Exportación
+    # ------------------------------------------------------------------
+
+    def stage_summary(self) -> Dict[str, Dict]:
+        """Latencias por nombre de span (conteo, total, percentiles)."""
+        summary = {}
+        for (name, labels), histogram in sorted(self.histograms.items()):
+            if name == "span_duration_seconds":
+                stats = histogram.summary()
+                stats.pop("buckets")
+                summary[dict(labels)["span"]] = stats
+        return summary
+
+    def tokens_by_stage(self) -> Dict[str, Dict[str, int]]:
+        """Tokens de entrada, salida y desde cache de prompts por etapa."""
+        result: Dict[str, Dict[str, int]] = {}
+        fields = {
+            "llm_input_tokens_total": "input_tokens",
+            "llm_output_tokens_total": "output_tokens",
+            "llm_cached_input_tokens_total": "cached_input_tokens",
+            "llm_requests_total": "requests"
+        }
+        for (name, labels), value in sorted(self.counters.items()):
+            if name in fields:
+                stage = dict(labels).get("stage", "none")
+                result.setdefault(stage, {field: 0 for field in fields.values()})
+                result[stage][fields[name]] += int(value)
+        return result
+
+    def to_report(self, extra: Optional[Dict] = None) -> Dict:
+        """
+        Reporte completo de la ejecución.
+
+        Args:
+            extra: Datos adicionales a incluir (estadísticas del scheduler, cache...)
+
+        Returns:
+            Diccionario serializable a JSON
+        """
+        def series(items):
+            return [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(items)
+            ]
+
+        report = {
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(time.perf_counter() - self._started, 3),
+            "stages": self.stage_summary(),
+            "tokens_by_stage": self.tokens_by_stage(),
+            "counters": series(self.counters.items()),
+            "gauges": series(self.gauges.items()),
+            "histograms": [
+                {"name": name, "labels": dict(labels), **histogram.summary()}
+                for (name, labels), histogram in sorted(self.histograms.items())
+            ],
+            "spans": self.spans
+        }
+        if extra:
+            report.update(extra)
+        return report
+
+    def write_json(self, path: Path, extra: Optional[Dict] = None) -> None:
+        """Escribe el reporte JSON de la ejecución (escritura atómica)."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(path, self.to_report(extra))
+        self.logger.info(f"Reporte de métricas guardado en: {path}")
+
+    def to_prometheus(self) -> str:
+        """Métricas en formato de exposición de texto de Prometheus."""
+        lines: List[str] = []
+
+        def render(labels: Labels, extra: Labels = ()) -> str:
+            pairs = list(labels) + list(extra)
+            if not pairs:
+                return ""
+            escaped = (
+                k + '="' + v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+                for k, v in pairs
+            )
+            return "{" + ",".join(escaped) + "}"
+
+        def family(store: Dict, kind: str) -> None:
+            declared = set()
+            for (name, labels), value in sorted(store.items()):
+                metric = PROMETHEUS_PREFIX + name
+                if metric not in declared:
+                    declared.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                if kind == "histogram":
+                    for bound, count in zip(value.buckets, value.cumulative_counts()):
+                        lines.append(f"{metric}_bucket{render(labels, (('le', str(bound)),))} {count}")
+                    lines.append(f"{metric}_bucket{render(labels, (('le', '+Inf'),))} {len(value.values)}")
+                    lines.append(f"{metric}_sum{render(labels)} {value.sum}")
+                    lines.append(f"{metric}_count{render(labels)} {len(value.values)}")
+                else:
+                    lines.append(f"{metric}{render(labels)} {value}")
+
+        family(self.counters, "counter")
+        family(self.gauges, "gauge")
+        family(self.histograms, "histogram")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: Path) -> None:
+        """Escribe el textfile de Prometheus de forma atómica."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(self.to_prometheus())
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+        self.logger.info(f"Métricas Prometheus guardadas en: {path}")
+
+
+# Recorder de la ejecución, compartido por todos los componentes
+recorder = MetricsRecorder()
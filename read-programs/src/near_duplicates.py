@@ -0,0 +1,202 @@
+"""
+Detección local de casi-duplicados (MinHash + LSH) para propuestas y citas.
+"""
+import hashlib
+import logging
+import random
+import re
+import unicodedata
+from collections import defaultdict
+from typing import Callable, Dict, List, Set
+from src.config import NEAR_DUPLICATE_THRESHOLD
+
+# Primo de Mersenne 2^61 - 1 para las permutaciones (a*x + b) mod p
+MERSENNE_PRIME = (1 << 61) - 1
+WORD_PATTERN = re.compile(r"\w+")
+
+# Representantes por banda contra los que se compara cada texto. Acota el
+# costo cuando muchos textos parecidos (pero bajo el umbral) caen juntos
+MAX_BAND_REPRESENTATIVES = 32
+
+
+def normalize_text(text: str) -> str:
+    """Minúsculas, sin tildes ni puntuación."""
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return " ".join(WORD_PATTERN.findall(without_accents))
+
+
+def proposal_text(proposal) -> str:
+    """Texto comparable de una propuesta (título + descripción)."""
+    if isinstance(proposal, dict):
+        return f"{proposal.get('titulo', '')} {proposal.get('descripcion', '')}"
+    return str(proposal)
+
+
+def information_score(text: str) -> tuple:
+    """Prioriza la versión con más cifras y, luego, más larga."""
+    return (sum(c.isdigit() for c in text), len(text))
+
+
+class NearDuplicateDetector:
+    """
+    Agrupa textos casi idénticos sin comparar todos los pares.
+
+    Cada texto se convierte en shingles de palabras y en una firma MinHash;
+    las firmas se dividen en bandas (LSH) y solo los textos que comparten
+    alguna banda se comparan con Jaccard exacto, contra a lo más
+    MAX_BAND_REPRESENTATIVES representantes por banda. El costo es lineal
+    en el número de textos.
+    """
+
+    def __init__(
+        self,
+        threshold: float = NEAR_DUPLICATE_THRESHOLD,
+        num_perm: int = 64,
+        bands: int = 16,
+        shingle_size: int = 2,
+        seed: int = 42
+    ):
+        """
+        Inicializa el detector.
+
+        Args:
+            threshold: Similitud de Jaccard mínima para considerar duplicados
+            num_perm: Número de permutaciones de la firma MinHash
+            bands: Número de bandas LSH (debe dividir a num_perm)
+            shingle_size: Palabras por shingle
+            seed: Semilla de las permutaciones (resultados reproducibles)
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm debe ser múltiplo de bands")
+
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+        rng = random.Random(seed)
+        self.permutations = [
+            (rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    def _shingles(self, text: str) -> Set[int]:
+        """Shingles de palabras del texto normalizado, como enteros de 64 bits."""
+        words = normalize_text(text).split()
+        if len(words) < self.shingle_size:
+            grams = [" ".join(words)] if words else []
+        else:
+            grams = [
+                " ".join(words[i:i + self.shingle_size])
+                for i in range(len(words) - self.shingle_size + 1)
+            ]
+        return {
+            int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=8).digest(), "big")
+            for g in grams
+        }
+
+    def _signature(self, shingles: Set[int]) -> List[int]:
+        """Firma MinHash de un conjunto de shingles."""
+        return [
+            min((a * s + b) % MERSENNE_PRIME for s in shingles)
+            for a, b in self.permutations
+        ]
+
+    def cluster(self, texts: List[str]) -> List[List[int]]:
+        """
+        Agrupa índices de textos casi duplicados.
+
+        Args:
+            texts: Textos a agrupar
+
+        Returns:
+            Clusters de índices, en orden de primera aparición
+        """
+        parent = list(range(len(texts)))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        shingle_sets = [self._shingles(t) for t in texts]
+        buckets: Dict[tuple, List[int]] = defaultdict(list)
+
+        for idx, shingles in enumerate(shingle_sets):
+            if not shingles:
+                continue
+            signature = self._signature(shingles)
+            for band in range(self.bands):
+                start = band * self.rows
+                buckets[(band, *signature[start:start + self.rows])].append(idx)
+
+        for members in buckets.values():
+            # Cada miembro se compara solo con un representante por cluster
+            # ya presente en la banda, no con todos los miembros
+            representatives: List[int] = []
+            band_roots = set()
+            for idx in members:
+                root = find(idx)
+                if root in band_roots:
+                    continue
+                for rep in representatives[-MAX_BAND_REPRESENTATIVES:]:
+                    a, b = shingle_sets[rep], shingle_sets[idx]
+                    if len(a & b) / len(a | b) >= self.threshold:
+                        parent[root] = find(rep)
+                        break
+                else:
+                    representatives.append(idx)
+                    band_roots.add(root)
+
+        clusters: Dict[int, List[int]] = {}
+        for idx in range(len(texts)):
+            clusters.setdefault(find(idx), []).append(idx)
+        return list(clusters.values())
+
+    def deduplicate(self, items: List, text_of: Callable = str) -> List:
+        """
+        Deja un representante por cluster de casi-duplicados.
+
+        El representante es la versión con más cifras (y luego la más larga),
+        ubicado en la posición del primer elemento de su cluster.
+
+        Args:
+            items: Propuestas, citas u otros elementos
+            text_of: Función que obtiene el texto comparable de un elemento
+
+        Returns:
+            Elementos sin casi-duplicados
+        """
+        if len(items) < 2:
+            return list(items)
+
+        texts = [text_of(item) for item in items]
+        clusters = self.cluster(texts)
+        representatives = [
+            items[max(cluster, key=lambda i: information_score(texts[i]))]
+            for cluster in clusters
+        ]
+
+        if len(representatives) < len(items):
+            self.logger.debug(f"Casi-duplicados: {len(items)} → {len(representatives)} elementos")
+        return representatives
+
+
+def deduplicate_category(cat_data: Dict, detector: NearDuplicateDetector) -> None:
+    """
+    Elimina propuestas y citas casi duplicadas de una categoría (in place).
+
+    Args:
+        cat_data: Categoría con propuestas_clave y citas_textuales
+        detector: Detector a usar
+    """
+    if cat_data.get("propuestas_clave"):
+        cat_data["propuestas_clave"] = detector.deduplicate(
+            cat_data["propuestas_clave"], proposal_text
+        )
+    if cat_data.get("citas_textuales"):
+        cat_data["citas_textuales"] = detector.deduplicate(cat_data["citas_textuales"])
@@ -0,0 +1,131 @@
+"""
+Compactación del payload de análisis parciales enviado a la síntesis.
+"""
+import json
+import logging
+from typing import Dict, List, Tuple
+from src.config import COMPACT_SYNTHESIS_PAYLOAD
+from src.llm_scheduler import estimate_tokens
+from src.near_duplicates import NearDuplicateDetector, deduplicate_category
+
+logger = logging.getLogger(__name__)
+
+
+def _is_empty(value) -> bool:
+    """True para strings vacíos, colecciones vacías y None."""
+    if value is None:
+        return True
+    if isinstance(value, str):
+        return not value.strip()
+    if isinstance(value, (list, dict)):
+        return not value
+    return False
+
+
+def _prune(value):
+    """Elimina recursivamente campos vacíos de dicts y listas."""
+    if isinstance(value, dict):
+        pruned = {k: _prune(v) for k, v in value.items()}
+        return {k: v for k, v in pruned.items() if not _is_empty(v)}
+    if isinstance(value, list):
+        pruned = [_prune(v) for v in value]
+        return [v for v in pruned if not _is_empty(v)]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+
+def _append_unique(target: List, items: List, seen: set) -> None:
+    """Agrega los items que no sean duplicados exactos."""
+    for item in items:
+        key = json.dumps(item, ensure_ascii=False, sort_keys=True)
+        if key not in seen:
+            seen.add(key)
+            target.append(item)
+
+
+def compact_analyses(analyses: List[Dict]) -> Dict[str, Dict]:
+    """
+    Agrupa los análisis parciales por categoría, sin campos vacíos ni
+    duplicados (exactos o casi idénticos).
+
+    Cada chunk repite su propio bloque de categoría; agrupado, el nombre de
+    la categoría y los bloques analisis_perspectiva iguales aparecen una
+    sola vez.
+
+    Args:
+        analyses: Análisis parciales con formato de chunk
+
+    Returns:
+        Dict categoría -> {analisis_perspectiva, propuestas_clave, citas_textuales}
+    """
+    grouped: Dict[str, Dict] = {}
+    seen: Dict[str, Dict[str, set]] = {}
+
+    for analysis in analyses:
+        for cat_data in analysis.get("categorias_encontradas", []):
+            cat_name = (cat_data.get("categoria") or "").strip()
+            if not cat_name:
+                continue
+
+            if cat_name not in grouped:
+                grouped[cat_name] = {
+                    "analisis_perspectiva": [],
+                    "propuestas_clave": [],
+                    "citas_textuales": []
+                }
+                seen[cat_name] = {field: set() for field in grouped[cat_name]}
+
+            perspective = _prune(cat_data.get("analisis_perspectiva", {}))
+            if perspective:
+                _append_unique(
+                    grouped[cat_name]["analisis_perspectiva"], [perspective],
+                    seen[cat_name]["analisis_perspectiva"]
+                )
+
+            for field in ("propuestas_clave", "citas_textuales"):
+                _append_unique(
+                    grouped[cat_name][field], _prune(cat_data.get(field, [])),
+                    seen[cat_name][field]
+                )
+
+    detector = NearDuplicateDetector()
+    for data in grouped.values():
+        deduplicate_category(data, detector)
+
+    return {name: _prune(data) for name, data in grouped.items()}
+
+
+def serialize_analyses(analyses: List[Dict]) -> Tuple[str, Dict[str, int]]:
+    """
+    Serializa los análisis parciales para un prompt.
+
+    Con COMPACT_SYNTHESIS_PAYLOAD activo, los agrupa con compact_analyses y
+    los minifica; si no, usa el JSON indentado original.
+
+    Args:
+        analyses: Análisis parciales
+
+    Returns:
+        Tupla (JSON para el prompt, estadísticas de tokens estimados)
+    """
+    verbose = json.dumps(analyses, ensure_ascii=False, indent=2)
+    if not COMPACT_SYNTHESIS_PAYLOAD:
+        tokens = estimate_tokens(verbose)
+        return verbose, {"tokens_original": tokens, "tokens_compact": tokens}
+
+    compact = json.dumps(
+        compact_analyses(analyses), ensure_ascii=False, separators=(",", ":")
+    )
+    return compact, {
+        "tokens_original": estimate_tokens(verbose),
+        "tokens_compact": estimate_tokens(compact)
+    }
+
+
+def format_savings(stats: Dict[str, int]) -> str:
+    """Texto con el ahorro de tokens de un payload compactado."""
+    original = stats["tokens_original"]
+    compact = stats["tokens_compact"]
+    saved = 1 - compact / original if original else 0.0
+    return f"{original:,} → {compact:,} tokens estimados ({saved:.0%} de ahorro)"
@@ -2,12 +2,259 @@
 Módulo para extracción de texto de archivos PDF usando PyMuPDF (fitz).
 """
 import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict
-import fitz  # PyMuPDF
+from typing import Optional, Dict, List
+from src.config import PARALLEL_EXTRACTION_MIN_PAGES
 
 logger = logging.getLogger(__name__)
 
+# Caracteres que se consideran "primeras páginas" en archivos TXT
+TXT_FIRST_PAGES_CHARS = 10000
+
+# Páginas mínimas por worker para que valga la pena abrir otro proceso
+MIN_PAGES_PER_WORKER = 25
+
+# Tope de procesos de extracción de este proceso (None = núcleos de la máquina)
+_extraction_workers_limit: Optional[int] = None
+
+
+def _fitz():
+    """Importa PyMuPDF al abrir el primer PDF (los TXT no lo necesitan)."""
+    import fitz  # PyMuPDF
+    return fitz
+
+
+def _extract_page_range(path: str, start: int, end: int) -> List[str]:
+    """
+    Extrae el texto de un rango de páginas con su propio handle de fitz.
+    Se ejecuta en un proceso worker.
+
+    Args:
+        path: Ruta al archivo PDF
+        start: Primera página (incluida)
+        end: Última página (excluida)
+
+    Returns:
+        Texto de cada página del rango, en orden
+    """
+    with _fitz().open(path) as doc:
+        return [doc[page_num].get_text() for page_num in range(start, end)]
+
+
+def limit_extraction_workers(max_workers: int) -> None:
+    """
+    Limita los procesos de extracción que abre este proceso.
+
+    Se usa como initializer del pool de documentos: cada worker del pool
+    recibe su parte de los núcleos, así varios documentos en paralelo no
+    abren documentos × núcleos procesos.
+
+    Args:
+        max_workers: Máximo de procesos por documento (1 = secuencial)
+    """
+    global _extraction_workers_limit
+    _extraction_workers_limit = max(1, max_workers)
+
+
+def choose_extraction_workers(page_count: int, max_workers: Optional[int] = None) -> int:
+    """
+    Elige cuántos procesos usar según núcleos disponibles y páginas.
+
+    Args:
+        page_count: Páginas a extraer
+        max_workers: Tope de procesos (por defecto, núcleos de la máquina o
+            el límite fijado con limit_extraction_workers)
+
+    Returns:
+        Número de workers (1 = extracción secuencial)
+    """
+    cores = max_workers or os.cpu_count() or 1
+    if _extraction_workers_limit is not None:
+        cores = min(cores, _extraction_workers_limit)
+    return max(1, min(cores, page_count // MIN_PAGES_PER_WORKER))
+
+
+class LoadedDocument:
+    """
+    Documento PDF o TXT abierto una sola vez.
+
+    El texto de cada página se extrae la primera vez que se pide y queda en
+    memoria; el texto completo solo se construye si alguien lo solicita.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Abre el documento.
+
+        Args:
+            path: Ruta al archivo PDF o TXT
+        """
+        self.path = path
+        self.is_txt = path.suffix.lower() == '.txt'
+        self._doc = None
+        self._full_text: Optional[str] = None
+
+        if self.is_txt:
+            with open(path, 'r', encoding='utf-8') as f:
+                self._raw_text = f.read()
+            # Los saltos de página (form feed) delimitan páginas si existen
+            self._page_texts: List[Optional[str]] = self._raw_text.split("\f")
+        else:
+            self._raw_text = None
+            self._doc = _fitz().open(path)
+            self._page_texts = [None] * len(self._doc)
+
+    def __enter__(self) -> "LoadedDocument":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    @property
+    def page_count(self) -> int:
+        """Número de páginas del documento."""
+        return len(self._page_texts)
+
+    def page_text(self, page_num: int) -> str:
+        """
+        Retorna el texto de una página (extraído una sola vez).
+
+        Args:
+            page_num: Índice de la página (desde 0)
+
+        Returns:
+            Texto de la página
+        """
+        text = self._page_texts[page_num]
+        if text is None:
+            text = self._doc[page_num].get_text()
+            self._page_texts[page_num] = text
+        return text
+
+    def extract_pages_parallel(self, max_workers: Optional[int] = None) -> int:
+        """
+        Extrae todas las páginas pendientes repartiendo rangos entre procesos.
+        Cada worker abre su propio handle del PDF y el texto se reensambla
+        en orden de página.
+
+        Args:
+            max_workers: Tope de procesos (por defecto, núcleos de la máquina)
+
+        Returns:
+            Número de workers usados (1 si no valía la pena paralelizar)
+        """
+        if self.is_txt:
+            return 1
+
+        pending = [i for i, text in enumerate(self._page_texts) if text is None]
+        workers = choose_extraction_workers(len(pending), max_workers)
+        if workers == 1:
+            return 1
+
+        first, last = pending[0], pending[-1] + 1
+        # Más rangos que workers para balancear páginas de distinto costo
+        num_ranges = workers * 4
+        range_size = max(1, -(-(last - first) // num_ranges))
+        ranges = [
+            (start, min(start + range_size, last))
+            for start in range(first, last, range_size)
+        ]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(_extract_page_range, str(self.path), start, end)
+                for start, end in ranges
+            ]
+            for (start, _), future in zip(ranges, futures):
+                for offset, text in enumerate(future.result()):
+                    if self._page_texts[start + offset] is None:
+                        self._page_texts[start + offset] = text
+
+        return workers
+
+    def iter_pages(self, num_pages: Optional[int] = None):
+        """
+        Itera sobre el texto de las páginas con contenido.
+
+        Args:
+            num_pages: Limitar a las primeras N páginas (opcional)
+
+        Yields:
+            Texto de cada página no vacía
+        """
+        limit = self.page_count if num_pages is None else min(num_pages, self.page_count)
+        for page_num in range(limit):
+            text = self.page_text(page_num)
+            if text.strip():  # Solo páginas con texto
+                yield text
+
+    def iter_text(self):
+        """
+        Itera sobre el texto del documento por partes, sin construir el
+        texto completo ni guardar las páginas en memoria.
+
+        Unir las partes con "\n\n" produce exactamente full_text.
+
+        Yields:
+            El texto completo (TXT) o el texto de cada página no vacía (PDF)
+        """
+        if self.is_txt:
+            yield self._raw_text
+            return
+
+        for page_num in range(self.page_count):
+            text = self._page_texts[page_num]
+            if text is None:
+                text = self._doc[page_num].get_text()
+            if text.strip():
+                yield text
+
+    @property
+    def full_text(self) -> str:
+        """Texto completo del documento (se construye la primera vez)."""
+        if self._full_text is None:
+            if self.is_txt:
+                self._full_text = self._raw_text
+            else:
+                self._full_text = "\n\n".join(self.iter_pages())
+        return self._full_text
+
+    def first_pages(self, num_pages: int = 3) -> str:
+        """
+        Texto de las primeras N páginas (útil para metadata).
+        Para archivos TXT retorna los primeros 10000 caracteres.
+
+        Args:
+            num_pages: Número de páginas (solo para PDF)
+
+        Returns:
+            Texto de las primeras páginas
+        """
+        if self.is_txt:
+            return self._raw_text[:TXT_FIRST_PAGES_CHARS]
+        return "\n\n".join(self.iter_pages(num_pages))
+
+    @property
+    def metadata(self) -> Dict[str, any]:
+        """Metadata del archivo (título, autor, páginas, tamaño)."""
+        doc_metadata = self._doc.metadata if self._doc is not None else {}
+        return {
+            "title": doc_metadata.get("title", ""),
+            "author": doc_metadata.get("author", ""),
+            "subject": doc_metadata.get("subject", ""),
+            "total_pages": self.page_count,
+            "file_size_mb": self.path.stat().st_size / (1024 * 1024)
+        }
+
+    def close(self) -> None:
+        """Cierra el archivo PDF (las páginas ya extraídas siguen disponibles)."""
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
 
 class PDFExtractor:
     """Extractor de texto de archivos PDF."""
@@ -15,62 +262,82 @@ class PDFExtractor:
     def __init__(self):
         self.logger = logging.getLogger(self.__class__.__name__)
 
-    def extract_text(self, pdf_path: Path) -> Optional[str]:
+    def load(self, pdf_path: Path) -> Optional[LoadedDocument]:
         """
-        Extrae todo el texto de un archivo PDF o TXT.
+        Abre un documento PDF o TXT una sola vez para extraer de él
+        texto completo, primeras páginas y metadata.
 
         Args:
             pdf_path: Ruta al archivo PDF o TXT
 
         Returns:
-            Texto extraído o None si hay error
+            Documento cargado o None si hay error
         """
         try:
             self.logger.info(f"Extrayendo texto de: {pdf_path.name}")
+            return LoadedDocument(pdf_path)
 
-            # Si es archivo TXT, leer directamente
-            if pdf_path.suffix.lower() == '.txt':
-                with open(pdf_path, 'r', encoding='utf-8') as f:
-                    complete_text = f.read()
+        except Exception as e:
+            self.logger.error(f"Error abriendo {pdf_path.name}: {str(e)}")
+            return None
 
-                self.logger.info(
-                    f"✓ Extracción completada (TXT): "
-                    f"{len(complete_text):,} caracteres"
-                )
-                return complete_text
+    def extract_text(self, pdf_path: Path) -> Optional[str]:
+        """
+        Extrae todo el texto de un archivo PDF o TXT.
 
-            # Si es PDF, usar PyMuPDF
-            # Abrir el PDF
-            doc = fitz.open(pdf_path)
+        Args:
+            pdf_path: Ruta al archivo PDF o TXT
 
-            # Extraer texto de todas las páginas
-            full_text = []
-            total_pages = len(doc)
+        Returns:
+            Texto extraído o None si hay error
+        """
+        document = self.load(pdf_path)
+        if document is None:
+            return None
 
-            for page_num in range(total_pages):
-                page = doc[page_num]
-                text = page.get_text()
+        with document:
+            return self.read_full_text(document)
 
-                if text.strip():  # Solo agregar si la página tiene texto
-                    full_text.append(text)
+    def read_full_text(self, document: LoadedDocument) -> Optional[str]:
+        """
+        Obtiene el texto completo de un documento ya cargado.
 
-                if (page_num + 1) % 10 == 0:
-                    self.logger.debug(f"Procesadas {page_num + 1}/{total_pages} páginas")
+        Args:
+            document: Documento cargado con load()
 
-            doc.close()
+        Returns:
+            Texto extraído o None si hay error
+        """
+        try:
+            start_time = time.perf_counter()
+            workers = 1
 
-            # Unir todo el texto
-            complete_text = "\n\n".join(full_text)
+            if (
+                not document.is_txt
+                and PARALLEL_EXTRACTION_MIN_PAGES
+                and document.page_count >= PARALLEL_EXTRACTION_MIN_PAGES
+            ):
+                workers = document.extract_pages_parallel()
 
-            self.logger.info(
-                f"✓ Extracción completada: {total_pages} páginas, "
-                f"{len(complete_text):,} caracteres"
-            )
+            complete_text = document.full_text
+            elapsed = max(time.perf_counter() - start_time, 1e-9)
+
+            if document.is_txt:
+                self.logger.info(
+                    f"✓ Extracción completada (TXT): "
+                    f"{len(complete_text):,} caracteres"
+                )
+            else:
+                self.logger.info(
+                    f"✓ Extracción completada: {document.page_count} páginas, "
+                    f"{len(complete_text):,} caracteres "
+                    f"({document.page_count / elapsed:,.1f} páginas/s, {workers} procesos)"
+                )
 
             return complete_text
 
         except Exception as e:
-            self.logger.error(f"Error extrayendo texto de {pdf_path.name}: {str(e)}")
+            self.logger.error(f"Error extrayendo texto de {document.path.name}: {str(e)}")
             return None
 
     def extract_metadata(self, pdf_path: Path) -> Dict[str, any]:
@@ -84,17 +351,8 @@ class PDFExtractor:
             Diccionario con metadata
         """
         try:
-            doc = fitz.open(pdf_path)
-            metadata = {
-                "title": doc.metadata.get("title", ""),
-                "author": doc.metadata.get("author", ""),
-                "subject": doc.metadata.get("subject", ""),
-                "total_pages": len(doc),
-                "file_size_mb": pdf_path.stat().st_size / (1024 * 1024)
-            }
-            doc.close()
-
-            return metadata
+            with LoadedDocument(pdf_path) as document:
+                return document.metadata
 
         except Exception as e:
             self.logger.error(f"Error extrayendo metadata de {pdf_path.name}: {str(e)}")
@@ -113,27 +371,8 @@ class PDFExtractor:
             Texto de las primeras páginas/caracteres o None si hay error
         """
         try:
-            # Si es archivo TXT, retornar primeros 10000 caracteres
-            if pdf_path.suffix.lower() == '.txt':
-                with open(pdf_path, 'r', encoding='utf-8') as f:
-                    text = f.read(10000)  # Primeros 10K caracteres
-                return text
-
-            # Si es PDF
-            doc = fitz.open(pdf_path)
-
-            first_pages_text = []
-            pages_to_extract = min(num_pages, len(doc))
-
-            for page_num in range(pages_to_extract):
-                page = doc[page_num]
-                text = page.get_text()
-                if text.strip():
-                    first_pages_text.append(text)
-
-            doc.close()
-
-            return "\n\n".join(first_pages_text)
+            with LoadedDocument(pdf_path) as document:
+                return document.first_pages(num_pages)
 
         except Exception as e:
             self.logger.error(f"Error extrayendo primeras páginas de {pdf_path.name}: {str(e)}")
@@ -0,0 +1,236 @@
+"""
+Planificación de una ejecución sin llamadas al LLM: chunks, llamadas,
+tokens, costo y duración estimados por documento.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional
+from src.config import (
+    LLM_PROVIDER, MAX_TOKENS_OUTPUT_CHUNK, MAX_TOKENS_OUTPUT_SYNTHESIS,
+    MAX_CONCURRENT_REQUESTS, MAX_REQUESTS_PER_MINUTE, MAX_TOKENS_PER_MINUTE,
+    PROMPT_CACHING, BATCH_MODE, HIERARCHICAL_SYNTHESIS, SYNTHESIS_GROUP_SIZE
+)
+from src.prompts import (
+    CHUNK_ANALYSIS_PROMPT, SYNTHESIS_PROMPT, MERGE_PROMPT, METADATA_EXTRACTION_PROMPT,
+    format_chunk_header
+)
+from src.llm_scheduler import estimate_tokens
+from src import pricing
+
+logger = logging.getLogger(__name__)
+
+# max_tokens de la llamada de metadata (ver extract_metadata_async)
+METADATA_OUTPUT_TOKENS = 500
+
+# Duración por llamada cuando no hay un reporte de métricas anterior
+DEFAULT_CALL_SECONDS = 10.0
+
+
+def load_observed(report_path: Optional[Path]) -> Dict:
+    """
+    Promedios observados en una ejecución anterior (reporte de métricas).
+
+    Args:
+        report_path: Ruta a run_report.json (puede no existir)
+
+    Returns:
+        Dict con "output_per_call" (tokens de salida promedio por etapa) y
+        "call_seconds" (duración promedio de una llamada, o None)
+    """
+    observed = {"output_per_call": {}, "call_seconds": None}
+    if not report_path or not Path(report_path).exists():
+        return observed
+
+    try:
+        report = json.loads(Path(report_path).read_text(encoding="utf-8"))
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"No se pudo leer el reporte {report_path}: {e}")
+        return observed
+
+    for stage, usage in report.get("tokens_by_stage", {}).items():
+        if usage.get("requests"):
+            observed["output_per_call"][stage] = usage["output_tokens"] / usage["requests"]
+
+    calls = [
+        h for h in report.get("histograms", [])
+        if h.get("name") == "llm_call_duration_seconds"
+    ]
+    count = sum(h["count"] for h in calls)
+    if count:
+        observed["call_seconds"] = sum(h["sum"] for h in calls) / count
+
+    return observed
+
+
+def provider_pricing(provider: str = LLM_PROVIDER) -> Dict[str, float]:
+    """
+    Precios por millón de tokens que usa estimate_cost del proveedor.
+
+    El proveedor fake usa los precios de Claude, igual que en una ejecución.
+    """
+    if provider == "gemini":
+        return {
+            "input": pricing.GEMINI_INPUT_COST_PER_1M,
+            "output": pricing.GEMINI_OUTPUT_COST_PER_1M,
+            "cache_read": pricing.GEMINI_CACHED_INPUT_MULTIPLIER,
+            "batch_discount": 0.0
+        }
+
+    return {
+        "input": pricing.CLAUDE_INPUT_COST_PER_1M,
+        "output": pricing.CLAUDE_OUTPUT_COST_PER_1M,
+        "cache_read": pricing.CLAUDE_CACHE_READ_MULTIPLIER,
+        "batch_discount": pricing.CLAUDE_BATCH_DISCOUNT if BATCH_MODE else 0.0
+    }
+
+
+def _merge_levels(partials: int) -> List[int]:
+    """Grupos fusionados por nivel de la síntesis jerárquica (según tamaño de grupo)."""
+    levels = []
+    while partials > SYNTHESIS_GROUP_SIZE:
+        # Un análisis sobrante se agrega al último grupo (ver HierarchicalSynthesizer._group)
+        remainder = partials % SYNTHESIS_GROUP_SIZE
+        partials = partials // SYNTHESIS_GROUP_SIZE + (1 if remainder >= 2 else 0)
+        levels.append(partials)
+    return levels
+
+
+def plan_document(name: str, first_pages: str, chunks: List[str], observed: Dict) -> Dict:
+    """
+    Estima llamadas y tokens de un documento ya dividido en chunks.
+
+    Los tokens de salida usan el promedio observado por etapa si hay un
+    reporte anterior; si no, el máximo configurado (cota superior).
+
+    Args:
+        name: Nombre del documento
+        first_pages: Texto de las primeras páginas (para metadata)
+        chunks: Chunks del documento
+        observed: Resultado de load_observed
+
+    Returns:
+        Dict con chunks y, por etapa, llamadas y tokens de entrada/salida
+    """
+    output_per_call = observed["output_per_call"]
+    chunk_output = output_per_call.get("analyze", MAX_TOKENS_OUTPUT_CHUNK)
+    synthesis_output = output_per_call.get("synthesize", MAX_TOKENS_OUTPUT_SYNTHESIS)
+    prompt_tokens = estimate_tokens(CHUNK_ANALYSIS_PROMPT)
+
+    total = len(chunks)
+    analyze_input = sum(
+        estimate_tokens(CHUNK_ANALYSIS_PROMPT + format_chunk_header(i + 1, total) + chunk)
+        for i, chunk in enumerate(chunks)
+    )
+
+    # Los análisis parciales que llegan a la síntesis pesan ~ la salida de cada chunk
+    merges = _merge_levels(total) if HIERARCHICAL_SYNTHESIS else []
+    merge_input = sum(
+        estimate_tokens(MERGE_PROMPT) * groups + min(total, SYNTHESIS_GROUP_SIZE) * chunk_output * groups
+        for groups in merges
+    )
+    final_partials = merges[-1] if merges else total
+    synthesis_input = (
+        estimate_tokens(SYNTHESIS_PROMPT + first_pages[:5000])
+        + final_partials * chunk_output
+        + merge_input
+    )
+
+    return {
+        "document": name,
+        "chunks": total,
+        "stages": {
+            "analyze": {
+                "calls": total,
+                "input_tokens": analyze_input,
+                # Con cache de prompts, el prompt fijo se lee del cache desde la 2ª llamada
+                "cached_input_tokens": prompt_tokens * max(0, total - 1) if PROMPT_CACHING else 0,
+                "output_tokens": round(total * chunk_output)
+            },
+            "metadata": {
+                "calls": 1,
+                "input_tokens": estimate_tokens(METADATA_EXTRACTION_PROMPT + first_pages[:5000]),
+                "cached_input_tokens": 0,
+                "output_tokens": round(output_per_call.get("metadata", METADATA_OUTPUT_TOKENS))
+            },
+            "synthesize": {
+                "calls": 1 + sum(merges),
+                "input_tokens": round(synthesis_input),
+                "cached_input_tokens": 0,
+                "output_tokens": round((1 + sum(merges)) * synthesis_output)
+            }
+        }
+    }
+
+
+def stage_cost(stage: str, usage: Dict, pricing: Dict[str, float]) -> float:
+    """Costo en USD de una etapa según los precios de estimate_cost."""
+    cached = usage["cached_input_tokens"]
+    input_equivalent = usage["input_tokens"] - cached + cached * pricing["cache_read"]
+    cost = (
+        (input_equivalent / 1_000_000) * pricing["input"]
+        + (usage["output_tokens"] / 1_000_000) * pricing["output"]
+    )
+    # En modo batch solo el análisis de chunks va por la Message Batches API
+    if stage == "analyze":
+        cost *= 1 - pricing["batch_discount"]
+    return cost
+
+
+def plan_totals(
+    documents: List[Dict],
+    pricing: Dict[str, float],
+    call_seconds: float = DEFAULT_CALL_SECONDS
+) -> Dict:
+    """
+    Totales de la ejecución: llamadas, tokens, costo y duración proyectada.
+
+    La duración es la mayor de tres cotas: llamadas en paralelo según
+    MAX_CONCURRENT_REQUESTS, requests por minuto y tokens por minuto del
+    scheduler.
+
+    Args:
+        documents: Resultados de plan_document (se les agrega el costo)
+        pricing: Resultado de provider_pricing
+        call_seconds: Duración estimada de una llamada al LLM
+
+    Returns:
+        Dict con los totales y la cota de tiempo que limita la ejecución
+    """
+    totals = {"calls": 0, "input_tokens": 0, "cached_input_tokens": 0, "output_tokens": 0, "cost_usd": 0.0}
+
+    for document in documents:
+        document["cost_usd"] = 0.0
+        for stage, usage in document["stages"].items():
+            document["cost_usd"] += stage_cost(stage, usage, pricing)
+            for field in ("calls", "input_tokens", "cached_input_tokens", "output_tokens"):
+                totals[field] += usage[field]
+        totals["cost_usd"] += document["cost_usd"]
+
+    tokens = totals["input_tokens"] + totals["output_tokens"]
+    bounds = {
+        "concurrency": totals["calls"] * call_seconds / max(1, MAX_CONCURRENT_REQUESTS),
+        "requests_per_minute": totals["calls"] / MAX_REQUESTS_PER_MINUTE * 60 if MAX_REQUESTS_PER_MINUTE else 0.0,
+        "tokens_per_minute": tokens / MAX_TOKENS_PER_MINUTE * 60 if MAX_TOKENS_PER_MINUTE else 0.0
+    }
+    limiting = max(bounds, key=bounds.get)
+
+    totals.update({
+        "documents": len(documents),
+        "chunks": sum(d["chunks"] for d in documents),
+        "call_seconds": call_seconds,
+        "wall_clock_bounds_s": {k: round(v, 1) for k, v in bounds.items()},
+        "projected_wall_clock_s": round(bounds[limiting], 1),
+        "limited_by": limiting
+    })
+    return totals
+
+
+def format_duration(seconds: float) -> str:
+    """Duración legible (h, min, s)."""
+    if seconds >= 3600:
+        return f"{seconds / 3600:.1f} h"
+    if seconds >= 60:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds:.0f} s"
+
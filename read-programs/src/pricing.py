@@ -0,0 +1,27 @@
+"""
+Precios de los proveedores LLM para estimar costos.
+
+Sin dependencias de los SDK, para que el subcomando plan pueda estimar
+costos sin tener instalados anthropic ni google-generativeai.
+"""
+
+# Claude: precios aproximados (verificar en https://www.anthropic.com/pricing)
+CLAUDE_INPUT_COST_PER_1M = 3.00  # USD por millón de tokens de input
+CLAUDE_OUTPUT_COST_PER_1M = 15.00  # USD por millón de tokens de output
+CLAUDE_CACHE_WRITE_MULTIPLIER = 1.25  # Escritura en el cache de prompts
+CLAUDE_CACHE_READ_MULTIPLIER = 0.10  # Lectura desde el cache de prompts
+
+# Descuento de la Message Batches API sobre el precio interactivo
+CLAUDE_BATCH_DISCOUNT = 0.5
+
+# Gemini: precios aproximados de Gemini 2.0 Flash (verificar en https://ai.google.dev/pricing)
+# Para prompts <= 128K tokens
+GEMINI_INPUT_COST_PER_1M = 0.00  # Gratis hasta cierto límite
+GEMINI_OUTPUT_COST_PER_1M = 0.00  # Gratis hasta cierto límite
+
+# Si supera el límite gratuito, usar precios reales
+# GEMINI_INPUT_COST_PER_1M = 0.10  # USD por millón de tokens de input
+# GEMINI_OUTPUT_COST_PER_1M = 0.40  # USD por millón de tokens de output
+
+# Los tokens leídos del cache se cobran a una fracción del input normal
+GEMINI_CACHED_INPUT_MULTIPLIER = 0.25
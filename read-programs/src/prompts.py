@@ -2,6 +2,7 @@
 System prompts mejorados para análisis exhaustivo de programas presidenciales.
 """
 
+from typing import List
 from src.config import CATEGORIAS
 
 # Prompt mejorado para análisis exhaustivo de chunks
@@ -92,6 +93,38 @@ REGLAS FINALES:
 - Sé exhaustivo: este análisis se consolidará después
 """
 
+def format_chunk_header(chunk_number: int, total_chunks: int = None) -> str:
+    """
+    Encabezado del fragmento enviado al modelo.
+
+    En el pipeline en streaming el total de chunks no se conoce de antemano,
+    por lo que se omite.
+    """
+    if total_chunks:
+        return f"Fragmento {chunk_number}/{total_chunks} del programa:"
+    return f"Fragmento {chunk_number} del programa:"
+
+
+# Encabezado de la lista de categorías preseleccionadas de un fragmento
+CATEGORY_SCOPE_HEADER = "CATEGORÍAS A ANALIZAR EN ESTE FRAGMENTO"
+
+
+def format_category_scope(categories: List[str]) -> str:
+    """
+    Restringe el análisis de un fragmento a las categorías preseleccionadas
+    por el enrutador local (ver src/category_router.py).
+
+    Va en el mensaje del fragmento y no en el system prompt, para que este
+    siga siendo idéntico en todas las llamadas (cache de prompts).
+    """
+    listed = "\n".join(f"- {category}" for category in categories)
+    return (
+        f"{CATEGORY_SCOPE_HEADER} (preseleccionadas según el contenido del fragmento):\n"
+        f"{listed}\n"
+        f"Incluye en categorias_encontradas SOLO categorías de esta lista."
+    )
+
+
 # Prompt mejorado para síntesis final
 SYNTHESIS_PROMPT = f"""Eres un analista político experto consolidando múltiples análisis parciales de un programa presidencial completo.
 
@@ -173,27 +206,83 @@ REGLAS CRÍTICAS:
 PRIORIDAD: Completitud > Brevedad. Es mejor un análisis detallado que uno resumido.
 """
 
-# Prompt para re-análisis de categorías faltantes
+# Prompt para fusionar un grupo de análisis parciales (síntesis jerárquica)
+MERGE_PROMPT = f"""Eres un analista político experto. Recibes un GRUPO de análisis parciales de fragmentos consecutivos de un mismo programa presidencial. Fusiónalos en UN SOLO análisis parcial que será consolidado después con otros grupos.
+
+CATEGORÍAS VÁLIDAS:
+{chr(10).join(f"{i+1}. {cat}" for i, cat in enumerate(CATEGORIAS))}
+
+ANÁLISIS PARCIALES DEL GRUPO:
+{{analisis_parciales}}
+
+INSTRUCCIONES:
+1. Agrupa por categoría: una sola entrada por cada categoría que aparezca en el grupo
+2. Une las propuestas; elimina duplicados exactos o casi exactos, conservando la versión con más datos
+3. Mantén TODOS los números, fechas, porcentajes y montos
+4. Conserva las citas más específicas (máximo 10 por categoría)
+5. NO agregues categorías ni información que no esté en los análisis del grupo
+
+FORMATO DE SALIDA (JSON VÁLIDO, mismo formato que el análisis de fragmentos):
+{{
+  "categorias_encontradas": [
+    {{
+      "categoria": "Nombre EXACTO de la categoría",
+      "analisis_perspectiva": {{
+        "rol_del_estado": "...",
+        "enfoque_ideologico": "...",
+        "tono": "..."
+      }},
+      "propuestas_clave": [
+        {{"titulo": "...", "descripcion": "..."}}
+      ],
+      "citas_textuales": ["..."]
+    }}
+  ]
+}}
+
+Devuelve SOLO el JSON, sin texto adicional.
+"""
+
+# Prompt para re-análisis de categorías faltantes (solo con los pasajes recuperados)
 REANALYSIS_PROMPT = """Eres un analista político experto. El análisis inicial de este programa presidencial NO identificó información sobre las siguientes categorías:
 
 CATEGORÍAS FALTANTES A RE-ANALIZAR:
 {missing_categories}
 
-TEXTO COMPLETO DEL PROGRAMA:
-{full_text}
-
 TAREA:
-Realiza un análisis EXHAUSTIVO y ENFOCADO del texto buscando ESPECÍFICAMENTE información relacionada con las categorías faltantes listadas arriba.
+Realiza un análisis EXHAUSTIVO y ENFOCADO de los fragmentos del programa que aparecen al final, buscando ESPECÍFICAMENTE información relacionada con las categorías faltantes listadas arriba. Los fragmentos se seleccionaron por contener términos asociados a esas categorías; no son el programa completo.
 
 INSTRUCCIONES:
-1. Lee TODO el texto buscando menciones directas o indirectas de estas categorías
+1. Lee TODOS los fragmentos buscando menciones directas o indirectas de estas categorías
 2. INFIERE del contexto - no requieres menciones explícitas
 3. Si encuentras algo relacionado, incluso indirectamente, INCLÚYELO
 4. Sé GENEROSO en la interpretación - prefiere incluir que omitir
+5. Usa SOLO las categorías faltantes listadas arriba, con su nombre EXACTO
+
+FORMATO DE SALIDA (JSON VÁLIDO, mismo formato que el análisis de fragmentos):
+{{
+  "categorias_encontradas": [
+    {{
+      "categoria": "Nombre EXACTO de una de las categorías faltantes",
+      "analisis_perspectiva": {{
+        "rol_del_estado": "...",
+        "enfoque_ideologico": "...",
+        "tono": "..."
+      }},
+      "propuestas_clave": [
+        {{"titulo": "...", "descripcion": "..."}}
+      ],
+      "citas_textuales": ["..."]
+    }}
+  ]
+}}
+
+Incluye SOLO las categorías de las que SÍ encuentres información. Si después de este análisis enfocado NO encuentras nada de una categoría, está bien - significa que realmente no está en el programa.
 
-Devuelve JSON con el mismo formato que el análisis de chunks, pero SOLO para las categorías que SÍ encuentres información.
+Devuelve SOLO el JSON, sin texto adicional.
 
-Si después de este análisis enfocado NO encuentras nada de una categoría, está bien - significa que realmente no está en el programa.
+FRAGMENTOS SELECCIONADOS DEL PROGRAMA:
+{excerpts}
 """
 
 # Prompt para extracción de metadata (fallback)
@@ -216,3 +305,14 @@ Devuelve ÚNICAMENTE un JSON con este formato:
 
 Si no encuentras algún dato, usa "No especificado". No inventes información.
 """
+
+# Pedido de continuación de una respuesta cortada por el máximo de tokens
+# (Gemini; con Claude la respuesta parcial va como prefijo del asistente)
+CONTINUATION_PROMPT = """Tu respuesta anterior se cortó por el límite de largo. Continúa el JSON exactamente desde el último carácter que escribiste, sin repetir nada de lo anterior y sin texto adicional ni bloques de código."""
+
+
+def format_excerpts(passages: List[str]) -> str:
+    """Fragmentos numerados para REANALYSIS_PROMPT."""
+    return "\n\n".join(
+        f"[Fragmento {number}]\n{passage}" for number, passage in enumerate(passages, 1)
+    )
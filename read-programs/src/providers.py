@@ -0,0 +1,182 @@
+"""
+Proveedores LLM intercambiables.
+
+Cada proveedor construye el analizador y el sintetizador que usa el
+pipeline; ambos comparten el mismo backend (SDK y credenciales o el backend
+fake). Los módulos de cada proveedor se importan solo al elegirlo, así
+Gemini no es necesario para usar Claude ni viceversa.
+"""
+import logging
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Protocol, Tuple
+from src.config import LLM_PROVIDER, REQUESTED_LLM_PROVIDER, MODEL_NAME, validate_api_keys
+from src.llm_cache import LLMCache
+from src.llm_scheduler import LLMScheduler
+
+logger = logging.getLogger(__name__)
+
+
+class ChunkAnalyzer(Protocol):
+    """Interfaz del analizador que usa el pipeline."""
+
+    supports_batch: bool
+
+    async def analyze_chunk_async(
+        self, chunk_text: str, chunk_number: int, total_chunks: Optional[int]
+    ) -> Tuple[Optional[Dict], bool]: ...
+
+    async def extract_metadata_async(self, first_pages_text: str) -> Tuple[Dict[str, str], bool]: ...
+
+    async def reanalyze_categories_async(
+        self, missing_categories: List[str], passages: List[str]
+    ) -> Optional[Dict]: ...
+
+    def record_usage(self, response) -> None: ...
+
+    def get_token_usage(self) -> Dict[str, int]: ...
+
+    def estimate_cost(self) -> float: ...
+
+
+class Synthesizer(Protocol):
+    """Interfaz del sintetizador que usa el pipeline."""
+
+    async def synthesize_async(
+        self,
+        partial_analyses: List[Dict],
+        original_text_sample: str,
+        metadata: Dict[str, str]
+    ) -> Tuple[Dict, bool]: ...
+
+    async def merge_async(self, partial_analyses: List[Dict]) -> Optional[Dict]: ...
+
+
+class LLMProvider(ABC):
+    """
+    Construye el analizador y el sintetizador de un proveedor.
+
+    Un proveedor que no implemente ambos métodos falla al instanciarse.
+    """
+
+    name = ""
+
+    @abstractmethod
+    def create_analyzer(
+        self,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None
+    ) -> ChunkAnalyzer:
+        """Analizador del proveedor, con el scheduler y el cache compartidos."""
+
+    @abstractmethod
+    def create_synthesizer(
+        self,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None,
+        on_response: Optional[Callable[[Any], None]] = None
+    ) -> Synthesizer:
+        """
+        Sintetizador del proveedor, con el scheduler y el cache compartidos.
+
+        on_response recibe cada respuesta de síntesis o fusión (p. ej. el
+        record_usage del analizador, para que el costo las incluya).
+        """
+
+
+class ClaudeProvider(LLMProvider):
+    """Claude de Anthropic."""
+
+    name = "claude"
+
+    def create_analyzer(self, scheduler=None, cache=None) -> ChunkAnalyzer:
+        from src.llm_analyzer import LLMAnalyzer
+        return LLMAnalyzer(scheduler=scheduler, cache=cache)
+
+    def create_synthesizer(self, scheduler=None, cache=None, on_response=None) -> Synthesizer:
+        from src.synthesizer import AnalysisSynthesizer
+        return AnalysisSynthesizer(scheduler=scheduler, cache=cache, on_response=on_response)
+
+
+class GeminiProvider(LLMProvider):
+    """Google Gemini."""
+
+    name = "gemini"
+
+    def create_analyzer(self, scheduler=None, cache=None) -> ChunkAnalyzer:
+        from src.gemini_analyzer import GeminiAnalyzer
+        return GeminiAnalyzer(scheduler=scheduler, cache=cache)
+
+    def create_synthesizer(self, scheduler=None, cache=None, on_response=None) -> Synthesizer:
+        from src.gemini_synthesizer import GeminiSynthesizer
+        return GeminiSynthesizer(scheduler=scheduler, cache=cache, on_response=on_response)
+
+
+class FakeProvider(LLMProvider):
+    """
+    Backend determinista sin red (ver src/fake_llm.py).
+
+    Usa las mismas clases que Claude con clientes falsos, así el scheduler,
+    la concurrencia y los reintentos se prueban con el código real.
+    """
+
+    name = "fake"
+
+    def __init__(self, backend=None):
+        """
+        Inicializa el proveedor.
+
+        Args:
+            backend: FakeLLMBackend a compartir (por defecto, uno según config)
+        """
+        from src.fake_llm import FakeLLMBackend
+        self.backend = backend or FakeLLMBackend()
+
+    def _clients(self) -> Dict:
+        from src.fake_llm import FakeAnthropic, FakeAsyncAnthropic
+        return {
+            "model": MODEL_NAME,
+            "client": FakeAnthropic(self.backend),
+            "async_client": FakeAsyncAnthropic(self.backend)
+        }
+
+    def create_analyzer(self, scheduler=None, cache=None) -> ChunkAnalyzer:
+        from src.llm_analyzer import LLMAnalyzer
+        return LLMAnalyzer(scheduler=scheduler, cache=cache, **self._clients())
+
+    def create_synthesizer(self, scheduler=None, cache=None, on_response=None) -> Synthesizer:
+        from src.synthesizer import AnalysisSynthesizer
+        return AnalysisSynthesizer(
+            scheduler=scheduler, cache=cache, on_response=on_response, **self._clients()
+        )
+
+
+PROVIDERS = {
+    "claude": ClaudeProvider,
+    "gemini": GeminiProvider,
+    "fake": FakeProvider,
+}
+
+
+def get_provider(name: str = LLM_PROVIDER) -> LLMProvider:
+    """
+    Retorna el proveedor configurado, validando antes su API key.
+
+    Args:
+        name: Nombre del proveedor ("claude", "gemini" o "fake")
+
+    Returns:
+        Instancia del proveedor
+
+    Raises:
+        ValueError: Si el proveedor no existe o falta su API key
+    """
+    if name not in PROVIDERS:
+        raise ValueError(
+            f"Proveedor LLM desconocido: {name}. Opciones: {', '.join(PROVIDERS)}"
+        )
+    validate_api_keys(name)
+    if name == LLM_PROVIDER and REQUESTED_LLM_PROVIDER != LLM_PROVIDER:
+        logger.warning(
+            f"API key de {REQUESTED_LLM_PROVIDER} no encontrada, usando {LLM_PROVIDER}"
+        )
+    return PROVIDERS[name]()
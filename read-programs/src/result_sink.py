@@ -0,0 +1,179 @@
+"""
+Salida en streaming de los resultados: un JSONL append-only con una línea
+por documento terminado (y opcionalmente por análisis de chunk), y la
+compactación que reconstruye el JSON consolidado desde ese archivo.
+
+Formato de cada línea:
+    {"type": "document", "pdf_filename": ..., "result": {...}}
+    {"type": "chunk", "pdf_filename": ..., "chunk": i, "total_chunks": n, "analysis": {...}}
+
+Las líneas de chunk se escriben apenas termina cada análisis, así que pueden
+quedar intercaladas entre documentos y fuera de orden; total_chunks es null
+en el pipeline en streaming.
+"""
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+from src.config import RESULTS_JSONL, RESULTS_JSONL_CHUNKS, OUTPUT_FILE
+from src.incremental import load_previous_results, merge_results, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+
+def iter_records(path: Path = RESULTS_JSONL) -> Iterator[Dict]:
+    """
+    Registros del JSONL en el orden en que se escribieron.
+
+    Una línea truncada (interrupción a mitad de escritura) se ignora.
+
+    Args:
+        path: Archivo JSONL de resultados
+
+    Yields:
+        Cada registro válido
+    """
+    if not Path(path).exists():
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(record, dict):
+                yield record
+
+
+def load_document_results(path: Path = RESULTS_JSONL) -> Dict[str, dict]:
+    """
+    Resultados por documento del JSONL; si un documento aparece más de una
+    vez, gana la última línea.
+
+    Args:
+        path: Archivo JSONL de resultados
+
+    Returns:
+        Diccionario {pdf_filename: resultado}
+    """
+    return {
+        record["pdf_filename"]: record["result"]
+        for record in iter_records(path)
+        if record.get("type") == "document" and record.get("pdf_filename") and "result" in record
+    }
+
+
+def write_consolidated(results: List[dict], output_file: Path = OUTPUT_FILE) -> None:
+    """Guarda los resultados consolidados (escritura atómica)."""
+    write_json_atomic(output_file, {
+        "fecha_analisis": datetime.now().isoformat(),
+        "total_candidatos": len(results),
+        "candidatos": results
+    })
+
+
+def compact_results(
+    previous_results: Dict[str, dict],
+    path: Path = RESULTS_JSONL,
+    output_file: Path = OUTPUT_FILE
+) -> List[dict]:
+    """
+    Reconstruye el JSON consolidado desde el JSONL.
+
+    Args:
+        previous_results: Resultados base indexados por archivo (los del
+            JSONL los reemplazan por documento)
+        path: Archivo JSONL de resultados
+        output_file: JSON consolidado a escribir
+
+    Returns:
+        Resultados escritos, ordenados por nombre de archivo
+    """
+    results = merge_results(previous_results, list(load_document_results(path).values()))
+    write_consolidated(results, output_file)
+    return results
+
+
+class ResultSink:
+    """
+    JSONL append-only con los resultados a medida que terminan.
+
+    Cada línea se fuerza a disco (fsync) antes de seguir, así que un lector
+    puede consumir los resultados durante la ejecución y una interrupción
+    pierde a lo más la línea en curso.
+    """
+
+    def __init__(self, path: Path = RESULTS_JSONL, include_chunks: bool = RESULTS_JSONL_CHUNKS):
+        """
+        Inicializa la salida.
+
+        Args:
+            path: Archivo JSONL de resultados
+            include_chunks: Escribir también cada análisis de chunk
+        """
+        self.path = Path(path)
+        self.include_chunks = include_chunks
+        self.documents = 0
+        self.logger = logging.getLogger(self.__class__.__name__)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+    def _append(self, record: Dict) -> None:
+        """Agrega una línea y la fuerza a disco."""
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def write_document(self, result: dict) -> None:
+        """Agrega el resultado consolidado de un documento."""
+        self._append({"type": "document", "pdf_filename": result["pdf_filename"], "result": result})
+        self.documents += 1
+
+    def write_chunk(
+        self,
+        document_name: str,
+        chunk_number: int,
+        total_chunks: Optional[int],
+        analysis: Dict
+    ) -> None:
+        """
+        Agrega el análisis de un chunk apenas termina (si include_chunks).
+
+        Args:
+            document_name: Nombre del archivo del documento
+            chunk_number: Número del chunk (desde 1)
+            total_chunks: Total de chunks (None si no se conoce, en streaming)
+            analysis: Análisis del chunk
+        """
+        if not self.include_chunks:
+            return
+        self._append({
+            "type": "chunk",
+            "pdf_filename": document_name,
+            "chunk": chunk_number,
+            "total_chunks": total_chunks,
+            "analysis": analysis
+        })
+
+    def recover(self, output_file: Path = OUTPUT_FILE) -> int:
+        """
+        Compacta los resultados que dejó una ejecución interrumpida y vacía
+        el JSONL para la ejecución actual.
+
+        Args:
+            output_file: JSON consolidado
+
+        Returns:
+            Documentos recuperados
+        """
+        recovered = load_document_results(self.path)
+        if recovered:
+            compact_results(load_previous_results(output_file), self.path, output_file)
+            self.logger.info(
+                f"{len(recovered)} resultados de una ejecución anterior recuperados desde {self.path.name}"
+            )
+        self.path.write_text("", encoding="utf-8")
+        return len(recovered)
@@ -0,0 +1,293 @@
+"""
+Recuperación léxica local (BM25) de los pasajes de un documento que
+probablemente tratan una categoría, para re-analizar solo esos pasajes.
+"""
+import logging
+import math
+import re
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+from src.config import REANALYSIS_PASSAGE_CHARS
+from src.near_duplicates import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Largo del prefijo que se indexa de cada palabra (ya sin plural): un stemming
+# mínimo para que "educación", "educacional" y "educacion" coincidan, sin
+# juntar "transporte" con "transparencia" ni "internacional" con "internet"
+STEM_LENGTH = 7
+
+# Palabras máximas de una semilla que se busca como frase
+MAX_PHRASE_WORDS = 3
+
+# Palabras vacías (ya normalizadas) que no aportan a la búsqueda
+STOPWORDS = frozenset(
+    "a al ante con como de del desde el en entre es esta este la las lo los mas "
+    "para por que se sin sobre su sus un una y o u e ni no ya".split()
+)
+
+# Terminaciones de plural que se quitan antes de recortar la palabra
+PLURAL_ES_AFTER = "lnrdj"
+VOWELS = "aeiou"
+
+# Palabras frecuentes en cualquier programa de gobierno: no sirven sueltas
+# como término de una categoría (sí dentro de una frase, p. ej. "transporte
+# público")
+GENERIC_WORDS = (
+    "politica politico social sociales publico publica seguridad gobierno estado "
+    "desarrollo medio pais chile nacional nuestro acceso sistema programa propuesta "
+    "candidato perfil estilo orden comunidad sociedad instituciones derechos"
+)
+
+# Semillas de búsqueda por categoría, además de las palabras de su nombre
+CATEGORY_KEYWORDS: Dict[str, List[str]] = {
+    "Economía y Desarrollo": [
+        "crecimiento", "empleo", "inversión", "productividad", "PIB", "impuestos",
+        "tributaria", "pymes", "emprendimiento", "fiscal", "salario", "industria"
+    ],
+    "Seguridad Social": [
+        "pensiones", "AFP", "jubilación", "pilar solidario", "previsión",
+        "adultos mayores", "cotización", "seguro de cesantía"
+    ],
+    "Salud": [
+        "hospitales", "FONASA", "ISAPRE", "listas de espera", "atención primaria",
+        "médicos", "medicamentos", "consultorios", "salud mental"
+    ],
+    "Educación": [
+        "escuelas", "liceos", "universidades", "profesores", "docentes", "estudiantes",
+        "educacional", "CAE", "gratuidad", "jardines infantiles", "aprendizaje"
+    ],
+    "Vivienda y Urbanismo": [
+        "viviendas", "déficit habitacional", "campamentos", "arriendo", "subsidio habitacional",
+        "ciudades", "barrios", "suelo", "transporte público", "urbano"
+    ],
+    "Seguridad y Orden Público": [
+        "delincuencia", "crimen organizado", "narcotráfico", "Carabineros", "PDI",
+        "policía", "cárceles", "fiscalía", "víctimas", "terrorismo", "violencia"
+    ],
+    "Medio Ambiente y Energía": [
+        "cambio climático", "emisiones", "carbono", "renovables", "agua", "hídrica",
+        "bosques", "contaminación", "litio", "hidrógeno verde", "ambiental"
+    ],
+    "Justicia, Derechos y Libertades": [
+        "tribunales", "jueces", "Poder Judicial", "derechos humanos", "defensoría",
+        "acceso a la justicia", "libertad de expresión", "debido proceso", "reinserción"
+    ],
+    "Agricultura y Desarrollo Rural": [
+        "agrícola", "agricultores", "campesinos", "riego", "sequía", "INDAP",
+        "mundo rural", "pesca", "forestal", "alimentos", "ganadería"
+    ],
+    "Transporte e Infraestructura": [
+        "transporte público", "metro", "trenes", "carreteras", "puertos", "aeropuertos",
+        "concesiones", "obras públicas", "conectividad vial", "movilidad"
+    ],
+    "Políticas Sociales y Comunidad": [
+        "pobreza", "vulnerabilidad", "desigualdad", "subsidios", "transferencias",
+        "Registro Social de Hogares", "cuidados", "discapacidad", "organizaciones sociales",
+        "mujeres", "infancia", "migrantes"
+    ],
+    "Gobernanza, Instituciones y Estado": [
+        "Constitución", "Congreso", "modernización del Estado", "descentralización",
+        "probidad", "corrupción", "transparencia", "municipios", "gobiernos regionales",
+        "partidos políticos", "participación ciudadana"
+    ],
+    "Política Exterior": [
+        "relaciones internacionales", "tratados", "cancillería", "diplomacia",
+        "multilateral", "comercio exterior", "integración regional", "soberanía", "fronteras"
+    ],
+    "Innovación, Tecnología y Digitalización": [
+        "innovación", "digital", "inteligencia artificial", "ciberseguridad",
+        "conectividad", "internet", "datos", "startups", "gobierno digital"
+    ],
+    "Cultura, Ciencia y Sociedad": [
+        "cultura", "artistas", "patrimonio", "museos", "bibliotecas", "ciencia",
+        "investigación", "I+D", "deporte", "pueblos originarios", "identidad"
+    ],
+    "Perfil y Estilo Político del Candidato": [
+        "nuestro gobierno", "compromiso", "convicción", "liderazgo", "visión",
+        "carta", "chilenos y chilenas", "proyecto país", "unidad", "diálogo"
+    ],
+}
+
+
+def stem(word: str) -> str:
+    """Raíz aproximada de una palabra normalizada: sin plural y recortada a STEM_LENGTH."""
+    if len(word) > 4 and word.endswith("es") and word[-3] in PLURAL_ES_AFTER:
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and word[-2] in VOWELS:
+        word = word[:-1]
+    return word[:STEM_LENGTH]
+
+
+def tokenize(text: str) -> List[str]:
+    """Raíces de las palabras normalizadas, sin palabras vacías."""
+    return [
+        stem(word)
+        for word in normalize_text(text).split()
+        if word not in STOPWORDS and len(word) > 1
+    ]
+
+
+def text_terms(text: str) -> List[str]:
+    """
+    Términos indexables de un texto: cada raíz y cada frase de hasta
+    MAX_PHRASE_WORDS raíces consecutivas (raíces unidas por espacios).
+    """
+    tokens = tokenize(text)
+    terms = list(tokens)
+    for size in range(2, MAX_PHRASE_WORDS + 1):
+        terms.extend(" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1))
+    return terms
+
+
+GENERIC_TERMS = frozenset(tokenize(GENERIC_WORDS))
+
+
+def category_query(category: str) -> List[str]:
+    """
+    Términos de búsqueda de una categoría.
+
+    Cada semilla de varias palabras se busca como frase; las palabras del
+    nombre de la categoría y las semillas de una palabra solo se usan si no
+    son genéricas (GENERIC_TERMS).
+
+    Args:
+        category: Nombre de la categoría
+
+    Returns:
+        Términos sin repetir, en el formato de text_terms
+    """
+    terms = [term for term in tokenize(category) if term not in GENERIC_TERMS]
+    for seed in CATEGORY_KEYWORDS.get(category, []):
+        tokens = tokenize(seed)[:MAX_PHRASE_WORDS]
+        if len(tokens) > 1:
+            terms.append(" ".join(tokens))
+        elif tokens and tokens[0] not in GENERIC_TERMS:
+            terms.append(tokens[0])
+    return list(dict.fromkeys(terms))
+
+
+def split_passages(chunks: Iterable[str], max_chars: int = REANALYSIS_PASSAGE_CHARS) -> List[str]:
+    """
+    Divide los chunks en pasajes de a lo más max_chars, por párrafos.
+
+    Los chunks del análisis son demasiado grandes para recuperarlos enteros
+    (enviar unos pocos equivaldría a reenviar el documento), así que el
+    índice trabaja sobre pasajes más cortos.
+
+    Args:
+        chunks: Chunks del documento
+        max_chars: Largo máximo aproximado de un pasaje
+
+    Returns:
+        Pasajes en el orden del documento
+    """
+    passages = []
+    for chunk in chunks:
+        current = ""
+        for paragraph in re.split(r"\n\s*\n", chunk):
+            paragraph = paragraph.strip()
+            if not paragraph:
+                continue
+            if current and len(current) + len(paragraph) + 2 > max_chars:
+                passages.append(current)
+                current = ""
+            # Un párrafo más largo que el máximo se corta en trozos
+            while len(paragraph) > max_chars:
+                passages.append(paragraph[:max_chars])
+                paragraph = paragraph[max_chars:]
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+        if current:
+            passages.append(current)
+    return passages
+
+
+class BM25Index:
+    """Índice BM25 en memoria sobre los pasajes de un documento."""
+
+    def __init__(self, passages: List[str], k1: float = 1.5, b: float = 0.75):
+        """
+        Construye el índice.
+
+        Args:
+            passages: Textos a indexar
+            k1: Saturación de la frecuencia de un término
+            b: Normalización por largo del pasaje
+        """
+        self.passages = passages
+        self.k1 = k1
+        self.b = b
+        self.term_counts = [Counter(text_terms(passage)) for passage in passages]
+        self.lengths = [len(tokenize(passage)) for passage in passages]
+        self.average_length = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+
+        document_frequency = Counter()
+        for counts in self.term_counts:
+            document_frequency.update(counts.keys())
+        total = len(passages)
+        self.idf = {
+            term: math.log(1 + (total - df + 0.5) / (df + 0.5))
+            for term, df in document_frequency.items()
+        }
+
+    def score(self, query: List[str], index: int) -> float:
+        """Puntaje BM25 de un pasaje para los términos de la consulta."""
+        counts = self.term_counts[index]
+        length_norm = 1 - self.b + self.b * self.lengths[index] / (self.average_length or 1)
+        score = 0.0
+        for term in query:
+            frequency = counts.get(term)
+            if frequency:
+                score += self.idf[term] * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return score
+
+    def search(self, query: List[str], k: int) -> List[Tuple[int, float]]:
+        """
+        Pasajes con mayor puntaje para la consulta.
+
+        Args:
+            query: Términos ya tokenizados
+            k: Máximo de resultados
+
+        Returns:
+            Lista de (índice del pasaje, puntaje) con puntaje > 0, de mayor a menor
+        """
+        scored = [(index, self.score(query, index)) for index in range(len(self.passages))]
+        scored = [item for item in scored if item[1] > 0]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+
+def retrieve_passages(
+    chunks: List[str],
+    categories: Iterable[str],
+    top_k: int
+) -> Tuple[List[str], Dict[str, int]]:
+    """
+    Pasajes del documento más relevantes para cada categoría.
+
+    Args:
+        chunks: Chunks del documento
+        categories: Categorías a buscar
+        top_k: Pasajes por categoría
+
+    Returns:
+        Tupla (pasajes seleccionados sin repetir y en el orden del documento,
+        pasajes encontrados por categoría). Una categoría sin ningún término
+        en el documento queda con 0 pasajes.
+    """
+    index = BM25Index(split_passages(chunks))
+    selected = set()
+    matched = {}
+
+    for category in categories:
+        hits = index.search(category_query(category), top_k)
+        matched[category] = len(hits)
+        selected.update(position for position, _ in hits)
+
+    passages = [index.passages[position] for position in sorted(selected)]
+    logger.debug(
+        f"Recuperados {len(passages)} de {len(index.passages)} pasajes para "
+        f"{len(matched)} categorías"
+    )
+    return passages, matched
@@ -0,0 +1,95 @@
+"""
+Resultados intermedios por documento de los subcomandos de main.py
+(extract, chunk, analyze), para ejecutar el pipeline por etapas.
+"""
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional
+from src.config import STAGES_DIR
+from src.checkpoint import pipeline_signature
+from src.incremental import document_fingerprint, write_json_atomic
+
+logger = logging.getLogger(__name__)
+
+# Etapas cuyo resultado depende del modelo y los prompts, no solo del documento
+LLM_STAGES = ("analysis",)
+
+
+class StageArtifacts:
+    """
+    Guarda y recupera el resultado de cada etapa de un documento.
+
+    Cada archivo lleva la huella del documento (y la firma del pipeline en
+    las etapas con LLM); si el documento o los prompts cambian, el
+    resultado guardado se ignora y la etapa se vuelve a calcular.
+    """
+
+    def __init__(self, directory: Path = STAGES_DIR):
+        """
+        Inicializa el almacén.
+
+        Args:
+            directory: Carpeta de los resultados intermedios
+        """
+        self.directory = Path(directory)
+        self.logger = logging.getLogger(self.__class__.__name__)
+
+    def path(self, document_path: Path, stage: str) -> Path:
+        """Archivo del resultado de una etapa para un documento."""
+        return self.directory / f"{document_path.name}.{stage}.json"
+
+    def load(self, document_path: Path, stage: str) -> Optional[Dict]:
+        """
+        Lee el resultado de una etapa si sigue siendo válido.
+
+        Args:
+            document_path: Documento de origen
+            stage: Nombre de la etapa ("extract", "chunks", "analysis")
+
+        Returns:
+            Datos guardados o None si no existen o están desactualizados
+        """
+        path = self.path(document_path, stage)
+        if not path.exists():
+            return None
+
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, json.JSONDecodeError) as e:
+            self.logger.warning(f"No se pudo leer {path.name}: {e}")
+            return None
+
+        if data.get("document_fingerprint") != document_fingerprint(document_path):
+            self.logger.info(f"{path.name} es de otra versión del documento, se ignora")
+            return None
+        if stage in LLM_STAGES and data.get("pipeline_signature") != pipeline_signature():
+            self.logger.info(f"{path.name} es de otra versión del pipeline, se ignora")
+            return None
+
+        return data
+
+    def save(self, document_path: Path, stage: str, data: Dict) -> Path:
+        """
+        Guarda el resultado de una etapa (escritura atómica).
+
+        Args:
+            document_path: Documento de origen
+            stage: Nombre de la etapa
+            data: Datos serializables a JSON
+
+        Returns:
+            Ruta del archivo escrito
+        """
+        self.directory.mkdir(parents=True, exist_ok=True)
+        record = {
+            "document": document_path.name,
+            "document_fingerprint": document_fingerprint(document_path),
+            **data
+        }
+        if stage in LLM_STAGES:
+            record["pipeline_signature"] = pipeline_signature()
+
+        path = self.path(document_path, stage)
+        write_json_atomic(path, record)
+        return path
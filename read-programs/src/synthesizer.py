@@ -4,10 +4,21 @@ Módulo para sintetizar múltiples análisis parciales en un resultado consolida
 import logging
 import json
 import time
-from typing import List, Dict
-from anthropic import Anthropic
+from typing import Any, Callable, List, Dict, Optional, Tuple
+from anthropic import Anthropic, AsyncAnthropic
 from src.config import ANTHROPIC_API_KEY, MODEL_NAME, MAX_TOKENS_OUTPUT_SYNTHESIS, CATEGORIAS
-from src.prompts import SYNTHESIS_PROMPT
+from src.prompts import SYNTHESIS_PROMPT, MERGE_PROMPT
+from src.llm_scheduler import LLMScheduler, estimate_tokens
+from src.llm_streaming import complete_claude_async
+from src.json_salvage import parse_llm_json
+from src.llm_cache import LLMCache
+from src.payload_compactor import serialize_analyses, format_savings
+from src.near_duplicates import NearDuplicateDetector, deduplicate_category
+
+SYNTHESIS_USER_MESSAGE = (
+    "Por favor, consolida todos los análisis parciales en un análisis completo "
+    "siguiendo el formato JSON especificado."
+)
 
 logger = logging.getLogger(__name__)
 
@@ -15,16 +26,35 @@ logger = logging.getLogger(__name__)
 class AnalysisSynthesizer:
     """Sintetiza análisis parciales en un resultado consolidado."""
 
-    def __init__(self, api_key: str = ANTHROPIC_API_KEY, model: str = MODEL_NAME):
+    def __init__(
+        self,
+        api_key: str = ANTHROPIC_API_KEY,
+        model: str = MODEL_NAME,
+        scheduler: Optional[LLMScheduler] = None,
+        cache: Optional[LLMCache] = None,
+        client: Optional[Anthropic] = None,
+        async_client: Optional[AsyncAnthropic] = None,
+        on_response: Optional[Callable[[Any], None]] = None
+    ):
         """
         Inicializa el sintetizador.
 
         Args:
             api_key: API key de Anthropic
             model: Nombre del modelo a usar
+            scheduler: Scheduler compartido para las llamadas asíncronas (opcional)
+            cache: Cache persistente de respuestas (opcional)
+            client: Cliente síncrono ya construido (p. ej. el del proveedor fake)
+            async_client: Cliente asíncrono ya construido (opcional)
+            on_response: Se llama con cada respuesta para registrar su uso de
+                tokens (p. ej. LLMAnalyzer.record_usage, para el costo total)
         """
-        self.client = Anthropic(api_key=api_key)
+        self.client = client or Anthropic(api_key=api_key)
+        self.async_client = async_client or AsyncAnthropic(api_key=api_key)
         self.model = model
+        self.scheduler = scheduler
+        self.cache = cache
+        self.on_response = on_response
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def synthesize(
@@ -46,25 +76,17 @@ class AnalysisSynthesizer:
         """
         self.logger.info(f"Sintetizando {len(partial_analyses)} análisis parciales...")
 
-        # Filtrar análisis vacíos
-        valid_analyses = [
-            a for a in partial_analyses
-            if a and a.get("categorias_encontradas")
-        ]
+        valid_analyses = self._filter_valid(partial_analyses)
 
         if not valid_analyses:
             self.logger.warning("No hay análisis válidos para sintetizar")
             return self._empty_result(metadata)
 
-        # Preparar el prompt
-        analyses_json = json.dumps(valid_analyses, ensure_ascii=False, indent=2)
-        sample_text = original_text_sample[:5000]  # Primeros 5000 caracteres
-
-        prompt_formatted = SYNTHESIS_PROMPT.replace(
-            "{analisis_parciales}", analyses_json
-        ).replace(
-            "{texto_original}", sample_text
-        )
+        prompt_formatted = self._build_prompt(valid_analyses, original_text_sample)
+        cache_key = self._cache_key(prompt_formatted)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_synthesis_response(cached_text, valid_analyses, metadata)[0]
 
         try:
             response = self.client.messages.create(
@@ -75,44 +97,241 @@ class AnalysisSynthesizer:
                 messages=[
                     {
                         "role": "user",
-                        "content": "Por favor, consolida todos los análisis parciales en un análisis completo siguiendo el formato JSON especificado."
+                        "content": SYNTHESIS_USER_MESSAGE
                     }
                 ]
             )
+            if self.on_response:
+                self.on_response(response)
 
-            # Parsear respuesta
-            response_text = response.content[0].text.strip()
+            synthesis, _ = self._parse_synthesis_response(
+                response.content[0].text.strip(), valid_analyses, metadata, cache_key
+            )
 
-            try:
-                synthesis = json.loads(response_text)
+            # Rate limiting: esperar antes de siguiente llamada
+            self.logger.debug("Esperando 15s para respetar rate limits...")
+            time.sleep(15)
 
-                # Validar estructura
-                if "categorias" not in synthesis:
-                    self.logger.error("La síntesis no tiene la estructura esperada")
-                    return self._fallback_synthesis(valid_analyses, metadata)
+            return synthesis
 
-                # Asegurar que metadata esté presente
-                if "metadata" not in synthesis or not synthesis["metadata"]:
-                    synthesis["metadata"] = metadata
+        except Exception as e:
+            self.logger.error(f"Error en síntesis: {e}")
+            return self._fallback_synthesis(valid_analyses, metadata)
 
-                self.logger.info(
-                    f"✓ Síntesis completada: {len(synthesis.get('categorias', []))} categorías"
-                )
+    async def synthesize_async(
+        self,
+        partial_analyses: List[Dict],
+        original_text_sample: str,
+        metadata: Dict[str, str]
+    ) -> Tuple[Dict, bool]:
+        """
+        Versión asíncrona de synthesize, sin espera fija posterior.
 
-                # Rate limiting: esperar antes de siguiente llamada
-                self.logger.debug("Esperando 15s para respetar rate limits...")
-                time.sleep(15)
+        Args:
+            partial_analyses: Lista de análisis parciales de chunks
+            original_text_sample: Muestra del texto original (primeras páginas)
+            metadata: Metadata ya extraída
+
+        Returns:
+            Tupla (análisis consolidado, True si la síntesis del modelo llegó
+            completa). Tras un error o una respuesta incompleta se retorna la
+            síntesis de respaldo con False, para que no se guarde como
+            trabajo terminado
+        """
+        self.logger.info(f"Sintetizando {len(partial_analyses)} análisis parciales...")
+
+        valid_analyses = self._filter_valid(partial_analyses)
+
+        if not valid_analyses:
+            self.logger.warning("No hay análisis válidos para sintetizar")
+            return self._empty_result(metadata), True
+
+        prompt_formatted = self._build_prompt(valid_analyses, original_text_sample)
+        cache_key = self._cache_key(prompt_formatted)
+        cached_text = self.cache.get(cache_key) if self.cache else None
+        if cached_text is not None:
+            return self._parse_synthesis_response(cached_text, valid_analyses, metadata)
 
-                return synthesis
+        try:
+            response_text, _ = await complete_claude_async(
+                self.async_client,
+                self.scheduler,
+                {
+                    "model": self.model,
+                    "max_tokens": MAX_TOKENS_OUTPUT_SYNTHESIS,
+                    "temperature": 0,
+                    "system": prompt_formatted,
+                    "messages": [
+                        {
+                            "role": "user",
+                            "content": SYNTHESIS_USER_MESSAGE
+                        }
+                    ]
+                },
+                estimate_tokens(prompt_formatted) + MAX_TOKENS_OUTPUT_SYNTHESIS,
+                on_response=self.on_response,
+                list_key="categorias"
+            )
 
-            except json.JSONDecodeError as e:
-                self.logger.error(f"Error parseando JSON de síntesis: {e}")
-                self.logger.debug(f"Respuesta: {response_text[:500]}...")
-                return self._fallback_synthesis(valid_analyses, metadata)
+            return self._parse_synthesis_response(response_text, valid_analyses, metadata, cache_key)
 
         except Exception as e:
             self.logger.error(f"Error en síntesis: {e}")
-            return self._fallback_synthesis(valid_analyses, metadata)
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+    async def merge_async(self, partial_analyses: List[Dict]) -> Optional[Dict]:
+        """
+        Fusiona un grupo de análisis parciales en uno solo (síntesis jerárquica).
+
+        Args:
+            partial_analyses: Análisis parciales del grupo
+
+        Returns:
+            Análisis fusionado con formato de chunk, o None si falla
+        """
+        analyses_json, _ = serialize_analyses(partial_analyses)
+        prompt = MERGE_PROMPT.replace("{analisis_parciales}", analyses_json)
+        cache_key = self._cache_key(prompt, MERGE_PROMPT)
+
+        response_text = self.cache.get(cache_key) if self.cache else None
+        if response_text is None:
+            try:
+                response_text, _ = await complete_claude_async(
+                    self.async_client,
+                    self.scheduler,
+                    {
+                        "model": self.model,
+                        "max_tokens": MAX_TOKENS_OUTPUT_SYNTHESIS,
+                        "temperature": 0,
+                        "messages": [
+                            {
+                                "role": "user",
+                                "content": prompt
+                            }
+                        ]
+                    },
+                    estimate_tokens(prompt) + MAX_TOKENS_OUTPUT_SYNTHESIS,
+                    on_response=self.on_response,
+                    list_key="categorias_encontradas"
+                )
+            except Exception as e:
+                self.logger.error(f"Error fusionando grupo de {len(partial_analyses)} análisis: {e}")
+                return None
+
+        try:
+            merged, partial = parse_llm_json(response_text, "categorias_encontradas")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON de fusión: {e}")
+            return None
+
+        if partial:
+            # Una fusión incompleta perdería categorías: mejor la fusión local del grupo
+            self.logger.warning("Fusión incompleta, se descarta")
+            return None
+
+        if not isinstance(merged, dict) or "categorias_encontradas" not in merged:
+            self.logger.error("La fusión no tiene la estructura esperada")
+            return None
+
+        if self.cache:
+            self.cache.put(cache_key, response_text)
+
+        return merged
+
+    def _filter_valid(self, partial_analyses: List[Dict]) -> List[Dict]:
+        """Filtra análisis vacíos o sin categorías."""
+        return [
+            a for a in partial_analyses
+            if a and a.get("categorias_encontradas")
+        ]
+
+    def _build_prompt(self, valid_analyses: List[Dict], original_text_sample: str) -> str:
+        """
+        Construye el prompt de síntesis.
+
+        Args:
+            valid_analyses: Análisis parciales válidos
+            original_text_sample: Muestra del texto original
+
+        Returns:
+            Prompt con los análisis y la muestra de texto
+        """
+        analyses_json, stats = serialize_analyses(valid_analyses)
+        self.logger.info(f"Payload de síntesis: {format_savings(stats)}")
+        sample_text = original_text_sample[:5000]  # Primeros 5000 caracteres
+
+        return SYNTHESIS_PROMPT.replace(
+            "{analisis_parciales}", analyses_json
+        ).replace(
+            "{texto_original}", sample_text
+        )
+
+    def _parse_synthesis_response(
+        self,
+        response_text: str,
+        valid_analyses: List[Dict],
+        metadata: Dict[str, str],
+        cache_key: Optional[str] = None
+    ) -> Tuple[Dict, bool]:
+        """
+        Parsea la respuesta de síntesis, con fallback si es inválida.
+
+        Si el JSON llegó incompleto se conservan las categorías completas y
+        las demás se toman del merge simple; el resultado se informa como
+        incompleto, sin marcarlo en la síntesis.
+
+        Args:
+            response_text: Texto devuelto por el modelo
+            valid_analyses: Análisis parciales (para el fallback)
+            metadata: Metadata del candidato
+            cache_key: Clave para guardar la respuesta si es válida (opcional)
+
+        Returns:
+            Tupla (síntesis consolidada, True si la respuesta llegó completa)
+        """
+        try:
+            synthesis, partial = parse_llm_json(response_text, "categorias")
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Error parseando JSON de síntesis: {e}")
+            self.logger.debug(f"Respuesta: {response_text[:500]}...")
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+        # Validar estructura
+        if "categorias" not in synthesis:
+            self.logger.error("La síntesis no tiene la estructura esperada")
+            return self._fallback_synthesis(valid_analyses, metadata), False
+
+        if partial:
+            # Las categorías que no alcanzaron a llegar salen del merge simple
+            present = {cat.get("categoria") for cat in synthesis["categorias"]}
+            fallback = self._fallback_synthesis(valid_analyses, metadata)
+            synthesis["categorias"].extend(
+                cat for cat in fallback["categorias"] if cat["categoria"] not in present
+            )
+
+        # Guardar en cache solo respuestas completas con la estructura esperada
+        elif cache_key and self.cache:
+            self.cache.put(cache_key, response_text)
+
+        # Asegurar que metadata esté presente
+        if "metadata" not in synthesis or not synthesis["metadata"]:
+            synthesis["metadata"] = metadata
+
+        self.logger.info(
+            f"✓ Síntesis completada: {len(synthesis.get('categorias', []))} categorías"
+        )
+
+        return synthesis, not partial
+
+    def _cache_key(self, prompt: str, prompt_template: str = SYNTHESIS_PROMPT) -> str:
+        """Clave de cache para una llamada de síntesis o de fusión."""
+        return LLMCache.make_key(
+            "claude",
+            self.model,
+            {"temperature": 0, "max_tokens": MAX_TOKENS_OUTPUT_SYNTHESIS},
+            prompt_template,
+            prompt
+        )
 
     def _fallback_synthesis(
         self,
@@ -157,9 +376,11 @@ class AnalysisSynthesizer:
                 citas = cat_data.get("citas_textuales", [])
                 categories_map[cat_name]["citas_textuales"].extend(citas)
 
-        # Eliminar duplicados en citas
+        # Eliminar propuestas y citas casi duplicadas
+        detector = NearDuplicateDetector()
         for cat in categories_map.values():
-            cat["citas_textuales"] = list(set(cat["citas_textuales"]))[:5]
+            deduplicate_category(cat, detector)
+            cat["citas_textuales"] = cat["citas_textuales"][:5]
             cat["presente"] = True
 
         # Asegurar que todas las 16 categorías estén presentes
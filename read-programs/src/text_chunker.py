@@ -2,8 +2,19 @@
 Módulo para dividir texto largo en chunks manejables para el LLM.
 """
 import logging
-from typing import List
-from src.config import MAX_CHARS_PER_CHUNK, CHUNK_OVERLAP_CHARS
+from typing import Iterable, Iterator, List, Optional, Tuple
+from src.config import (
+    MAX_CHARS_PER_CHUNK,
+    CHUNK_OVERLAP_CHARS,
+    MAX_TOKENS_PER_CHUNK,
+    CHUNK_OVERLAP_TOKENS,
+    CHARS_PER_TOKEN,
+    CHUNK_SIZING
+)
+from src.token_counter import TokenCounter
+
+# Separadores para cortar segmentos demasiado largos, de mayor a menor nivel
+SEGMENT_SEPARATORS = ["\n\n", ". ", " "]
 
 logger = logging.getLogger(__name__)
 
@@ -14,7 +25,11 @@ class TextChunker:
     def __init__(
         self,
         max_chars: int = MAX_CHARS_PER_CHUNK,
-        overlap_chars: int = CHUNK_OVERLAP_CHARS
+        overlap_chars: int = CHUNK_OVERLAP_CHARS,
+        sizing: str = CHUNK_SIZING,
+        max_tokens: int = MAX_TOKENS_PER_CHUNK,
+        overlap_tokens: int = CHUNK_OVERLAP_TOKENS,
+        token_counter: Optional[TokenCounter] = None
     ):
         """
         Inicializa el chunker.
@@ -22,9 +37,20 @@ class TextChunker:
         Args:
             max_chars: Máximo de caracteres por chunk
             overlap_chars: Caracteres de overlap entre chunks
+            sizing: "chars" (por caracteres) o "tokens" (por tokens contados)
+            max_tokens: Máximo de tokens por chunk (modo "tokens")
+            overlap_tokens: Tokens de overlap entre chunks (modo "tokens")
+            token_counter: Contador de tokens (modo "tokens")
         """
+        if sizing not in ("chars", "tokens"):
+            raise ValueError(f"sizing debe ser 'chars' o 'tokens', no '{sizing}'")
+
         self.max_chars = max_chars
         self.overlap_chars = overlap_chars
+        self.sizing = sizing
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.token_counter = token_counter or (TokenCounter() if sizing == "tokens" else None)
         self.logger = logging.getLogger(self.__class__.__name__)
 
     def chunk_text(self, text: str) -> List[str]:
@@ -37,6 +63,9 @@ class TextChunker:
         Returns:
             Lista de chunks de texto
         """
+        if self.sizing == "tokens":
+            return self.chunk_text_by_tokens(text)
+
         if len(text) <= self.max_chars:
             self.logger.info("Texto completo cabe en un solo chunk")
             return [text]
@@ -87,6 +116,297 @@ class TextChunker:
 
         return chunks
 
+    def chunk_text_by_tokens(self, text: str) -> List[str]:
+        """
+        Divide el texto empaquetando segmentos hasta acercarse a max_tokens.
+
+        El texto se corta en párrafos (y estos en oraciones o palabras si
+        exceden el presupuesto); luego se agregan segmentos completos a cada
+        chunk mientras quepan. El overlap son los últimos segmentos del chunk
+        anterior que suman hasta overlap_tokens.
+
+        Args:
+            text: Texto completo a dividir
+
+        Returns:
+            Lista de chunks de texto
+        """
+        spans = self._split_spans(text, 0, len(text), 0)
+        counts = [self.token_counter.count(text[start:end]) for start, end in spans]
+
+        chunks = []
+        chunk_tokens = []
+        i = 0
+
+        while i < len(spans):
+            # Empaquetar segmentos mientras quepan (al menos uno por chunk)
+            j = i
+            total = 0
+            while j < len(spans) and (j == i or total + counts[j] <= self.max_tokens):
+                total += counts[j]
+                j += 1
+
+            chunk = text[spans[i][0]:spans[j - 1][1]].strip()
+            if chunk:
+                chunks.append(chunk)
+                chunk_tokens.append(total)
+
+            if j >= len(spans):
+                break
+
+            # Retroceder para el overlap, sin dejar de avanzar
+            k = j
+            overlap = 0
+            while k - 1 > i and overlap + counts[k - 1] <= self.overlap_tokens:
+                overlap += counts[k - 1]
+                k -= 1
+            i = k
+
+        self._log_token_report(chunks, chunk_tokens)
+        return chunks
+
+    def _split_spans(self, text: str, start: int, end: int, level: int) -> List[Tuple[int, int]]:
+        """
+        Corta text[start:end] en segmentos (posiciones) que quepan en max_tokens.
+
+        Args:
+            text: Texto completo
+            start: Inicio del tramo
+            end: Fin del tramo
+            level: Índice en SEGMENT_SEPARATORS del separador a usar
+
+        Returns:
+            Lista de tuplas (inicio, fin) contiguas que cubren el tramo
+        """
+        separator = SEGMENT_SEPARATORS[level]
+        spans = []
+        position = start
+
+        while position < end:
+            cut = text.find(separator, position, end)
+            segment_end = end if cut == -1 else cut + len(separator)
+            spans.append((position, segment_end))
+            position = segment_end
+
+        if level + 1 >= len(SEGMENT_SEPARATORS):
+            return spans
+
+        result = []
+        for span_start, span_end in spans:
+            if self.token_counter.count(text[span_start:span_end]) > self.max_tokens:
+                result.extend(self._split_spans(text, span_start, span_end, level + 1))
+            else:
+                result.append((span_start, span_end))
+        return result
+
+    def _log_token_report(self, chunks: List[str], chunk_tokens: List[int]) -> None:
+        """Reporta tokens contados vs. la estimación de CHARS_PER_TOKEN."""
+        if not chunks:
+            return
+
+        counted = sum(chunk_tokens)
+        estimated = sum(len(chunk) for chunk in chunks) // CHARS_PER_TOKEN
+        difference = (estimated - counted) / counted * 100 if counted else 0.0
+
+        for number, (chunk, tokens) in enumerate(zip(chunks, chunk_tokens), 1):
+            self.logger.debug(
+                f"Chunk {number}: {tokens:,} tokens contados, "
+                f"{len(chunk) // CHARS_PER_TOKEN:,} estimados ({len(chunk):,} caracteres)"
+            )
+
+        self.logger.info(
+            f"Texto dividido en {len(chunks)} chunks por tokens "
+            f"(promedio: {counted // len(chunks):,} tokens/chunk de {self.max_tokens:,}; "
+            f"contados {counted:,} vs. estimados {estimated:,} con "
+            f"{CHARS_PER_TOKEN} chars/token, {difference:+.1f}%)"
+        )
+
+    def iter_chunks(self, pieces: Iterable[str], separator: str = "\n\n") -> Iterator[str]:
+        """
+        Versión en streaming de chunk_text.
+
+        Consume el texto por partes (p. ej. páginas) y emite cada chunk en
+        cuanto se conoce su punto de corte, sin construir el texto completo.
+        Produce los mismos chunks que chunk_text(separator.join(pieces)),
+        también en modo "tokens".
+
+        Args:
+            pieces: Partes del texto en orden (p. ej. páginas)
+            separator: Separador con el que se unen las partes
+
+        Yields:
+            Chunks de texto
+        """
+        if self.sizing == "tokens":
+            yield from self._iter_chunks_by_tokens(pieces, separator)
+            return
+
+        pieces = iter(pieces)
+        buffer = ""       # Texto pendiente, desde la posición absoluta `base`
+        base = 0
+        start = 0
+        exhausted = False
+        has_content = False
+        emitted = 0
+
+        while True:
+            # Leer partes hasta conocer el texto más allá del final del chunk
+            while not exhausted and base + len(buffer) <= start + self.max_chars:
+                try:
+                    piece = next(pieces)
+                except StopIteration:
+                    exhausted = True
+                    break
+                buffer += (separator + piece) if has_content else piece
+                has_content = True
+
+            text_end = base + len(buffer)
+
+            if exhausted and emitted == 0 and text_end <= self.max_chars:
+                self.logger.info("Texto completo cabe en un solo chunk")
+                yield buffer
+                return
+
+            if start >= text_end:
+                break
+
+            end = start + self.max_chars
+
+            # Si no es el último chunk, buscar un buen punto de corte
+            if end < text_end:
+                search_start = max(start, end - 500) - base
+                last_paragraph = buffer.rfind("\n\n", search_start, end - base)
+
+                if last_paragraph == -1:
+                    last_sentence = buffer.rfind(". ", search_start, end - base)
+                    if last_sentence != -1:
+                        end = base + last_sentence + 1
+                else:
+                    end = base + last_paragraph + 2
+
+            chunk = buffer[start - base:end - base].strip()
+
+            if chunk:
+                emitted += 1
+                self.logger.debug(
+                    f"Chunk {emitted}: {len(chunk):,} caracteres "
+                    f"(posición {start:,} - {end:,})"
+                )
+                yield chunk
+
+            # Avanzar con overlap
+            start = end - self.overlap_chars
+
+            # Evitar loop infinito
+            if start <= 0 and emitted > 0:
+                break
+
+            # Descartar el texto ya consumido para no acumular el documento
+            if start > base:
+                buffer = buffer[start - base:]
+                base = start
+
+        self.logger.info(f"Texto dividido en {emitted} chunks (streaming)")
+
+    def _iter_chunks_by_tokens(self, pieces: Iterable[str], separator: str) -> Iterator[str]:
+        """
+        Versión en streaming de chunk_text_by_tokens.
+
+        Solo retiene los segmentos del chunk en construcción (desde el inicio
+        de su overlap), así la memoria no crece con el documento.
+
+        Args:
+            pieces: Partes del texto en orden (p. ej. páginas)
+            separator: Separador con el que se unen las partes
+
+        Yields:
+            Chunks de texto
+        """
+        segments = self._iter_token_segments(pieces, separator)
+        window: List[Tuple[str, int]] = []  # (texto, tokens) desde el inicio del chunk
+        emitted = 0
+        counted = 0
+
+        while True:
+            # Empaquetar segmentos mientras quepan (al menos uno por chunk)
+            j = 0
+            total = 0
+            while True:
+                if j >= len(window):
+                    segment = next(segments, None)
+                    if segment is None:
+                        break
+                    window.append(segment)
+                if j > 0 and total + window[j][1] > self.max_tokens:
+                    break
+                total += window[j][1]
+                j += 1
+
+            if j == 0:
+                break
+
+            chunk = "".join(text for text, _ in window[:j]).strip()
+            if chunk:
+                emitted += 1
+                counted += total
+                self.logger.debug(f"Chunk {emitted}: {total:,} tokens contados ({len(chunk):,} caracteres)")
+                yield chunk
+
+            if j >= len(window):
+                break
+
+            # Retroceder para el overlap, sin dejar de avanzar
+            k = j
+            overlap = 0
+            while k - 1 > 0 and overlap + window[k - 1][1] <= self.overlap_tokens:
+                overlap += window[k - 1][1]
+                k -= 1
+            window = window[k:]
+
+        self.logger.info(
+            f"Texto dividido en {emitted} chunks por tokens (streaming, promedio: "
+            f"{counted // max(emitted, 1):,} tokens/chunk de {self.max_tokens:,})"
+        )
+
+    def _iter_token_segments(self, pieces: Iterable[str], separator: str) -> Iterator[Tuple[str, int]]:
+        """
+        Segmentos de _split_spans con su conteo de tokens, a medida que se
+        completa cada párrafo del texto unido por separator.
+
+        Yields:
+            Tuplas (texto del segmento, tokens)
+        """
+        paragraph_separator = SEGMENT_SEPARATORS[0]
+        buffer = ""
+        has_content = False
+
+        for piece in pieces:
+            buffer += (separator + piece) if has_content else piece
+            has_content = True
+
+            position = 0
+            while True:
+                cut = buffer.find(paragraph_separator, position)
+                if cut == -1:
+                    break
+                end = cut + len(paragraph_separator)
+                yield from self._paragraph_segments(buffer[position:end])
+                position = end
+            buffer = buffer[position:]
+
+        if buffer:
+            yield from self._paragraph_segments(buffer)
+
+    def _paragraph_segments(self, paragraph: str) -> Iterator[Tuple[str, int]]:
+        """Un párrafo como segmento, o cortado en oraciones o palabras si excede max_tokens."""
+        tokens = self.token_counter.count(paragraph)
+        if tokens <= self.max_tokens:
+            yield paragraph, tokens
+            return
+
+        for start, end in self._split_spans(paragraph, 0, len(paragraph), 1):
+            yield paragraph[start:end], self.token_counter.count(paragraph[start:end])
+
     def chunk_by_pages(self, text: str, chars_per_page: int = 3000) -> List[str]:
         """
         Divide el texto simulando páginas.
@@ -2,7 +2,7 @@
 Módulo para validar completitud del análisis y re-analizar categorías faltantes.
 """
 import logging
-from typing import Dict, List, Set
+from typing import Dict, List
 from src.config import CATEGORIAS, ENABLE_VALIDATION, REANALYZE_MISSING_CATEGORIES
 
 logger = logging.getLogger(__name__)
@@ -137,7 +137,11 @@ class AnalysisValidator:
             for cat_data in reanalysis.get('categorias_encontradas', []):
                 cat_name = cat_data.get('categoria')
 
-                if cat_name and cat_name not in categories_map:
+                # Solo categorías esperadas que la síntesis no tenía o marcó como ausentes
+                existing = categories_map.get(cat_name)
+                if cat_name in self.expected_categories and (
+                    existing is None or not existing.get('presente', True)
+                ):
                     # Agregar nueva categoría
                     new_category = {
                         "categoria": cat_name,
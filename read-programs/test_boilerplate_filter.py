@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Pruebas del filtro de boilerplate (src/boilerplate_filter.py).
+
+Se ejecutan con pytest o directamente: python test_boilerplate_filter.py
+"""
+from src.boilerplate_filter import BoilerplateFilter
+
+# Prosa de un PDF a dos columnas: cada párrafo termina con "." solo en su última línea
+NARROW_PROSE = """Fortaleceremos la atención primaria
+en todas las comunas del país
+mediante nuevos centros de salud
+familiar con equipos completos
+y horarios extendidos.
+
+Crearemos un sistema nacional
+de cuidados que reconozca
+el trabajo de las mujeres
+cuidadoras y les entregue
+apoyo económico directo.
+
+Impulsaremos la construcción
+de viviendas sociales bien
+ubicadas en las ciudades
+con acceso a transporte
+y servicios públicos."""
+
+WIDE_PROSE = (
+    "Durante nuestro gobierno ampliaremos la red de hospitales públicos en todas las regiones,\n"
+    "con especial atención a las zonas extremas, y reduciremos los tiempos de espera para cirugías\n"
+    "y consultas de especialidad mediante un plan nacional con metas anuales verificables por la ciudadanía.\n"
+    "Este compromiso se financiará con la reforma tributaria descrita en el capítulo económico del programa."
+)
+
+MENU = "Inicio\nPropuestas\nEquipo\nNoticias\nContacto"
+
+
+def run_filter(pages, **kwargs):
+    boilerplate = BoilerplateFilter(**kwargs)
+    return boilerplate.filter_text(pages), boilerplate.stats
+
+
+def test_wrapped_prose_is_kept():
+    text, stats = run_filter([NARROW_PROSE, NARROW_PROSE])
+
+    assert text == f"{NARROW_PROSE}\n\n{NARROW_PROSE}"
+    assert stats["dropped_blocks"] == 0
+    assert stats["dropped_pages"] == 0
+
+
+def test_menu_next_to_prose_is_dropped():
+    text, stats = run_filter([f"{MENU}\n\n{WIDE_PROSE}"])
+
+    assert text == WIDE_PROSE
+    assert stats["dropped_blocks"] == 1
+
+
+def test_menu_next_to_narrow_prose_is_dropped():
+    text, stats = run_filter([f"{MENU}\n\n{NARROW_PROSE}"])
+
+    assert text == NARROW_PROSE
+    assert stats["dropped_blocks"] == 1
+
+
+def test_bullet_lists_are_kept():
+    bullets = "- Más médicos\n- Más camas\n- Más consultorios\n- Más especialistas"
+
+    text, _ = run_filter([f"{bullets}\n\n{WIDE_PROSE}"])
+
+    assert text == f"{bullets}\n\n{WIDE_PROSE}"
+
+
+def test_repeated_footer_and_page_numbers_are_dropped():
+    pages = [
+        f"Capítulo {number}: {WIDE_PROSE}\nPrograma de Gobierno 2026\n{number}"
+        for number in range(1, 5)
+    ]
+
+    text, _ = run_filter(pages, repeat_limit=3)
+
+    assert text.count("Programa de Gobierno") == 2
+    assert text.count("Capítulo") == 4
+
+
+def test_toc_entries_are_dropped():
+    toc = "Salud ........ 12\nEducación ........ 20"
+
+    text, _ = run_filter([f"{toc}\n\n{WIDE_PROSE}"])
+
+    assert text == WIDE_PROSE
+
+
+def test_short_pages_are_dropped_unless_single():
+    cover = "Programa Presidencial"
+
+    text, stats = run_filter([cover, WIDE_PROSE])
+    assert text == WIDE_PROSE
+    assert stats["dropped_pages"] == 1
+
+    text, stats = run_filter([cover])
+    assert text == cover
+    assert stats["dropped_pages"] == 0
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
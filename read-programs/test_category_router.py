@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Pruebas del enrutador local de categorías (src/category_router.py).
+
+Se ejecutan con pytest o directamente: python test_category_router.py
+"""
+import json
+import tempfile
+from pathlib import Path
+from src.config import CATEGORIAS
+from src.category_router import ALWAYS_ROUTED, CategoryRouter
+
+HEALTH_TEXT = (
+    "Construiremos hospitales y nuevos consultorios en regiones. Reduciremos las listas "
+    "de espera de FONASA y ampliaremos la atención primaria con más médicos. "
+) * 3
+
+GENERIC_TEXT = (
+    "Nuestra política pública será social y nacional. El gobierno y el Estado "
+    "trabajarán por el desarrollo del país y de todas las comunidades. "
+) * 3
+
+
+def make_router(**kwargs) -> CategoryRouter:
+    options = {"min_hits": 2, "min_density": 0.0, "min_categories": 1}
+    options.update(kwargs)
+    return CategoryRouter(**options)
+
+
+def test_routes_the_mentioned_category():
+    routed = make_router().route(HEALTH_TEXT)
+
+    assert "Salud" in routed
+    assert "Política Exterior" not in routed
+    assert "Gobernanza, Instituciones y Estado" not in routed
+
+
+def test_generic_words_route_nothing_extra():
+    assert make_router().route(GENERIC_TEXT) == list(ALWAYS_ROUTED)
+
+
+def test_phrases_count_only_as_phrases():
+    router = make_router()
+
+    assert "Transporte e Infraestructura" in router.route("Más transporte público. " * 3)
+    assert "Transporte e Infraestructura" not in router.route("Un gasto público. Una obra. " * 3)
+
+
+def test_min_categories_fills_by_mentions():
+    routed = make_router(min_categories=3).route(HEALTH_TEXT)
+
+    assert len(routed) >= 3
+    assert "Salud" in routed
+    assert routed == [category for category in CATEGORIAS if category in routed]
+
+
+def test_density_cutoff_grows_with_chunk_length():
+    text = "Construiremos hospitales. " + "Texto sin categorías relevantes aquí. " * 200
+
+    assert "Salud" in make_router(min_hits=1).route(text)
+    assert "Salud" not in make_router(min_hits=1, min_density=0.01).route(text)
+
+
+def test_trained_model_adds_categories():
+    router = make_router()
+    examples = [("la orquesta sinfónica y el teatro", {"Cultura, Ciencia y Sociedad"})] * 20
+    examples += [("el puente y la carretera", {"Transporte e Infraestructura"})] * 20
+    router.train(examples, epochs=4)
+
+    assert router.trained
+    assert "Cultura, Ciencia y Sociedad" in router.route("Una orquesta sinfónica para cada región.")
+
+
+def test_load_ignores_models_with_other_features():
+    router = make_router()
+    router.train([("hospitales y médicos", {"Salud"})] * 5, epochs=1)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / "router.json"
+        router.save(path)
+        assert CategoryRouter.load(path).trained
+
+        data = json.loads(path.read_text(encoding="utf-8"))
+        data.pop("feature_version")
+        path.write_text(json.dumps(data), encoding="utf-8")
+        assert not CategoryRouter.load(path).trained
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Pruebas del parseo tolerante de JSON (src/json_salvage.py).
+
+Se ejecutan con pytest o directamente: python test_json_salvage.py
+"""
+import json
+from src.json_salvage import loads_tolerant, parse_llm_json, resume_prefix, salvage_json
+
+KEY = "categorias_encontradas"
+
+COMPLETE = json.dumps({
+    KEY: [
+        {"categoria": "Salud", "propuestas": ["Más hospitales"]},
+        {"categoria": "Educación", "propuestas": ["Sala cuna universal", "Fin al CAE"]},
+        {"categoria": "Vivienda", "propuestas": ["Viviendas sociales"]}
+    ]
+}, ensure_ascii=False)
+
+# Cortado dentro de la tercera entrada
+TRUNCATED = COMPLETE[:COMPLETE.index("Viviendas")]
+
+
+def test_loads_tolerant_accepts_fences_text_and_trailing_commas():
+    text = 'Aquí está el análisis:\n```json\n{"categorias": [{"nombre": "Salud",},],}\n```'
+
+    assert loads_tolerant(text) == {"categorias": [{"nombre": "Salud"}]}
+
+
+def test_loads_tolerant_keeps_commas_inside_strings():
+    assert loads_tolerant('{"texto": "uno, }dos,]", }') == {"texto": "uno, }dos,]"}
+
+
+def test_loads_tolerant_raises_on_truncated_json():
+    try:
+        loads_tolerant(TRUNCATED)
+    except json.JSONDecodeError:
+        return
+    raise AssertionError("se esperaba JSONDecodeError")
+
+
+def test_salvage_keeps_complete_entries():
+    value, prefix = salvage_json(TRUNCATED, KEY)
+
+    assert [entry["categoria"] for entry in value[KEY]] == ["Salud", "Educación"]
+    assert TRUNCATED.startswith(prefix)
+    assert prefix.endswith("}")
+
+
+def test_salvage_returns_none_without_complete_entries():
+    assert salvage_json('{"categorias_encontradas": [{"categoria": "Sal', KEY) is None
+    assert salvage_json("sin JSON", KEY) is None
+
+
+def test_salvage_ignores_nested_lists_with_the_same_key():
+    text = '{"otra": {"categorias_encontradas": [{"a": 1}]}, "categorias_encontradas": [{"b": 2}, {"c'
+
+    value, _ = salvage_json(text, KEY)
+
+    assert value[KEY] == [{"b": 2}]
+
+
+def test_resume_prefix_continues_after_last_entry():
+    prefix = resume_prefix(TRUNCATED, KEY)
+
+    assert prefix == salvage_json(TRUNCATED, KEY)[1] + ","
+    # El modelo completa el resto y el resultado es el JSON original
+    assert json.loads(prefix + COMPLETE[len(prefix):]) == json.loads(COMPLETE)
+
+
+def test_resume_prefix_without_entries_starts_at_the_list():
+    text = '```json\n{"categorias_encontradas": [{"categoria": "Sal'
+
+    assert resume_prefix(text, KEY) == '{"categorias_encontradas": ['
+
+
+def test_resume_prefix_none_for_valid_or_unrelated_text():
+    assert resume_prefix(COMPLETE, KEY) is None
+    assert resume_prefix('{"otra": [{"a": 1}, {"b', KEY) is None
+    assert resume_prefix("sin JSON", KEY) is None
+
+
+def test_parse_llm_json_reports_partial_without_marking_the_value():
+    value, partial = parse_llm_json(COMPLETE, KEY)
+    assert not partial
+    assert value == json.loads(COMPLETE)
+
+    value, partial = parse_llm_json(TRUNCATED, KEY)
+    assert partial
+    assert set(value) == {KEY}
+    assert len(value[KEY]) == 2
+
+
+def test_parse_llm_json_raises_when_nothing_is_recovered():
+    try:
+        parse_llm_json('{"categorias_encontradas": [{"categoria": "Sal', KEY)
+    except json.JSONDecodeError:
+        return
+    raise AssertionError("se esperaba JSONDecodeError")
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
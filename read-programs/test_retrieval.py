@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Pruebas de la recuperación BM25 usada por el re-análisis (src/retrieval.py).
+
+Se ejecutan con pytest o directamente: python test_retrieval.py
+"""
+from collections import Counter
+from src.config import CATEGORIAS
+from src.retrieval import (
+    BM25Index, GENERIC_TERMS, category_query, retrieve_passages, split_passages, stem, tokenize
+)
+
+
+def test_stem_joins_variants_only():
+    assert stem("educacion") == stem("educacional") == stem("educaciones")
+    assert stem("hospitales") == stem("hospital")
+    assert stem("transporte") != stem("transparencia")
+    assert len({stem("internacional"), stem("internet"), stem("interno")}) == 3
+
+
+def test_tokenize_drops_stopwords_and_accents():
+    assert tokenize("La Educación de los niños") == ["educaci", "nino"]
+
+
+def test_queries_skip_generic_words():
+    for category in CATEGORIAS:
+        for term in category_query(category):
+            assert term not in GENERIC_TERMS, (category, term)
+
+
+def test_multiword_seeds_are_phrases():
+    assert "transpo publico" in category_query("Transporte e Infraestructura")
+    assert "acceso justici" in category_query("Justicia, Derechos y Libertades")
+    assert "relacio interna" in category_query("Política Exterior")
+
+
+def test_single_terms_are_not_shared_between_categories():
+    counts = Counter(
+        term for category in CATEGORIAS for term in category_query(category) if " " not in term
+    )
+    assert [term for term, count in counts.items() if count > 1] == []
+
+
+def test_bm25_ranks_the_relevant_passage_first():
+    passages = [
+        "Construiremos hospitales y bajaremos las listas de espera en FONASA.",
+        "La política pública del gobierno será social y nacional.",
+        "Más carabineros y persecución del crimen organizado.",
+    ]
+    index = BM25Index(passages)
+
+    assert index.search(category_query("Salud"), 3)[0][0] == 0
+    assert index.search(category_query("Seguridad y Orden Público"), 3)[0][0] == 2
+
+
+def test_generic_text_matches_no_category():
+    index = BM25Index(["La política pública del gobierno será social, nacional y para todo el país."])
+
+    for category in CATEGORIAS:
+        assert index.search(category_query(category), 1) == [], category
+
+
+def test_split_passages_respects_max_chars():
+    chunk = "\n\n".join("Párrafo " + "x" * 80 for _ in range(10))
+
+    passages = split_passages([chunk], max_chars=200)
+
+    assert len(passages) > 1
+    assert all(len(passage) <= 200 for passage in passages)
+
+
+def test_retrieve_passages_keeps_document_order():
+    chunks = [
+        "Subiremos las pensiones y fortaleceremos el pilar solidario.",
+        "Construiremos hospitales en regiones.",
+        "Más escuelas y liceos públicos de calidad.",
+    ]
+
+    passages, matched = retrieve_passages(chunks, ["Educación", "Salud", "Política Exterior"], top_k=1)
+
+    assert passages == chunks[1:]
+    assert matched == {"Educación": 1, "Salud": 1, "Política Exterior": 0}
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Pruebas del empaquetado por tokens de TextChunker (chunk_text e iter_chunks).
+
+Se ejecutan con pytest o directamente: python test_text_chunker.py
+"""
+from src.text_chunker import TextChunker
+from src.token_counter import TokenCounter
+
+
+def make_pages(num_pages: int = 6, paragraphs_per_page: int = 5) -> list:
+    """Páginas de texto con párrafos de largo variable."""
+    pages = []
+    for page in range(num_pages):
+        paragraphs = []
+        for index in range(paragraphs_per_page):
+            words = " ".join(f"propuesta{page}{index}{n}" for n in range(10 + (index * 7) % 25))
+            paragraphs.append(f"Párrafo {page}.{index}: {words}.")
+        pages.append("\n\n".join(paragraphs))
+    return pages
+
+
+def make_chunker(max_tokens: int = 200, overlap_tokens: int = 40) -> TextChunker:
+    return TextChunker(sizing="tokens", max_tokens=max_tokens, overlap_tokens=overlap_tokens)
+
+
+def test_stream_matches_chunk_text():
+    pages = make_pages()
+    chunker = make_chunker()
+
+    expected = chunker.chunk_text("\n\n".join(pages))
+    streamed = list(chunker.iter_chunks(iter(pages)))
+
+    assert len(expected) > 1
+    assert streamed == expected
+
+
+def test_stream_matches_with_page_separator():
+    pages = make_pages(num_pages=4)
+    chunker = make_chunker(max_tokens=150, overlap_tokens=0)
+
+    expected = chunker.chunk_text("\n".join(pages))
+    assert list(chunker.iter_chunks(pages, separator="\n")) == expected
+
+
+def test_chunks_respect_token_budget():
+    chunker = make_chunker(max_tokens=120, overlap_tokens=30)
+    counter = TokenCounter()
+
+    for chunk in chunker.iter_chunks(make_pages()):
+        assert counter.count(chunk) <= 120
+
+
+def test_consecutive_chunks_overlap():
+    pages = ["\n\n".join(f"Medida {page}.{n}: más salud y educación." for n in range(8)) for page in range(5)]
+    chunks = list(make_chunker(max_tokens=60, overlap_tokens=20).iter_chunks(pages))
+
+    assert len(chunks) > 1
+    for previous, current in zip(chunks, chunks[1:]):
+        first_paragraph = current.split("\n\n")[0]
+        assert first_paragraph in previous
+
+
+def test_long_paragraph_is_split():
+    paragraph = ". ".join(f"Oración número {n} sobre salud pública y hospitales" for n in range(200))
+    chunker = make_chunker(max_tokens=100, overlap_tokens=0)
+
+    streamed = list(chunker.iter_chunks([paragraph]))
+
+    assert len(streamed) > 1
+    assert streamed == chunker.chunk_text(paragraph)
+
+
+def test_short_text_is_one_chunk():
+    chunker = make_chunker(max_tokens=1000)
+
+    assert list(chunker.iter_chunks(["Una sola página corta."])) == ["Una sola página corta."]
+
+
+if __name__ == "__main__":
+    for name, test in list(globals().items()):
+        if name.startswith("test_") and callable(test):
+            test()
+            print(f"✓ {name}")